@@ -1,11 +1,105 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, router
+from django.db.models import Q
+from django.utils.functional import cached_property
+
 from .models import (
     User,
     MachineModel, EngineModel, TransmissionModel,
     DriveAxleModel, SteerAxleModel,
     Machine, MaintenanceType, FailureNode, RecoveryMethod,
-    Maintenance, Claim,
+    Maintenance, Claim, ArchivedMaintenance, ArchivedClaim, Part,
+    prefix_range,
 )
+from .search import INDEXES, matching
+
+
+def estimated_count(model):
+    """Число строк таблицы по статистике СУБД (ANALYZE) или None, если статистики нет"""
+    connection = connections[router.db_for_read(model)]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            rows = cursor.fetchall()
+    except DatabaseError:  # sqlite_stat1 появляется после первого ANALYZE
+        return None
+    # sqlite_stat1.stat — «строк в индексе, ...»; reltuples = -1 до первого ANALYZE
+    counts = [int(str(stat).split()[0]) for stat, in rows if stat is not None]
+    return max(counts, default=0) or None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Список без фильтров и поиска по большой таблице — число строк из статистики, без COUNT(*)"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model)
+            if estimate is not None and estimate >= getattr(settings, 'ADMIN_ESTIMATED_COUNT_FROM', 100_000):
+                return estimate
+        return super().count
+
+
+class PrefetchChangeList(ChangeList):
+    """
+    list_select_related — отдельными запросами по id строк страницы, а не JOIN.
+    С JOIN мелких справочников (модель техники, вид ТО) SQLite после ANALYZE
+    начинает соединение со справочника и сортирует всю таблицу; без JOIN
+    страница — проход по индексу даты с LIMIT.
+    """
+
+    def apply_select_related(self, qs):
+        return qs.prefetch_related(*self.list_select_related)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Список большой таблицы: оценка числа строк вместо COUNT(*) по всей
+    таблице (и без второго COUNT для «из N»), связанные объекты — PrefetchChangeList,
+    date_hierarchy — поиском по индексу (templates/admin/core/change_list.html),
+    поиск — IndexedSearchMixin
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return PrefetchChangeList
+
+
+class IndexedSearchMixin:
+    """
+    Поиск в списке и в автодополнении без LIKE '%…%' по большим таблицам:
+    зав. номер машины — по началу через индекс UPPER(serial_number)
+    (serial_path — путь к машине, '' — сама машина), prefix_fields — по началу
+    через обычный индекс, тексты — по полнотекстовому индексу (core/search.py).
+    search_fields нужны только автодополнению и для поля поиска в списке.
+    """
+    serial_path = 'machine'
+    prefix_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        machines = Machine.objects.by_serial_prefix(term).values('pk')
+        condition = Q(**{f'{self.serial_path}__in' if self.serial_path else 'pk__in': machines})
+        for field in self.prefix_fields:
+            condition |= prefix_range(field, term)
+        if self.model in INDEXES:
+            found = matching(self.model._default_manager.all(), term, ranked=False)
+            condition |= Q(pk__in=found.values('pk'))
+        return queryset.filter(condition), False
 
 
 @admin.register(User)
@@ -23,13 +117,17 @@ admin.site.register(SteerAxleModel)
 
 
 @admin.register(Machine)
-class MachineAdmin(admin.ModelAdmin):
+class MachineAdmin(IndexedSearchMixin, LargeTableAdmin):
     list_display = (
         'serial_number', 'model', 'shipment_date',
         'client', 'service_company'
     )
+    list_select_related = ('model', 'client', 'service_company')
     list_filter = ('model', 'shipment_date', 'service_company')
-    search_fields = ('serial_number', 'engine_serial', 'transmission_serial')
+    search_fields = ('serial_number',)
+    search_help_text = 'Начало зав. № машины, двигателя или трансмиссии; грузополучатель, адрес, комплектация'
+    serial_path = ''
+    autocomplete_fields = ('client', 'service_company')
     date_hierarchy = 'shipment_date'
     readonly_fields = ('created_at', 'updated_at')
 
@@ -38,23 +136,64 @@ admin.site.register(FailureNode)
 admin.site.register(RecoveryMethod)
 
 
+@admin.register(Part)
+class PartAdmin(admin.ModelAdmin):
+    # Пополняется разбором parts_used (core/parts.py), не вручную
+    list_display = ('name', 'key')
+    search_fields = ('key',)
+    readonly_fields = ('key',)
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(Maintenance)
-class MaintenanceAdmin(admin.ModelAdmin):
+class MaintenanceAdmin(IndexedSearchMixin, LargeTableAdmin):
     list_display = (
         'machine', 'type', 'date', 'hours', 'service_company'
     )
+    list_select_related = ('machine__model', 'type', 'service_company')
     list_filter = ('type', 'date', 'service_company')
     search_fields = ('machine__serial_number', 'order_number')
+    search_help_text = 'Начало зав. № машины или № заказ-наряда'
+    prefix_fields = ('order_number',)
+    autocomplete_fields = ('machine', 'organization', 'service_company')
     date_hierarchy = 'date'
     readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(Claim)
-class ClaimAdmin(admin.ModelAdmin):
+class ClaimAdmin(IndexedSearchMixin, LargeTableAdmin):
     list_display = (
         'machine', 'failure_node', 'failure_date', 'recovery_date', 'downtime'
     )
+    list_select_related = ('machine__model', 'failure_node')
     list_filter = ('failure_node', 'recovery_method', 'service_company')
-    search_fields = ('machine__serial_number', 'failure_description')
+    search_fields = ('machine__serial_number',)
+    search_help_text = 'Начало зав. № машины; слова из описания отказа или запчастей'
+    autocomplete_fields = ('machine', 'service_company')
     date_hierarchy = 'failure_date'
-    readonly_fields = ('created_at', 'updated_at', 'downtime')  # downtime только для просмотра
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at', 'downtime')  # downtime только для просмотра
+
+
+@admin.register(ArchivedMaintenance)
+class ArchivedMaintenanceAdmin(IndexedSearchMixin, LargeTableAdmin):
+    list_display = ('machine', 'type', 'date', 'hours', 'service_company', 'archived_at')
+    list_select_related = ('machine__model', 'type', 'service_company')
+    list_filter = ('type',)
+    search_fields = ('machine__serial_number', 'order_number')
+    search_help_text = 'Начало зав. № машины или № заказ-наряда'
+    prefix_fields = ('order_number',)
+    autocomplete_fields = ('machine', 'organization', 'service_company')
+    readonly_fields = ('created_at', 'updated_at', 'archived_at')
+
+
+@admin.register(ArchivedClaim)
+class ArchivedClaimAdmin(IndexedSearchMixin, LargeTableAdmin):
+    list_display = ('machine', 'failure_node', 'failure_date', 'recovery_date', 'archived_at')
+    list_select_related = ('machine__model', 'failure_node')
+    list_filter = ('failure_node',)
+    search_fields = ('machine__serial_number',)
+    search_help_text = 'Начало зав. № машины'
+    autocomplete_fields = ('machine', 'service_company')
+    readonly_fields = ('created_at', 'updated_at', 'archived_at')
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .instrumentation import install_query_recorder, install_template_timer
+        from . import signals  # noqa: F401 — подключение обработчиков
+        install_template_timer()
+        connection_created.connect(install_query_recorder)
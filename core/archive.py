@@ -0,0 +1,83 @@
+# core/archive.py
+"""
+Горячее/холодное хранение ТО и рекламаций.
+
+Старые записи переносятся в архивные таблицы, чтобы основные таблицы
+(и их индексы) оставались небольшими. Чтение полной истории машины
+идёт через функции этого модуля — они объединяют оба источника.
+"""
+import datetime
+import heapq
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Maintenance, Claim, ArchivedMaintenance, ArchivedClaim
+
+# Горячая модель → (архивная модель, поле даты, связи для select_related)
+ARCHIVES = {
+    Maintenance: (ArchivedMaintenance, 'date', ('type', 'organization', 'service_company')),
+    Claim: (ArchivedClaim, 'failure_date', ('failure_node', 'recovery_method', 'service_company')),
+}
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.ARCHIVE_HORIZON_DAYS
+    return timezone.localdate() - datetime.timedelta(days=days)
+
+
+def _copied_fields(model, archive_model):
+    archived = {f.attname for f in archive_model._meta.concrete_fields}
+    return [f.attname for f in model._meta.concrete_fields if f.attname in archived]
+
+
+def archive_batches(model, cutoff, batch_size=1000):
+    """
+    Переносит записи model с датой раньше cutoff в архив пачками.
+    Каждая пачка — отдельная короткая транзакция; генератор отдаёт размер пачки.
+    """
+    archive_model, date_field, _ = ARCHIVES[model]
+    fields = _copied_fields(model, archive_model)
+    old = model.objects.filter(**{f'{date_field}__lt': cutoff}).order_by('pk')
+
+    while True:
+        with transaction.atomic():
+            ids = list(old.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return
+            rows = model.objects.filter(pk__in=ids).values(*fields)
+            archive_model.objects.bulk_create(
+                [archive_model(**row) for row in rows],
+                ignore_conflicts=True,
+            )
+            # Строки поискового индекса убирает post_delete рекламации (core/signals.py)
+            model.objects.filter(pk__in=ids).delete()
+        yield len(ids)
+
+
+def _history(machine, model, limit):
+    archive_model, date_field, related = ARCHIVES[model]
+    order = f'-{date_field}'
+    hot = model.objects.filter(machine=machine).select_related(*related).order_by(order, '-pk')
+    cold = archive_model.objects.filter(machine=machine).select_related(*related).order_by(order, '-pk')
+    if limit is not None:
+        hot, cold = hot[:limit], cold[:limit]
+
+    key = attrgetter(date_field, 'pk')
+    merged = heapq.merge(hot, cold, key=key, reverse=True)
+    if limit is None:
+        return list(merged)
+    return [record for record, _ in zip(merged, range(limit))]
+
+
+def machine_maintenances(machine, limit=None):
+    """ТО машины (горячие + архивные), новые сверху"""
+    return _history(machine, Maintenance, limit)
+
+
+def machine_claims(machine, limit=None):
+    """Рекламации машины (горячие + архивные), новые сверху"""
+    return _history(machine, Claim, limit)
@@ -0,0 +1,273 @@
+# core/async_views.py
+"""
+Асинхронные варианты страниц только для чтения и JSON-списки — для запуска
+под ASGI (uvicorn / gunicorn с UvicornWorker, см. README).
+
+Под ASGI запрос, который ждёт БД или медленного клиента, не держит поток:
+один воркер обслуживает много соединений. Независимые чтения одной страницы
+(вкладки дашборда, COUNT и страница списка, лента, журнал и наработка машины) идут
+одновременно, каждое в своём потоке со своим соединением (gather_reads).
+
+Страницы подменяют синхронные при SILANT_ASYNC_VIEWS (core/urls.py),
+JSON-списки /api/... доступны всегда.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections, connections
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.urls import reverse
+from django.views import View
+
+from .filters import ClaimFilter, MachineFilter, MaintenanceFilter
+from .models import Claim, Machine, Maintenance
+from .permissions import get_role, scope
+from .ratelimit import client_ip
+from .routers import replica_reads
+from .timeline import machine_timeline
+from .views import DashboardTabsMixin, HomeMixin, MachineDetailMixin
+
+_executor = None
+
+
+def read_executor():
+    """
+    Пул потоков для параллельных чтений. Ограничивает и число одновременных
+    соединений с БД от одного воркера (SILANT_READ_THREADS).
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'SILANT_READ_THREADS', 8),
+            thread_name_prefix='silant-read',
+        )
+    return _executor
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def _isolated(func):
+    def run():
+        try:
+            return func()
+        finally:
+            # Поток пула живёт дольше запроса: соединение закрываем по тем же
+            # правилам (CONN_MAX_AGE), что и после обычного запроса
+            close_old_connections()
+    return run
+
+
+async def gather_reads(*funcs):
+    """
+    Вызывает синхронные функции без аргументов одновременно и возвращает
+    их результаты по порядку. Контекст (реплика, статистика запроса)
+    в потоки копируется.
+
+    Внутри открытой транзакции (тесты в TestCase, atomic вокруг вызова)
+    соседние соединения не видят её данных — тогда функции выполняются
+    по очереди в потоке запроса.
+    """
+    if await sync_to_async(_in_transaction)():
+        return await sync_to_async(lambda: [func() for func in funcs])()
+    executor = read_executor()
+    return await asyncio.gather(*(
+        sync_to_async(_isolated(func), thread_sensitive=False, executor=executor)()
+        for func in funcs
+    ))
+
+
+async def authenticated_user(request):
+    """
+    Пользователь запроса без синхронного доступа к сессии. Кладётся и в
+    request.user, чтобы шаблоны и таблицы не загружали его второй раз.
+    """
+    user = await request.auser()
+    request.user = user
+    if user.is_authenticated:
+        # Роль нужна почти везде (scope, таблицы, шаблоны) — один запрос заранее
+        await sync_to_async(get_role)(user)
+    return user
+
+
+@replica_reads
+class AsyncHomeView(HomeMixin, View):
+
+    async def get(self, request):
+        return await sync_to_async(render)(request, self.template_name, {})
+
+    async def post(self, request):
+        retry_after = await self.rate_limiter().aconsume(client_ip(request))
+        if retry_after:
+            response = await sync_to_async(render)(request, self.template_name, self.throttled_context(), status=429)
+            return self.with_retry_after(response, retry_after)
+
+        serial = self.serial(request)
+        machine = await sync_to_async(self.find_machine)(serial)
+        return await sync_to_async(render)(request, self.template_name, self.search_context(serial, machine))
+
+
+@replica_reads
+class AsyncDashboardView(DashboardTabsMixin, View):
+
+    async def get(self, request):
+        user = await authenticated_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        context = self.base_context(request)
+        for tab_context in await gather_reads(*self.tabs(request)):
+            context.update(tab_context)
+        return await sync_to_async(render)(request, self.template_name, context)
+
+
+class AsyncMachineDetailView(MachineDetailMixin, View):
+
+    async def get(self, request, serial_number):
+        user = await authenticated_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        machine = await self.machine_queryset(user, serial_number).afirst()
+        if machine is None:
+            raise Http404("У вас нет доступа к этой машине")
+
+        (events, next_cursor), audit_entries, hour_meter = await gather_reads(
+            partial(machine_timeline, machine),
+            partial(self.audit_entries, user, machine),
+            partial(self.hour_meter, machine),
+        )
+        context = self.detail_context(user, machine, events, next_cursor, audit_entries, hour_meter)
+        return await sync_to_async(render)(request, self.template_name, context)
+
+
+def _email(user):
+    return user.email if user is not None else None
+
+
+def _name(directory):
+    return directory.name if directory is not None else None
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+class AsyncListAPIView(View):
+    """
+    JSON-список с фильтрами дашборда (без префиксов: ?type=3&page=2) и
+    правами роли. COUNT и страница выбираются одновременно.
+    """
+    model = None
+    filterset_class = None
+    related = ()
+    ordering = ()
+    per_page = 20
+    max_per_page = 100
+
+    async def get(self, request):
+        user = await authenticated_user(request)
+        if not user.is_authenticated:
+            return JsonResponse({'detail': 'Требуется вход'}, status=401)
+
+        try:
+            page = int(request.GET.get('page', 1))
+            per_page = min(int(request.GET.get('per_page', self.per_page)), self.max_per_page)
+        except ValueError:
+            return JsonResponse({'detail': 'page и per_page должны быть числами'}, status=400)
+        if page < 1 or per_page < 1:
+            return JsonResponse({'detail': 'page и per_page должны быть положительными'}, status=400)
+
+        # Проверка формы фильтра может обращаться к БД (ModelChoiceFilter)
+        filterset = self.filterset_class(request.GET, queryset=self.get_queryset(request, user))
+        if not await sync_to_async(filterset.is_valid)():
+            return JsonResponse({'errors': filterset.errors.get_json_data()}, status=400)
+
+        queryset = filterset.qs
+        offset = (page - 1) * per_page
+        count, results = await gather_reads(
+            queryset.count,
+            lambda: [self.serialize(obj) for obj in queryset[offset:offset + per_page]],
+        )
+        return JsonResponse({'count': count, 'page': page, 'per_page': per_page, 'results': results})
+
+    def get_queryset(self, request, user):
+        queryset = self.model.objects.select_related(*self.related).order_by(*self.ordering)
+        return scope(queryset, user)
+
+    def serialize(self, obj):
+        # По умолчанию — собственные поля модели (связи — id); наследники отдают имена
+        return {field.attname: field.value_from_object(obj) for field in obj._meta.concrete_fields}
+
+
+@replica_reads
+class MachineListAPIView(AsyncListAPIView):
+    model = Machine
+    filterset_class = MachineFilter
+    related = ('model', 'client', 'service_company')
+    ordering = ('-shipment_date', 'serial_number')
+
+    def get_queryset(self, request, user):
+        queryset = super().get_queryset(request, user)
+        serial_quick = request.GET.get('serial_quick', '').strip()
+        if serial_quick:
+            queryset = queryset.filter(serial_number__icontains=serial_quick)
+        return queryset
+
+    def serialize(self, machine):
+        return {
+            'serial_number': machine.serial_number,
+            'url': reverse('core:machine_detail', args=[machine.serial_number]),
+            'model': _name(machine.model),
+            'shipment_date': _date(machine.shipment_date),
+            'client': _email(machine.client),
+            'service_company': _email(machine.service_company),
+        }
+
+
+@replica_reads
+class MaintenanceListAPIView(AsyncListAPIView):
+    model = Maintenance
+    filterset_class = MaintenanceFilter
+    related = ('machine', 'type', 'organization', 'service_company')
+    ordering = ('-date', '-pk')
+
+    def serialize(self, maintenance):
+        return {
+            'id': maintenance.pk,
+            'machine': maintenance.machine.serial_number,
+            'type': _name(maintenance.type),
+            'date': _date(maintenance.date),
+            'hours': maintenance.hours,
+            'order_number': maintenance.order_number,
+            'order_date': _date(maintenance.order_date),
+            'organization': _email(maintenance.organization),
+            'service_company': _email(maintenance.service_company),
+        }
+
+
+@replica_reads
+class ClaimListAPIView(AsyncListAPIView):
+    model = Claim
+    filterset_class = ClaimFilter
+    related = ('machine', 'failure_node', 'recovery_method', 'service_company')
+    ordering = ('-failure_date', '-pk')
+
+    def serialize(self, claim):
+        return {
+            'id': claim.pk,
+            'machine': claim.machine.serial_number,
+            'failure_date': _date(claim.failure_date),
+            'hours': claim.hours,
+            'failure_node': _name(claim.failure_node),
+            'recovery_method': _name(claim.recovery_method),
+            'recovery_date': _date(claim.recovery_date),
+            'downtime': claim.downtime,
+            'service_company': _email(claim.service_company),
+        }
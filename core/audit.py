@@ -0,0 +1,219 @@
+# core/audit.py
+"""
+Журнал изменений машин, ТО и рекламаций: кто, когда, какие поля (было/стало).
+
+Разница полей считается по сигналам pre_save/post_save (удаление — в
+MachineOwnedMixin.delete() и post_delete машины, массовая передача машин —
+в core/reassign.py по значениям до UPDATE), а запись в БД не
+задерживает сохранение: после коммита транзакции запись ложится в буфер
+в памяти, фоновый поток пишет буфер одним bulk_create — как только в нём
+AUDIT_BATCH_SIZE записей или раз в AUDIT_FLUSH_SECONDS. При остановке
+процесса остаток пишется синхронно (atexit). Запись, не дожившая до сброса
+(kill -9), теряется.
+
+Пользователь берётся из запроса, который AuditMiddleware кладёт в contextvar;
+изменения вне запроса (команды, shell) пишутся без пользователя.
+"""
+import atexit
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import AuditEntry, Claim, Machine, Maintenance
+
+logger = logging.getLogger(__name__)
+
+_request = ContextVar('silant_audit_request', default=None)
+
+AUDITED_MODELS = (Machine, Maintenance, Claim)
+
+# Служебные поля, которые меняются сами и в журнале не нужны
+SKIPPED_FIELDS = {'id', 'created_at', 'updated_at', 'machine_client_id', 'machine_service_company_id'}
+
+
+def set_request(request):
+    return _request.set(request)
+
+
+def reset_request(token):
+    _request.reset(token)
+
+
+def current_user_id():
+    """id пользователя текущего запроса или None"""
+    from .middleware import cached_user
+    request = _request.get()
+    user = cached_user(request) if request is not None else None
+    return user.pk if user is not None else None
+
+
+def snapshot(instance):
+    return {
+        field.attname: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+        if field.attname not in SKIPPED_FIELDS
+    }
+
+
+def _machine_id(instance):
+    return instance.pk if isinstance(instance, Machine) else instance.machine_id
+
+
+def _entry(instance, action, changes):
+    return AuditEntry(
+        created_at=timezone.now(),
+        user_id=current_user_id(),
+        action=action,
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        machine_id=_machine_id(instance),
+        changes=changes,
+    )
+
+
+def _enqueue(*entries):
+    # Откаченное изменение в журнал не попадает
+    transaction.on_commit(partial(audit_writer.add, *entries))
+
+
+def remember_state(instance):
+    """pre_save: прежние значения полей (один запрос по первичному ключу)"""
+    if instance._state.adding or instance.pk is None:
+        instance._audit_before = None
+        return
+    fields = list(snapshot(instance))
+    instance._audit_before = type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first()
+
+
+def record_save(instance, created):
+    """post_save: разница с состоянием из remember_state"""
+    after = snapshot(instance)
+    before = getattr(instance, '_audit_before', None)
+    if created or before is None:
+        changes = {name: [None, value] for name, value in after.items() if value not in (None, '')}
+        action = AuditEntry.CREATE
+    else:
+        changes = {name: [before.get(name), value] for name, value in after.items() if before.get(name) != value}
+        action = AuditEntry.UPDATE
+    if changes:
+        _enqueue(_entry(instance, action, changes))
+
+
+def delete_entry(instance):
+    """Запись об удалении; снимается до delete(), пока у объекта есть pk"""
+    changes = {name: [value, None] for name, value in snapshot(instance).items() if value not in (None, '')}
+    return _entry(instance, AuditEntry.DELETE, changes)
+
+
+def record_delete(instance):
+    """post_delete"""
+    _enqueue(delete_entry(instance))
+
+
+def record_deleted(entry):
+    """Запись из delete_entry — после успешного удаления"""
+    _enqueue(entry)
+
+
+def record_bulk_update(model, rows):
+    """Изменения через QuerySet.update() (мимо сигналов): rows — [(id, id машины, {поле: [было, стало]})]"""
+    created_at, user_id = timezone.now(), current_user_id()
+    entries = [
+        AuditEntry(
+            created_at=created_at, user_id=user_id, action=AuditEntry.UPDATE, model=model._meta.model_name,
+            object_id=pk, machine_id=machine_id, changes=changes,
+        )
+        for pk, machine_id, changes in rows if changes
+    ]
+    if entries:
+        _enqueue(*entries)
+
+
+class AuditWriter:
+    """Буфер записей журнала и поток, который пишет его пачками"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._buffer = []
+        self._thread = None
+        self._last_flush = time.monotonic()
+
+    def _config(self):
+        return (
+            getattr(settings, 'AUDIT_BATCH_SIZE', 100),
+            getattr(settings, 'AUDIT_FLUSH_SECONDS', 2),
+            getattr(settings, 'AUDIT_BACKGROUND', True),
+        )
+
+    def add(self, *entries):
+        batch_size, flush_seconds, background = self._config()
+        with self._lock:
+            self._buffer.extend(entries)
+            full = len(self._buffer) >= batch_size
+            if background:
+                self._ensure_thread()
+                if full:
+                    self._wakeup.notify()
+                return
+        # Без фонового потока (тесты, команды) — те же пачки, но в вызывающем потоке
+        if full or time.monotonic() - self._last_flush >= flush_seconds:
+            self.flush()
+
+    def _ensure_thread(self):
+        # Поток не переживает fork (gunicorn --preload) — проверяем, жив ли
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='silant-audit', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            _, flush_seconds, _ = self._config()
+            with self._lock:
+                self._wakeup.wait(flush_seconds)
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Пишет всё накопленное; при ошибке БД записи возвращаются в буфер"""
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not entries:
+            return 0
+        try:
+            AuditEntry.objects.bulk_create(entries)
+        except Exception:
+            logger.exception('Не удалось записать журнал изменений (%d записей)', len(entries))
+            with self._lock:
+                self._buffer[:0] = entries
+            return 0
+        return len(entries)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def discard(self):
+        """Отбрасывает несохранённые записи (тесты: буфер общий на процесс)"""
+        with self._lock:
+            self._buffer.clear()
+
+
+audit_writer = AuditWriter()
+# Под тестами к выходу процесса тестовой БД уже нет: остаток ушёл бы в рабочую
+if not getattr(settings, 'TESTING', False):
+    atexit.register(audit_writer.flush)
+
+
+def machine_history(machine, limit=20):
+    """Последние записи журнала по машине и её ТО/рекламациям"""
+    return list(AuditEntry.objects.filter(machine=machine).select_related('user').order_by('-id')[:limit])
@@ -0,0 +1,188 @@
+# core/benchmarks.py
+"""
+Повторяемые замеры ключевых страниц на текущей базе (обычно — на данных
+из `generate_fleet`): задержка, число SQL-запросов и пиковая память.
+Запуск и сравнение с эталоном — команда `manage.py benchmark`.
+"""
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.forms.models import model_to_dict
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .forms import ClaimForm, MachineForm, MaintenanceForm
+from .models import User, Machine, Maintenance, Claim
+from .permissions import MANAGER, CLIENT, SERVICE, scope
+
+
+class Scenario:
+    def __init__(self, name, method, url, user=None, data=None, rollback=False):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.user = user
+        self.data = data
+        # Изменяющие сценарии выполняются в транзакции с откатом — база не растёт от прогонов
+        self.rollback = rollback
+
+    def client(self):
+        client = Client()
+        if self.user is not None:
+            client.force_login(self.user)
+        return client
+
+    def request(self, client):
+        if self.rollback:
+            with transaction.atomic():
+                response = self._send(client)
+                transaction.set_rollback(True)
+            return response
+        return self._send(client)
+
+    def _send(self, client):
+        if self.method == 'POST':
+            return client.post(self.url, self.data or {})
+        return client.get(self.url)
+
+
+def role_users():
+    """По пользователю на роль; для клиента и сервиса — с самым большим парком (худший случай)"""
+    users = {MANAGER: User.objects.filter(groups__name=MANAGER).order_by('pk').first()}
+    for role, related in ((CLIENT, 'client_machines'), (SERVICE, 'service_machines')):
+        users[role] = (
+            User.objects.filter(groups__name=role)
+            .annotate(machine_count=Count(related))
+            .order_by('-machine_count', 'pk')
+            .first()
+        )
+    return {role: user for role, user in users.items() if user is not None}
+
+
+def _form_data(instance, form_class):
+    """POST-данные формы по существующей записи (тестовый клиент не принимает None)"""
+    data = model_to_dict(instance, fields=form_class._meta.fields)
+    return {name: value for name, value in data.items() if value is not None}
+
+
+def build_scenarios(pages=(1, 10, 100)):
+    users = role_users()
+    scenarios = []
+
+    any_machine = Machine.objects.order_by('pk').first()
+    if any_machine is not None:
+        scenarios += [
+            Scenario('home.post.hit', 'POST', reverse('core:home'), data={'serial_number': any_machine.serial_number}),
+            Scenario('home.post.miss', 'POST', reverse('core:home'), data={'serial_number': 'NO-SUCH-SERIAL'}),
+        ]
+
+    for role, user in users.items():
+        slug = {MANAGER: 'manager', CLIENT: 'client', SERVICE: 'service'}[role]
+        dashboard = reverse('core:dashboard')
+        for tab in ('machines', 'maintenance', 'claims'):
+            for page in pages:
+                scenarios.append(Scenario(f'dashboard.{tab}.{slug}.p{page}', 'GET',
+                                          f'{dashboard}?tab={tab}&page={page}', user))
+        scenarios.append(Scenario(f'export.machines.{slug}', 'GET', reverse('core:export_machines'), user))
+
+        machine = scope(Machine.objects.order_by('pk'), user).first()
+        if machine is None:
+            continue
+        serial = machine.serial_number
+        scenarios.append(Scenario(f'machine_detail.{slug}', 'GET', reverse('core:machine_detail', args=[serial]), user))
+
+        create_url = reverse('core:maintenance_create', args=[serial])
+        scenarios.append(Scenario(f'maintenance_create.get.{slug}', 'GET', create_url, user))
+
+        maintenance = scope(Maintenance.objects.select_related('machine').order_by('pk'), user, 'change').first()
+        if maintenance is not None:
+            scenarios.append(Scenario(
+                f'maintenance_create.post.{slug}', 'POST',
+                reverse('core:maintenance_create', args=[maintenance.machine.serial_number]), user,
+                data=_form_data(maintenance, MaintenanceForm), rollback=True,
+            ))
+            scenarios.append(Scenario(f'maintenance_update.get.{slug}', 'GET',
+                                      reverse('core:maintenance_edit', args=[maintenance.pk]), user))
+        claim = scope(Claim.objects.select_related('machine').order_by('pk'), user, 'change').first()
+        if claim is not None:
+            scenarios.append(Scenario(
+                f'claim_create.post.{slug}', 'POST',
+                reverse('core:claim_create', args=[claim.machine.serial_number]), user,
+                data=_form_data(claim, ClaimForm), rollback=True,
+            ))
+            scenarios.append(Scenario(f'claim_update.get.{slug}', 'GET',
+                                      reverse('core:claim_edit', args=[claim.pk]), user))
+
+    if MANAGER in users:
+        manager = users[MANAGER]
+        scenarios.append(Scenario('machine_create.get.manager', 'GET', reverse('core:machine_create'), manager))
+        if any_machine is not None:
+            # Сохранение карточки без изменений: проверка формы, UPDATE и сигналы журнала/индексов
+            scenarios.append(Scenario(
+                'machine_update.post.manager', 'POST',
+                reverse('core:machine_edit', args=[any_machine.serial_number]), manager,
+                data=_form_data(any_machine, MachineForm), rollback=True,
+            ))
+    return scenarios
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_scenario(scenario, repeat=10, warmup=2):
+    client = scenario.client()
+    for _ in range(warmup):
+        scenario.request(client)
+
+    timings, query_counts, status = [], [], None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = scenario.request(client)
+            timings.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(queries))
+        status = response.status_code
+
+    # Память меряем отдельным прогоном: tracemalloc сильно замедляет выполнение
+    tracemalloc.start()
+    try:
+        scenario.request(client)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': status,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'min_ms': round(min(timings), 2),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'queries': int(statistics.median(query_counts)),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Регрессия — рост p50 больше чем на threshold (доля) или рост числа запросов.
+    Возвращает список (сценарий, метрика, было, стало).
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current['p50_ms'] > before['p50_ms'] * (1 + threshold):
+            regressions.append((name, 'p50_ms', before['p50_ms'], current['p50_ms']))
+        if current['queries'] > before['queries']:
+            regressions.append((name, 'queries', before['queries'], current['queries']))
+        if current['peak_kb'] > before['peak_kb'] * (1 + threshold):
+            regressions.append((name, 'peak_kb', before['peak_kb'], current['peak_kb']))
+    return regressions
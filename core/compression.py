@@ -0,0 +1,109 @@
+# core/compression.py
+"""
+Сжатие ответов и статики: gzip всегда, brotli — если установлен пакет `brotli`
+(необязательная зависимость: без него просто отдаём gzip).
+"""
+import gzip
+
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Что имеет смысл сжимать (xlsx, woff/woff2, растровые картинки уже сжаты; SVG — текст)
+COMPRESSIBLE_TYPES = ('text/html', 'text/csv', 'text/plain', 'text/css', 'application/json', 'text/javascript',
+                      'application/javascript', 'image/svg+xml')
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.ttf', '.otf', '.txt', '.map', '.xml', '.html')
+
+# Короткие ответы сжимать невыгодно
+MIN_SIZE = 200
+
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _weights(accept_encoding):
+    """Accept-Encoding -> {кодировка: q}; без q — 1, с нечисловым q — 0"""
+    weights = {}
+    for item in (accept_encoding or '').split(','):
+        name, *params = item.split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+def negotiate(accept_encoding):
+    """
+    Лучшее из поддерживаемых кодировок по заголовку Accept-Encoding (или None):
+    с наибольшим q, при равных — в порядке available_encodings(); q=0 — «нельзя».
+    `*` задаёт вес кодировкам, не названным явно.
+    """
+    weights = _weights(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    # Случайный довесок в заголовке gzip — защита от BREACH, как в GZipMiddleware
+    return compress_string(data, max_random_bytes=100)
+
+
+def compress_stream(chunks, encoding):
+    if encoding == 'gzip':
+        return compress_sequence(chunks, max_random_bytes=100)
+    return _brotli_stream(chunks)
+
+
+def _brotli_stream(chunks):
+    compressor = brotli.Compressor(quality=5)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+        # Отдаём накопленное сразу, чтобы стриминг оставался стримингом
+        data = compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    """То же для асинхронного streaming_content (StreamingHttpResponse под ASGI)"""
+    if encoding == 'gzip':
+        # Каждый кусок — отдельный gzip-член, как в GZipMiddleware для async-ответов
+        async for chunk in chunks:
+            yield compress_string(chunk, max_random_bytes=100)
+        return
+    compressor = brotli.Compressor(quality=5)
+    async for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_file(data, encoding):
+    """Для статики при сборке: максимальная степень, время не важно"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
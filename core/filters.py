@@ -3,6 +3,8 @@ import django_filters
 from django.utils.translation import gettext_lazy as _
 
 from .models import Machine, Maintenance, Claim, MachineModel, EngineModel, TransmissionModel, DriveAxleModel, SteerAxleModel, MaintenanceType, FailureNode, RecoveryMethod, User
+from .parts import claims_with_part
+from .search import matching
 
 
 class MachineFilter(django_filters.FilterSet):
@@ -31,6 +33,11 @@ class MachineFilter(django_filters.FilterSet):
         label=_("Модель управляемого моста"),
         empty_label=_("Все"),
     )
+    text = django_filters.CharFilter(
+        method="filter_text",
+        label=_("Поиск по комплектации и адресу"),
+        widget=forms.TextInput(attrs={"placeholder": "Грузополучатель, адрес, опции"}),
+    )
 
     class Meta:
         model = Machine
@@ -40,8 +47,13 @@ class MachineFilter(django_filters.FilterSet):
             "transmission_model",
             "drive_axle_model",
             "steer_axle_model",
+            "text",
         ]
 
+    def filter_text(self, queryset, name, value):
+        # Полнотекстовый индекс (core/search.py), результаты — по релевантности
+        return matching(queryset, value)
+
 
 class MaintenanceFilter(django_filters.FilterSet):
     type = django_filters.ModelChoiceFilter(
@@ -81,7 +93,24 @@ class ClaimFilter(django_filters.FilterSet):
         label=_("Сервисная компания"),
         empty_label=_("Все"),
     )
+    text = django_filters.CharFilter(
+        method="filter_text",
+        label=_("Поиск по описанию отказа"),
+        widget=forms.TextInput(attrs={"placeholder": "Например: течь масла"}),
+    )
+    part = django_filters.CharFilter(
+        method="filter_part",
+        label=_("Запасная часть"),
+        widget=forms.TextInput(attrs={"placeholder": "Например: фильтр масляный"}),
+    )
 
     class Meta:
         model = Claim
-        fields = ["failure_node", "recovery_method", "service_company"]
\ No newline at end of file
+        fields = ["failure_node", "recovery_method", "service_company", "text", "part"]
+
+    def filter_text(self, queryset, name, value):
+        return matching(queryset, value)
+
+    def filter_part(self, queryset, name, value):
+        # По индексу ClaimPart (core/parts.py), а не LIKE по тексту parts_used
+        return claims_with_part(queryset, value)
\ No newline at end of file
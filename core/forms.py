@@ -78,10 +78,6 @@ class MaintenanceForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        qs = User.objects.filter(groups__name='Сервисная_организация')
-        print("DEBUG MaintenanceForm: найдено пользователей в группе:", qs.count())
-        print("DEBUG: их email:", [u.email for u in qs])
-
         # Ограничим выбор organization и service_company по группе
         self.fields['organization'].queryset = User.objects.filter(groups__name='Сервисная_организация')
         self.fields['service_company'].queryset = User.objects.filter(groups__name='Сервисная_организация')
@@ -112,10 +108,42 @@ class ClaimForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        qs = User.objects.filter(groups__name='Сервисная_организация')
-        print("DEBUG MaintenanceForm: найдено пользователей в группе:", qs.count())
-        print("DEBUG: их email:", [u.email for u in qs])
-
         self.fields['service_company'].queryset = User.objects.filter(groups__name='Сервисная_организация')
 
 
+
+
+class MachineReassignForm(forms.Form):
+    """Массовая передача машин (core/reassign.py); пустое поле — не менять"""
+    client = forms.ModelChoiceField(
+        queryset=User.objects.filter(groups__name='Клиент'),
+        required=False, label='Новый клиент', empty_label='Не менять',
+    )
+    service_company = forms.ModelChoiceField(
+        queryset=User.objects.filter(groups__name='Сервисная_организация'),
+        required=False, label='Новая сервисная компания', empty_label='Не менять',
+    )
+    cascade = forms.BooleanField(
+        required=False, label='Передать и ТО/рекламации прежней сервисной компании',
+    )
+    # Только без фильтров: тогда отобран весь парк, и это нужно подтвердить явно
+    all_machines = forms.BooleanField(
+        required=False, label='Передать все машины парка (фильтры не заданы)',
+    )
+
+    def __init__(self, *args, filtered=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        if filtered:
+            del self.fields['all_machines']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if 'all_machines' in self.fields and not cleaned_data.get('all_machines'):
+            raise forms.ValidationError(
+                'Фильтры не заданы — отберите машины на дашборде или подтвердите передачу всего парка'
+            )
+        if not cleaned_data.get('client') and not cleaned_data.get('service_company'):
+            raise forms.ValidationError('Выберите нового клиента или сервисную компанию')
+        if cleaned_data.get('cascade') and not cleaned_data.get('service_company'):
+            raise forms.ValidationError('Передать ТО и рекламации можно только вместе со сменой сервисной компании')
+        return cleaned_data
@@ -0,0 +1,127 @@
+# core/instrumentation.py
+"""
+Счётчики на время одного запроса: число SQL-запросов, время в БД,
+время рендера шаблонов и повторяющиеся запросы (признак N+1).
+
+Данные копятся в RequestStats текущего запроса (contextvar), их заполняют
+обёртка execute_wrapper на соединениях и обёртка рендера шаблонов,
+а читает RequestInstrumentationMiddleware.
+
+Обёртка ставится на каждое соединение при его создании (сигнал
+connection_created), а не на время запроса: так учитываются и запросы
+из потоков, в которых async-view выполняют ORM (contextvar туда копируется).
+"""
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+_current = ContextVar('silant_request_stats', default=None)
+
+# Списки IN (%s, %s, ...) разной длины — это один и тот же запрос
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+
+class RequestStats:
+    __slots__ = ('started', 'detailed', 'queries', 'sql_time', 'template_time',
+                 'fingerprints', 'query_log', '_template_depth', '_lock')
+
+    def __init__(self, detailed=False):
+        self.started = time.perf_counter()
+        self.detailed = detailed
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        # Отпечатки запросов собираем только для выборки (sampling) — это дороже
+        self.fingerprints = Counter() if detailed else None
+        self.query_log = [] if detailed else None  # (отпечаток, секунды) — для метрик по отпечаткам
+        self._template_depth = 0
+        # async-view читают параллельно из нескольких потоков
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def duplicates(self, threshold):
+        if not self.fingerprints:
+            return []
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+def current_stats():
+    return _current.get()
+
+
+def start_request(detailed=False):
+    stats = RequestStats(detailed=detailed)
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def fingerprint(sql):
+    return _NUMBER_RE.sub('?', _IN_LIST_RE.sub('IN (...)', sql))
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper()"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        key = fingerprint(sql) if stats.fingerprints is not None else None
+        with stats._lock:
+            stats.queries += 1
+            stats.sql_time += duration
+            if key is not None:
+                stats.fingerprints[key] += 1
+                stats.query_log.append((key, duration))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Обработчик connection_created: record_query на каждом соединении, один раз"""
+    # В начало списка: соединение может открыться внутри чужого
+    # `with connection.execute_wrapper(...)`, который на выходе снимает последний
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+_template_timer_installed = False
+
+
+def install_template_timer():
+    """
+    Оборачивает рендер шаблонов Django-бэкенда. Учитывается только внешний
+    вызов: render_table и прочие вложенные рендеры входят в его время.
+    """
+    global _template_timer_installed
+    if _template_timer_installed:
+        return
+    from django.template.backends.django import Template
+
+    original_render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None or not stats.detailed:
+            return original_render(self, context, request)
+        stats._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            stats._template_depth -= 1
+            if stats._template_depth == 0:
+                stats.template_time += time.perf_counter() - started
+
+    Template.render = timed_render
+    _template_timer_installed = True
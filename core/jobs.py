@@ -0,0 +1,147 @@
+# core/jobs.py
+"""
+Очередь фоновых задач в БД (таблица Job) — для работы, которую незачем
+делать в запросе: письма, дайджесты.
+
+    @handler('notify_digest')
+    def send_digest(payload): ...
+
+    enqueue('notify_digest', {'items': [...]}, key='digest:7', delay=300)
+
+Задача с ключом склеивается: пока она ждёт, следующие enqueue с тем же
+ключом дописывают items в её payload, а не создают новую (одно письмо
+за окно delay вместо письма на каждое событие).
+
+Выполняет задачи команда `manage.py run_jobs`: берёт пачку созревших
+задач (помечая их «выполняется» до locked_until — задачи упавшего воркера
+потом подберёт другой), успешные удаляет, упавшие повторяет с растущей
+паузой до JOBS_MAX_ATTEMPTS раз, затем оставляет в состоянии «ошибка».
+"""
+import datetime
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Регистрирует функцию payload -> None как обработчик задач вида kind"""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def _config():
+    return (
+        getattr(settings, 'JOBS_MAX_ATTEMPTS', 5),
+        getattr(settings, 'JOBS_RETRY_SECONDS', 60),
+        getattr(settings, 'JOBS_LOCK_SECONDS', 300),
+    )
+
+
+def _for_update(queryset):
+    # SQLite блокирует всю БД на запись, FOR UPDATE там не нужен (и не поддерживается)
+    if connection.features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True)
+    return queryset
+
+
+def _lock_queue():
+    """
+    SQLite: запись первой командой транзакции берёт блокировку записи сразу
+    (как BEGIN IMMEDIATE, с ожиданием по timeout), и прочитанное дальше не
+    устареет к записи. Без этого из двух транзакций, прочитавших очередь,
+    записать сможет только одна — вторая упадёт с «database is locked».
+    """
+    if connection.vendor == 'sqlite':
+        Job.objects.filter(pk=0).update(status=F('status'))
+
+
+def enqueue(kind, payload=None, key=None, delay=0):
+    """
+    Ставит задачу в очередь (в текущей транзакции). С ключом — дописывает
+    payload['items'] в ждущую задачу с тем же ключом, если она есть.
+    """
+    payload = payload or {}
+    run_at = timezone.now() + datetime.timedelta(seconds=delay)
+    if key is None:
+        return Job.objects.create(kind=kind, payload=payload, run_at=run_at)
+
+    for _ in range(3):
+        with transaction.atomic():
+            _lock_queue()
+            job = Job.objects.select_for_update().filter(key=key, status=Job.PENDING).first()
+            if job is not None:
+                job.payload.setdefault('items', []).extend(payload.get('items', []))
+                # Задачу, которую воркер успел забрать (ключ снят), не трогаем — нужна новая
+                if Job.objects.filter(pk=job.pk, key=key, status=Job.PENDING).update(payload=job.payload):
+                    return job
+                continue
+            try:
+                with transaction.atomic():
+                    return Job.objects.create(kind=kind, payload=payload, key=key, run_at=run_at)
+            except IntegrityError:
+                # Соседний процесс успел создать задачу с этим ключом — допишем в неё
+                continue
+    raise RuntimeError(f'Не удалось поставить задачу {kind} с ключом {key}')
+
+
+def claim_jobs(limit=50, now=None):
+    """Забирает созревшие задачи (и брошенные упавшими воркерами) на выполнение"""
+    now = now or timezone.now()
+    _, _, lock_seconds = _config()
+    due = Job.objects.filter(
+        Q(status=Job.PENDING, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now),
+    ).order_by('run_at')
+    with transaction.atomic():
+        _lock_queue()
+        ids = list(_for_update(due).values_list('pk', flat=True)[:limit])
+        # Ключ снимается: новые события пойдут в новую задачу, а не в выполняемую
+        Job.objects.filter(pk__in=ids).update(
+            status=Job.RUNNING, key=None, attempts=F('attempts') + 1,
+            locked_until=now + datetime.timedelta(seconds=lock_seconds),
+        )
+    return list(Job.objects.filter(pk__in=ids).order_by('run_at'))
+
+
+def run_job(job, now=None):
+    """Выполняет одну задачу; True — успешно"""
+    now = now or timezone.now()
+    max_attempts, retry_seconds, _ = _config()
+    try:
+        func = HANDLERS[job.kind]
+        func(job.payload)
+    except Exception:
+        logger.exception('Задача %s упала (попытка %d)', job, job.attempts)
+        if job.attempts >= max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.PENDING
+            job.run_at = now + datetime.timedelta(seconds=retry_seconds * 2 ** (job.attempts - 1))
+        job.locked_until = None
+        job.last_error = traceback.format_exc(limit=5)
+        job.save(update_fields=['status', 'run_at', 'locked_until', 'last_error'])
+        return False
+    job.delete()
+    return True
+
+
+def run_due_jobs(limit=50, now=None):
+    """Одна пачка: (выполнено, упало)"""
+    done = failed = 0
+    for job in claim_jobs(limit, now):
+        if run_job(job, now):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
@@ -0,0 +1,315 @@
+# core/loadtest.py
+"""
+Нагрузочный прогон смешанного трафика: N одновременных пользователей каждой
+роли ходят по дашборду, открывают машины, добавляют ТО и рекламации, выгружают
+Excel. Показывает то, чего не видно в одиночных бенчмарках (core/benchmarks.py):
+конкуренцию записей и чтений за SQLite и ошибки «database is locked».
+
+Транспорт — тестовый клиент Django прямо в процессе (у каждого потока своё
+соединение с БД) или HTTP к уже запущенному серверу (runserver, gunicorn, uvicorn).
+Запуск — команда `manage.py loadtest`.
+"""
+import datetime
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from http.cookiejar import Cookie, CookieJar
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from .benchmarks import percentile
+from .models import User, Machine, Maintenance, Claim, MaintenanceType, FailureNode, RecoveryMethod
+from .permissions import CLIENT, SERVICE, scope
+
+# Метка записей, созданных прогоном, — по ней они удаляются в конце
+MARKER = 'LOADTEST'
+
+CSRF_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class InProcessTransport:
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def get(self, url):
+        response = self.client.get(url)
+        return response.status_code, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def post(self, url, data, page):
+        return self.client.post(url, data).status_code
+
+    def close(self):
+        # Соединения с БД у каждого потока свои
+        connections.close_all()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTransport:
+    """HTTP к работающему серверу; сессия создаётся напрямую в БД, без пароля"""
+
+    def __init__(self, user, base_url):
+        self.base_url = base_url.rstrip('/')
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+
+        self.cookies = CookieJar()
+        host = urllib.parse.urlsplit(self.base_url).hostname
+        self.cookies.set_cookie(Cookie(
+            0, settings.SESSION_COOKIE_NAME, session.session_key, None, False, host, False, False,
+            '/', True, False, None, False, None, None, {},
+        ))
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect,
+        )
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+
+    def get(self, url):
+        return self._open(urllib.request.Request(self.base_url + url))
+
+    def post(self, url, data, page):
+        # CSRF-токен — из только что открытой формы (cookie csrftoken уже в cookiejar)
+        token = CSRF_RE.search(page.decode(errors='ignore'))
+        data = {**data, 'csrfmiddlewaretoken': token.group(1) if token else ''}
+        body = urllib.parse.urlencode(data).encode()
+        request = urllib.request.Request(
+            self.base_url + url, data=body, headers={'Referer': self.base_url + url},
+        )
+        return self._open(request)[0]
+
+    def close(self):
+        pass
+
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()     # шаг -> число ответов 5xx и исключений
+        self.lock_errors = Counter()  # шаг -> «database is locked»
+
+    def record(self, step, started, status=None, error=None):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.timings[step].append(elapsed)
+            if status is not None:
+                self.statuses[step][status] += 1
+            if error is not None and 'locked' in str(error):
+                self.lock_errors[step] += 1
+            elif error is not None or (status is not None and status >= 500):
+                self.errors[step] += 1
+
+    def summary(self, duration):
+        steps = {}
+        for step, values in sorted(self.timings.items()):
+            steps[step] = {
+                'requests': len(values),
+                'rps': round(len(values) / duration, 2),
+                'p50_ms': round(percentile(values, 0.5), 1),
+                'p95_ms': round(percentile(values, 0.95), 1),
+                'p99_ms': round(percentile(values, 0.99), 1),
+                'max_ms': round(max(values), 1),
+                'errors': self.errors[step],
+                'lock_errors': self.lock_errors[step],
+                'statuses': dict(self.statuses[step]),
+            }
+        total = sum(len(values) for values in self.timings.values())
+        return {
+            'duration_s': round(duration, 1),
+            'requests': total,
+            'rps': round(total / duration, 2) if duration else 0,
+            'errors': sum(self.errors.values()),
+            'lock_errors': sum(self.lock_errors.values()),
+            'steps': steps,
+        }
+
+
+class VirtualUser(threading.Thread):
+    """Один пользователь: сценарии по весам, между ними — пауза на «обдумывание»"""
+
+    def __init__(self, role, user, machines, directories, transport_factory, results,
+                 deadline, think_time, seed, iterations=None):
+        super().__init__(daemon=True)
+        self.role = role
+        self.user = user
+        self.machines = machines        # [(serial, service_company_id)]
+        self.directories = directories
+        self.transport_factory = transport_factory
+        self.results = results
+        self.deadline = deadline
+        self.think_time = think_time
+        self.iterations = iterations    # None — до конца прогона
+        self.random = random.Random(seed)
+
+        self.scenarios = [(self.browse_dashboard, 5), (self.open_machine, 3), (self.add_maintenance, 1),
+                          (self.export, 0.2)]
+        if role != CLIENT:
+            self.scenarios.append((self.add_claim, 0.5))
+
+    def run(self):
+        transport = self.transport_factory(self.user)
+        functions, weights = zip(*self.scenarios)
+        done = 0
+        try:
+            while time.monotonic() < self.deadline and (self.iterations is None or done < self.iterations):
+                self.random.choices(functions, weights)[0](transport)
+                done += 1
+                if self.think_time:
+                    time.sleep(self.random.expovariate(1 / self.think_time))
+        finally:
+            transport.close()
+
+    def _get(self, transport, step, url):
+        started = time.perf_counter()
+        try:
+            status, body = transport.get(url)
+        except Exception as exc:  # в процессе ошибка view пробрасывается тестовым клиентом
+            self.results.record(step, started, error=exc)
+            return None
+        self.results.record(step, started, status=status)
+        return body
+
+    def _post(self, transport, step, url, data, page):
+        started = time.perf_counter()
+        try:
+            status = transport.post(url, data, page)
+        except Exception as exc:
+            self.results.record(step, started, error=exc)
+            return
+        self.results.record(step, started, status=status)
+
+    def browse_dashboard(self, transport):
+        tab = self.random.choice(('machines', 'maintenance', 'claims'))
+        page = self.random.randint(1, 5)
+        self._get(transport, f'dashboard.{tab}', f"{reverse('core:dashboard')}?tab={tab}&page={page}")
+
+    def open_machine(self, transport):
+        serial, _ = self.random.choice(self.machines)
+        self._get(transport, 'machine_detail', reverse('core:machine_detail', args=[serial]))
+
+    def add_maintenance(self, transport):
+        serial, service_company_id = self.random.choice(self.machines)
+        url = reverse('core:maintenance_create', args=[serial])
+        page = self._get(transport, 'maintenance_create.form', url)
+        if page is None:
+            return
+        today = datetime.date.today().isoformat()
+        data = {
+            'type': self.random.choice(self.directories['types']),
+            'date': today,
+            'hours': self.random.randint(1, 10000),
+            'order_number': f'{MARKER}-{self.random.randint(1, 10 ** 6)}',
+            'order_date': today,
+        }
+        organization = self.user.pk if self.role == SERVICE else service_company_id
+        if organization:
+            data['organization'] = organization
+        if service_company_id:
+            data['service_company'] = service_company_id
+        self._post(transport, 'maintenance_create.post', url, data, page)
+
+    def add_claim(self, transport):
+        serial, service_company_id = self.random.choice(self.machines)
+        url = reverse('core:claim_create', args=[serial])
+        page = self._get(transport, 'claim_create.form', url)
+        if page is None:
+            return
+        data = {
+            'failure_date': datetime.date.today().isoformat(),
+            'hours': self.random.randint(1, 10000),
+            'failure_node': self.random.choice(self.directories['failure_nodes']),
+            'recovery_method': self.random.choice(self.directories['recovery_methods']),
+            'failure_description': MARKER,
+        }
+        if service_company_id:
+            data['service_company'] = service_company_id
+        self._post(transport, 'claim_create.post', url, data, page)
+
+    def export(self, transport):
+        self._get(transport, 'export_machines', reverse('core:export_machines'))
+
+
+def pick_users(role, count):
+    users = User.objects.filter(groups__name=role).order_by('pk')
+    if role == CLIENT:
+        users = users.annotate(machine_count=Count('client_machines')).filter(machine_count__gt=0)
+    elif role == SERVICE:
+        users = users.annotate(machine_count=Count('service_machines')).filter(machine_count__gt=0)
+    return list(users[:count])
+
+
+def user_machines(user, limit=500):
+    return list(scope(Machine.objects.order_by('pk'), user).values_list('serial_number', 'service_company_id')[:limit])
+
+
+def run(users_per_role, duration, think_time=0.0, base_url=None, seed=1, iterations=None):
+    """
+    users_per_role: {роль: число одновременных пользователей};
+    iterations — сколько сценариев выполняет каждый пользователь (None — до конца duration)
+    """
+    directories = {
+        'types': list(MaintenanceType.objects.values_list('pk', flat=True)),
+        'failure_nodes': list(FailureNode.objects.values_list('pk', flat=True)),
+        'recovery_methods': list(RecoveryMethod.objects.values_list('pk', flat=True)),
+    }
+    if base_url:
+        def transport_factory(user):
+            return HttpTransport(user, base_url)
+    else:
+        transport_factory = InProcessTransport
+
+    results = Results()
+    deadline = time.monotonic() + duration
+    threads = []
+    for role, count in users_per_role.items():
+        for index, user in enumerate(pick_users(role, count)):
+            machines = user_machines(user)
+            if not machines:
+                continue
+            threads.append(VirtualUser(
+                role, user, machines, directories, transport_factory, results,
+                deadline, think_time, seed=f'{seed}-{role}-{index}', iterations=iterations,
+            ))
+    if not threads:
+        return None
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = results.summary(time.perf_counter() - started)
+    summary['users'] = {role: sum(1 for t in threads if t.role == role) for role in users_per_role}
+    return summary
+
+
+def cleanup():
+    """Удаляет ТО и рекламации, созданные прогоном"""
+    maintenances, _ = Maintenance.objects.filter(order_number__startswith=f'{MARKER}-').delete()
+    claims, _ = Claim.objects.filter(failure_description=MARKER).delete()
+    return maintenances, claims
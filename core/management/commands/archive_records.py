@@ -0,0 +1,36 @@
+# core/management/commands/archive_records.py
+from django.core.management.base import BaseCommand
+
+from core.archive import ARCHIVES, archive_batches, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Переносит ТО и рекламации старше горизонта в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Горизонт в днях (по умолчанию settings.ARCHIVE_HORIZON_DAYS)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, сколько записей будет перенесено',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        self.stdout.write(f'Архивируем записи до {cutoff:%d.%m.%Y}')
+
+        for model, (_, date_field, _) in ARCHIVES.items():
+            name = model._meta.verbose_name_plural
+            if options['dry_run']:
+                count = model.objects.filter(**{f'{date_field}__lt': cutoff}).count()
+                self.stdout.write(f'{name}: к переносу {count}')
+                continue
+
+            total = 0
+            for moved in archive_batches(model, cutoff, options['batch_size']):
+                total += moved
+                self.stdout.write(f'{name}: перенесено {total}…')
+            self.stdout.write(self.style.SUCCESS(f'{name}: итого в архив {total}'))
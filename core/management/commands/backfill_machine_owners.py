@@ -0,0 +1,33 @@
+# core/management/commands/backfill_machine_owners.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from core.models import Claim, Maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        'Переписывает копию владельцев машины (machine_client, machine_service_company) '
+        'в ТО и рекламациях — после загрузок и массовых изменений в обход save()'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in (Maintenance, Claim):
+            name = model._meta.verbose_name_plural
+            bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+            if bounds['low'] is None:
+                self.stdout.write(f'{name}: записей нет')
+                continue
+
+            # Пачки по диапазонам pk: каждая — короткая транзакция, без долгой блокировки таблицы
+            total = 0
+            for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+                with transaction.atomic():
+                    total += model.objects.filter(pk__gte=start, pk__lt=start + batch_size).sync_machine_owners()
+                self.stdout.write(f'{name}: обновлено {total}…')
+            self.stdout.write(self.style.SUCCESS(f'{name}: итого {total}'))
@@ -0,0 +1,92 @@
+# core/management/commands/benchmark.py
+import json
+import logging
+import platform
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.benchmarks import build_scenarios, compare, run_scenario
+from core.models import Machine, Maintenance, Claim
+
+
+class Command(BaseCommand):
+    help = 'Замеряет ключевые страницы (время, SQL-запросы, память) и сравнивает с эталоном'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Замеров на сценарий')
+        parser.add_argument('--warmup', type=int, default=2, help='Прогревочных запросов на сценарий')
+        parser.add_argument(
+            '--pages', default='1,10,100',
+            help='Страницы дашборда через запятую (глубина пагинации)',
+        )
+        parser.add_argument('--only', default='', help='Только сценарии, чьё имя содержит подстроку')
+        parser.add_argument(
+            '--output', default=None,
+            help='Куда сохранить JSON (по умолчанию var/benchmarks/<время>.json)',
+        )
+        parser.add_argument('--baseline', default=None, help='JSON прошлого прогона для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p50 и памяти относительно эталона (доля, 0.2 = 20%%)',
+        )
+
+    def handle(self, *args, **options):
+        pages = [int(p) for p in options['pages'].split(',') if p.strip()]
+        # Структурный лог каждого запроса здесь только мешает (после прогона — обратно)
+        request_log = logging.getLogger('silant.requests')
+        was_disabled, request_log.disabled = request_log.disabled, True
+        try:
+            results = self.run_scenarios(pages, options)
+        finally:
+            request_log.disabled = was_disabled
+
+        report = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'machines': Machine.objects.count(),
+                'maintenances': Maintenance.objects.count(),
+                'claims': Claim.objects.count(),
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        output = Path(options['output'] or settings.BASE_DIR / 'var' / 'benchmarks' / f'{time.strftime("%Y%m%d-%H%M%S")}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        self.stdout.write(f'Результаты: {output}')
+
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Не удалось прочитать эталон: {exc}')
+            regressions = compare(results, baseline['results'], options['threshold'])
+            for name, metric, before, after in regressions:
+                self.stdout.write(self.style.ERROR(f'Регрессия {name}: {metric} {before} → {after}'))
+            if regressions:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно эталона нет'))
+
+    def run_scenarios(self, pages, options):
+        # Повторы поиска с одного адреса иначе упрутся в ограничение частоты на главной
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], SERIAL_SEARCH_BURST=10 ** 6):
+            scenarios = [s for s in build_scenarios(pages) if options['only'] in s.name]
+            if not scenarios:
+                raise CommandError('Нет сценариев: база пуста? Заполните её командой generate_fleet')
+
+            results = {}
+            for scenario in scenarios:
+                result = run_scenario(scenario, repeat=options['repeat'], warmup=options['warmup'])
+                results[scenario.name] = result
+                self.stdout.write(
+                    f'{scenario.name:<45} {result["status"]:>3}  p50 {result["p50_ms"]:>8.1f} ms  '
+                    f'p95 {result["p95_ms"]:>8.1f} ms  {result["queries"]:>4} SQL  {result["peak_kb"]:>9.1f} KB'
+                )
+        return results
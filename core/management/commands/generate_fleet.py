@@ -0,0 +1,269 @@
+# core/management/commands/generate_fleet.py
+import datetime
+import itertools
+import math
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import (
+    User, MachineModel, EngineModel, TransmissionModel, DriveAxleModel, SteerAxleModel,
+    Machine, MaintenanceType, FailureNode, RecoveryMethod, Maintenance, Claim,
+)
+from core.parts import reindex_claims
+from core.permissions import MANAGER, CLIENT, SERVICE
+
+DIRECTORIES = {
+    MachineModel: ['ПД1,5', 'ПД2,0', 'ПД3,0', 'ПД5,0', 'ПГ1,5', 'ПГ2,5', 'ПЭ1,5', 'ПЭ2,0'],
+    EngineModel: ['Kubota V2403', 'Kubota D1803', 'ММЗ Д-245.5С', 'Nissan K21', 'Mitsubishi S4S', 'ЯМЗ-53442'],
+    TransmissionModel: ['10VB-00106', '10VB-00201', 'HL-200', 'ZF 4WG-98', 'ГМП-1,5'],
+    DriveAxleModel: ['20VA-00101', '20VA-00205', 'Dana 112', 'ВМ-2,5'],
+    SteerAxleModel: ['VS20-00001', 'VS30-00010', 'УМ-1,5', 'Dana S100'],
+    MaintenanceType: ['ЕТО', 'ТО-1', 'ТО-2', 'ТО-3', 'СО (сезонное)', 'Капитальный ремонт'],
+    FailureNode: ['Двигатель', 'Трансмиссия', 'Ведущий мост', 'Управляемый мост',
+                  'Гидросистема', 'Электрооборудование', 'Мачта', 'Тормозная система'],
+    RecoveryMethod: ['Ремонт узла', 'Замена узла', 'Регулировка', 'Замена расходных материалов'],
+}
+
+PARTS = ['Фильтр масляный', 'Фильтр топливный', 'Фильтр воздушный', 'Ремень ГРМ', 'Помпа',
+         'Стартер', 'Генератор', 'Гидроцилиндр подъёма', 'Шланг РВД', 'Колодки тормозные',
+         'Подшипник ступицы', 'Сальник', 'Датчик давления масла', 'Цепь мачты', 'Аккумулятор']
+
+FAILURES = ['Течь масла из-под прокладки', 'Не запускается двигатель', 'Посторонний шум при движении',
+            'Не поднимается мачта', 'Перегрев двигателя', 'Не работают стоп-сигналы',
+            'Люфт рулевого колеса', 'Падение давления в гидросистеме']
+
+CITIES = ['Москва', 'Челябинск', 'Екатеринбург', 'Новосибирск', 'Казань', 'Пермь', 'Самара', 'Омск']
+
+EMAIL_DOMAIN = 'fleet.test'
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетический парк техники (машины, ТО, рекламации, пользователи) для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--machines', type=int, default=100_000)
+        parser.add_argument('--maintenance-per-machine', type=float, default=20,
+                            help='Среднее число ТО на машину')
+        parser.add_argument('--claims-per-machine', type=float, default=3,
+                            help='Среднее число рекламаций на машину')
+        parser.add_argument('--clients', type=int, default=2_000)
+        parser.add_argument('--service-companies', type=int, default=60)
+        parser.add_argument('--managers', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--prefix', default='GEN', help='Префикс зав. номеров сгенерированных машин')
+        parser.add_argument('--password', default='fleet-pass',
+                            help='Пароль всех сгенерированных пользователей')
+        parser.add_argument('--as-of', type=datetime.date.fromisoformat, default=datetime.date(2026, 1, 1),
+                            help='«Сегодня» для генератора (YYYY-MM-DD); фиксировано ради воспроизводимости')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix'].upper()
+
+        if Machine.objects.filter(serial_number__startswith=prefix).exists():
+            raise CommandError(f'Машины с префиксом {prefix} уже есть — укажите другой --prefix')
+
+        started = time.monotonic()
+        directories = self.create_directories()
+        users = self.create_users(options)
+        machine_ids = self.create_machines(options, prefix, directories, users)
+        self.create_history(options, machine_ids, directories, users)
+        # Машины, ТО и рекламации вставлены в обход save() — сигналы индексов не срабатывали
+        claims, entries = reindex_claims(Claim.objects.filter(machine__serial_number__startswith=prefix))
+        self.stdout.write(f'Запчасти: {entries} позиций в {claims} рекламациях')
+        call_command('rebuild_search_index', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Готово за {time.monotonic() - started:.0f} с'))
+
+    # ── справочники и пользователи ──
+
+    def create_directories(self):
+        directories = {}
+        for model, names in DIRECTORIES.items():
+            existing = {obj.name: obj.pk for obj in model.objects.filter(name__in=names)}
+            model.objects.bulk_create([model(name=name) for name in names if name not in existing])
+            directories[model] = list(model.objects.filter(name__in=names).values_list('pk', flat=True))
+        return directories
+
+    def create_users(self, options):
+        password = make_password(options['password'])  # хешируем один раз для всех
+        users = {}
+        for role, count, slug in (
+            (MANAGER, options['managers'], 'manager'),
+            (CLIENT, options['clients'], 'client'),
+            (SERVICE, options['service_companies'], 'service'),
+        ):
+            group, _ = Group.objects.get_or_create(name=role)
+            emails = [f'{slug}{i:05d}@{EMAIL_DOMAIN}' for i in range(count)]
+            existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+            User.objects.bulk_create(
+                [User(email=email, password=password) for email in emails if email not in existing],
+                batch_size=self.batch_size,
+            )
+            ids = list(User.objects.filter(email__in=emails).order_by('email').values_list('pk', flat=True))
+            Through = User.groups.through
+            Through.objects.bulk_create(
+                [Through(user_id=pk, group_id=group.pk) for pk in ids],
+                batch_size=self.batch_size, ignore_conflicts=True,
+            )
+            users[role] = ids
+            self.stdout.write(f'{role}: {len(ids)} пользователей')
+        return users
+
+    def weights(self, count):
+        # Парето: немногие крупные клиенты/сервисы владеют большой долей парка.
+        # Накопленные веса считаем один раз — choices() иначе пересчитывает их на каждый вызов
+        return list(itertools.accumulate(self.rng.paretovariate(1.2) for _ in range(count)))
+
+    # ── машины ──
+
+    def create_machines(self, options, prefix, directories, users):
+        rng = self.rng
+        clients, client_weights = users[CLIENT], self.weights(len(users[CLIENT]))
+        services, service_weights = users[SERVICE], self.weights(len(users[SERVICE]))
+        first_shipment = datetime.date(2012, 1, 1)
+        span_days = (options['as_of'] - first_shipment).days - 1
+
+        total = options['machines']
+        machine_ids = []
+        for start in range(0, total, self.batch_size):
+            batch = []
+            for i in range(start, min(start + self.batch_size, total)):
+                shipment = first_shipment + datetime.timedelta(days=int(span_days * rng.random() ** 0.7))
+                batch.append(Machine(
+                    serial_number=f'{prefix}{i:07d}',
+                    model_id=rng.choice(directories[MachineModel]),
+                    engine_model_id=rng.choice(directories[EngineModel]),
+                    engine_serial=f'E{rng.randrange(10**8):08d}',
+                    transmission_model_id=rng.choice(directories[TransmissionModel]),
+                    transmission_serial=f'T{rng.randrange(10**8):08d}',
+                    drive_axle_model_id=rng.choice(directories[DriveAxleModel]),
+                    drive_axle_serial=f'D{rng.randrange(10**8):08d}',
+                    steer_axle_model_id=rng.choice(directories[SteerAxleModel]),
+                    steer_axle_serial=f'S{rng.randrange(10**8):08d}',
+                    contract_number=f'{shipment.year}/{rng.randrange(1, 5000)}',
+                    contract_date=shipment - datetime.timedelta(days=rng.randrange(10, 120)),
+                    shipment_date=shipment,
+                    consignee=f'ООО «Склад-{rng.randrange(1, 900)}»',
+                    operation_address=f'г. {rng.choice(CITIES)}, ул. Промышленная, д. {rng.randrange(1, 200)}',
+                    options='Стандарт' if rng.random() < 0.6 else 'Боковое смещение каретки, кабина с отоплением',
+                    client_id=rng.choices(clients, cum_weights=client_weights)[0] if clients else None,
+                    service_company_id=rng.choices(services, cum_weights=service_weights)[0] if services else None,
+                ))
+            with transaction.atomic():
+                created = Machine.objects.bulk_create(batch)
+            machine_ids.extend((m.pk, m.shipment_date, m.client_id, m.service_company_id) for m in created)
+            self.stdout.write(f'Машины: {len(machine_ids)}/{total}')
+        return machine_ids
+
+    # ── ТО и рекламации ──
+    # Миллионы строк вставляются через executemany одним подготовленным INSERT:
+    # bulk_create тратит основное время на компиляцию SQL для пачек по ~90 строк
+    # (лимит параметров SQLite), а не на саму вставку.
+
+    # machine_client_id / machine_service_company_id — копия владельцев машины (см. MachineOwnedQuerySet)
+    MAINTENANCE_COLUMNS = ('machine_id', 'type_id', 'date', 'hours', 'order_number', 'order_date',
+                           'organization_id', 'service_company_id', 'machine_client_id',
+                           'machine_service_company_id', 'created_at', 'updated_at')
+    CLAIM_COLUMNS = ('machine_id', 'failure_date', 'hours', 'failure_node_id', 'failure_description',
+                     'recovery_method_id', 'parts_used', 'recovery_date', 'service_company_id',
+                     'machine_client_id', 'machine_service_company_id', 'created_at', 'updated_at')
+
+    def create_history(self, options, machine_ids, directories, users):
+        rng = self.rng
+        today = options['as_of']
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        maintenance_rate = options['maintenance_per_machine']
+        claim_rate = options['claims_per_machine']
+        maintenances, claims = [], []
+        total_maintenance = total_claims = 0
+
+        for machine_id, shipment, client_id, service_id in machine_ids:
+            age_days = max((today - shipment).days, 1)
+            # Старые машины имеют больше ТО: интенсивность пропорциональна возрасту
+            age_factor = min(age_days / 1825, 2.0)
+            hours_per_day = rng.uniform(4, 16)
+
+            count = self.poisson(maintenance_rate * age_factor)
+            for day in sorted(rng.randrange(age_days) for _ in range(count)):
+                date = (shipment + datetime.timedelta(days=day)).isoformat()
+                maintenances.append((
+                    machine_id,
+                    rng.choice(directories[MaintenanceType]),
+                    date,
+                    int(day * hours_per_day),
+                    f'ЗН-{rng.randrange(10**6):06d}',
+                    date,
+                    service_id,
+                    service_id,
+                    client_id,
+                    service_id,
+                    now,
+                    now,
+                ))
+
+            for _ in range(self.poisson(claim_rate * age_factor)):
+                day = rng.randrange(age_days)
+                failure_date = shipment + datetime.timedelta(days=day)
+                recovered = rng.random() < 0.85
+                recovery_date = failure_date + datetime.timedelta(days=int(rng.lognormvariate(1.5, 0.8)))
+                claims.append((
+                    machine_id,
+                    failure_date.isoformat(),
+                    int(day * hours_per_day),
+                    rng.choice(directories[FailureNode]),
+                    rng.choice(FAILURES),
+                    rng.choice(directories[RecoveryMethod]),
+                    '; '.join(
+                        f'{part} — {rng.randint(1, 4)} шт' for part in rng.sample(PARTS, rng.randint(0, 3))
+                    ),
+                    recovery_date.isoformat() if recovered and recovery_date <= today else None,
+                    service_id,
+                    client_id,
+                    service_id,
+                    now,
+                    now,
+                ))
+
+            if len(maintenances) >= self.batch_size:
+                total_maintenance += self.flush(Maintenance, self.MAINTENANCE_COLUMNS, maintenances)
+            if len(claims) >= self.batch_size:
+                total_claims += self.flush(Claim, self.CLAIM_COLUMNS, claims)
+                self.stdout.write(f'ТО: {total_maintenance}, рекламации: {total_claims}')
+
+        total_maintenance += self.flush(Maintenance, self.MAINTENANCE_COLUMNS, maintenances)
+        total_claims += self.flush(Claim, self.CLAIM_COLUMNS, claims)
+        self.stdout.write(f'ТО: {total_maintenance}, рекламации: {total_claims}')
+
+    def flush(self, model, columns, rows):
+        count = len(rows)
+        if count:
+            qn = connection.ops.quote_name
+            sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+                qn(model._meta.db_table),
+                ', '.join(qn(column) for column in columns),
+                ', '.join(['%s'] * len(columns)),
+            )
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+            rows.clear()
+        return count
+
+    def poisson(self, lam):
+        # Алгоритм Кнута; для больших lam — нормальное приближение
+        if lam > 30:
+            return max(0, int(self.rng.gauss(lam, lam ** 0.5)))
+        threshold, k, p = math.exp(-lam), 0, 1.0
+        while True:
+            p *= self.rng.random()
+            if p <= threshold:
+                return k
+            k += 1
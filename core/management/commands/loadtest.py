@@ -0,0 +1,72 @@
+# core/management/commands/loadtest.py
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core import loadtest
+from core.permissions import MANAGER, CLIENT, SERVICE
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный прогон: одновременные пользователи трёх ролей, чтения и записи вперемешку'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--managers', type=int, default=2, help='Одновременных менеджеров')
+        parser.add_argument('--clients', type=int, default=5, help='Одновременных клиентов')
+        parser.add_argument('--services', type=int, default=3, help='Одновременных сервисных организаций')
+        parser.add_argument('--duration', type=float, default=30, help='Длительность прогона, секунд')
+        parser.add_argument(
+            '--iterations', type=int, default=None,
+            help='Остановить пользователя после стольких сценариев, не дожидаясь конца --duration',
+        )
+        parser.add_argument(
+            '--think-time', type=float, default=0.0,
+            help='Средняя пауза пользователя между действиями, секунд (0 — без пауз)',
+        )
+        parser.add_argument(
+            '--base-url', default=None,
+            help='Адрес запущенного сервера (например http://127.0.0.1:8000); по умолчанию — прямо в процессе',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', default=None, help='Сохранить итоги в JSON')
+        parser.add_argument(
+            '--keep-data', action='store_true',
+            help='Не удалять созданные прогоном ТО и рекламации',
+        )
+
+    def handle(self, *args, **options):
+        logging.getLogger('silant.requests').disabled = True
+        users = {MANAGER: options['managers'], CLIENT: options['clients'], SERVICE: options['services']}
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                summary = loadtest.run(
+                    users, options['duration'], think_time=options['think_time'],
+                    base_url=options['base_url'], seed=options['seed'], iterations=options['iterations'],
+                )
+            finally:
+                if not options['keep_data']:
+                    maintenances, claims = loadtest.cleanup()
+                    self.stdout.write(f'Удалено созданных прогоном записей: ТО {maintenances}, рекламаций {claims}')
+        if summary is None:
+            raise CommandError('Нет пользователей с машинами: заполните базу командой generate_fleet')
+
+        self.stdout.write(
+            f'Пользователей: {summary["users"]}, {summary["duration_s"]} с, '
+            f'{summary["requests"]} запросов, {summary["rps"]} запр/с'
+        )
+        for step, row in summary['steps'].items():
+            self.stdout.write(
+                f'{step:<28} {row["requests"]:>6}  {row["rps"]:>7.2f}/с  p50 {row["p50_ms"]:>8.1f}  '
+                f'p95 {row["p95_ms"]:>8.1f}  p99 {row["p99_ms"]:>8.1f}  max {row["max_ms"]:>8.1f} мс  '
+                f'ошибок {row["errors"]}  блокировок {row["lock_errors"]}'
+            )
+        style = self.style.ERROR if summary['errors'] or summary['lock_errors'] else self.style.SUCCESS
+        self.stdout.write(style(f'Ошибок: {summary["errors"]}, «database is locked»: {summary["lock_errors"]}'))
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(summary, ensure_ascii=False, indent=2))
@@ -0,0 +1,22 @@
+# core/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.search import INDEXES, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает полнотекстовый индекс рекламаций и машин (core/search.py) — '
+        'после загрузок в обход save() и изменений стеммера'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        for model in INDEXES:
+            # Одна транзакция на таблицу: поиск не видит наполовину пустой индекс
+            with transaction.atomic():
+                total = rebuild(model, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name_plural}: {total}'))
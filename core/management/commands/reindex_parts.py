@@ -0,0 +1,23 @@
+# core/management/commands/reindex_parts.py
+from django.core.management.base import BaseCommand
+
+from core.models import Claim, Part
+from core.parts import reindex_claims
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает индекс запасных частей (ClaimPart) по тексту parts_used рекламаций — '
+        'после загрузок в обход save() и изменения правил разбора'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        claims, entries = reindex_claims(Claim.objects.all(), batch_size=options['batch_size'])
+        # Запчасти, которых не осталось ни в одной рекламации (опечатки, старые правила разбора)
+        unused, _ = Part.objects.filter(claim_entries__isnull=True).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекламаций: {claims}, позиций: {entries}, удалено неиспользуемых запчастей: {unused}'
+        ))
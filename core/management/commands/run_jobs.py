@@ -0,0 +1,36 @@
+# core/management/commands/run_jobs.py
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import run_due_jobs
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди задач (core/jobs.py): выполняет созревшие задачи, пока не остановят'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Задач за один заход')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Пауза, когда очередь пуста, секунд')
+        parser.add_argument('--once', action='store_true', help='Выполнить созревшие задачи и выйти')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        # SIGTERM (деплой, systemd) — доделать текущую пачку и выйти
+        signal.signal(signal.SIGTERM, self.stop)
+
+        while not self.stopping:
+            done, failed = run_due_jobs(options['batch_size'])
+            if done or failed:
+                self.stdout.write(f'выполнено {done}, с ошибкой {failed}')
+            if options['once'] and not (done or failed):
+                break
+            if not (done or failed):
+                close_old_connections()
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS('Воркер остановлен'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,52 @@
+# core/management/commands/sync_replica.py
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite-базу в реплику через online backup API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять синхронизацию каждые N секунд (0 — один раз)',
+        )
+        parser.add_argument(
+            '--pages', type=int, default=1024,
+            help='Сколько страниц копировать за шаг (между шагами писатели не блокируются)',
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            raise CommandError('Реплика не настроена: задайте переменную окружения SILANT_REPLICA_DB')
+
+        primary = settings.DATABASES['default']
+        replica = settings.DATABASES[REPLICA_ALIAS]
+        for alias, db in (('default', primary), (REPLICA_ALIAS, replica)):
+            if db['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f'sync_replica работает только с SQLite (база «{alias}»)')
+
+        while True:
+            started = time.monotonic()
+            self._backup(str(primary['NAME']), str(replica['NAME']), options['pages'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Реплика обновлена за {time.monotonic() - started:.2f} с'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def _backup(self, source_path, target_path, pages):
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            with target:
+                source.backup(target, pages=pages)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,252 @@
+# core/metrics.py
+"""
+Внутрипроцессный реестр метрик: гистограммы и счётчики.
+
+Каждый воркер копит значения в памяти и раз в METRICS_FLUSH_SECONDS
+сбрасывает свой снимок в METRICS_DIR/<host>-<pid>.json. Эндпоинт /metrics/
+суммирует снимки всех воркеров и отдаёт их в текстовом формате Prometheus,
+плюс оценки p50/p95/p99 — чтобы смотреть регрессии без внешних сервисов.
+Снимок, не обновлявшийся STALE_FLUSHES интервалов сброса, считается снимком
+завершившегося воркера и удаляется; простаивавший воркер запишет свой
+заново при следующем сбросе.
+Каталог стоит очищать при деплое: тогда цифры относятся к текущей версии.
+"""
+import atexit
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 10, 15, 20, 30, 50, 100, 200, 500)
+QUANTILES = (0.5, 0.95, 0.99)
+STALE_FLUSHES = 6
+
+HELP = {
+    'silant_request_duration_ms': 'Время обработки запроса по имени URL, мс',
+    'silant_request_queries': 'Число SQL-запросов на запрос по имени URL',
+    'silant_requests_total': 'Число запросов по имени URL и коду ответа',
+    'silant_export_duration_ms': 'Время формирования экспорта, мс',
+    'silant_sql_duration_ms': 'Время выполнения SQL по отпечатку запроса (только выборка запросов), мс',
+    'silant_cache_requests_total': 'Обращения к кешам: hit/miss',
+    'silant_serial_lookups_total': 'Поиск по зав. номеру на главной: отсечён фильтром / найден / ложное срабатывание',
+    'silant_rate_limited_total': 'Запросы, отклонённые ограничением частоты',
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}   # (name, labels) -> {'buckets': (...), 'counts': [...], 'sum': float, 'count': int}
+        self._counters = {}     # (name, labels) -> float
+        self._sql_texts = {}    # отпечаток -> начало SQL (для silant_sql_fingerprint_info)
+        self._last_flush = time.monotonic()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS_MS, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {
+                    'buckets': list(buckets), 'counts': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0,
+                }
+            hist['counts'][bisect.bisect_left(hist['buckets'], value)] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+        self.maybe_flush()
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self.maybe_flush()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000, **labels)
+
+    def observe_sql(self, sql, duration_ms, view):
+        fingerprint = hashlib.sha1(sql.encode()).hexdigest()[:12]
+        with self._lock:
+            self._sql_texts.setdefault(fingerprint, sql[:200])
+        self.observe('silant_sql_duration_ms', duration_ms, fingerprint=fingerprint, view=view)
+
+    def cache_hit(self, cache):
+        self.inc('silant_cache_requests_total', cache=cache, result='hit')
+
+    def cache_miss(self, cache):
+        self.inc('silant_cache_requests_total', cache=cache, result='miss')
+
+    # ── общий снимок для всех воркеров ──
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': [
+                    [name, dict(labels), {**hist, 'counts': list(hist['counts'])}]
+                    for (name, labels), hist in self._histograms.items()
+                ],
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'sql': dict(self._sql_texts),
+            }
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= getattr(settings, 'METRICS_FLUSH_SECONDS', 10):
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        directory = metrics_dir()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{_worker_id()}.json'
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.snapshot(), ensure_ascii=False))
+        os.replace(tmp, path)
+
+
+def metrics_dir():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    return Path(directory) if directory else None
+
+
+def _worker_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def collect():
+    """Снимки всех воркеров (свой — из памяти, а не с диска), просуммированные"""
+    snapshots = [registry.snapshot()]
+    directory = metrics_dir()
+    if directory is not None and directory.exists():
+        own = f'{_worker_id()}.json'
+        stale_before = time.time() - STALE_FLUSHES * getattr(settings, 'METRICS_FLUSH_SECONDS', 10)
+        for path in sorted(directory.glob('*.json')):
+            if path.name == own:
+                continue
+            try:
+                if path.stat().st_mtime < stale_before:
+                    path.unlink(missing_ok=True)
+                    continue
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue  # файл пишется прямо сейчас или повреждён
+
+    histograms, counters, sql = {}, {}, {}
+    for snap in snapshots:
+        # Время SQL по отпечаткам — гистограммы ниже; здесь только тексты отпечатков
+        for fingerprint, text in snap.get('sql', {}).items():
+            sql.setdefault(fingerprint, text)
+        for name, labels, value in snap['counters']:
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap['histograms']:
+            key = _key(name, labels)
+            total = histograms.get(key)
+            if total is None:
+                histograms[key] = {**hist, 'counts': list(hist['counts'])}
+                continue
+            if total['buckets'] != hist['buckets']:
+                # Воркер другой версии с другими корзинами — такие счётчики не сложить
+                logger.warning('Метрика %s%s: корзины воркера не совпадают, снимок пропущен', name, dict(labels))
+                continue
+            total['counts'] = [a + b for a, b in zip(total['counts'], hist['counts'])]
+            total['sum'] += hist['sum']
+            total['count'] += hist['count']
+    return histograms, counters, sql
+
+
+def estimate_quantile(hist, q):
+    """Квантиль по корзинам гистограммы с линейной интерполяцией внутри корзины"""
+    if not hist['count']:
+        return None
+    rank = q * hist['count']
+    seen = 0
+    lower = 0
+    for upper, count in zip(hist['buckets'] + [None], hist['counts']):
+        if seen + count >= rank and count:
+            if upper is None:
+                return float(lower)
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+        if upper is not None:
+            lower = upper
+    return float(lower)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def render_prometheus():
+    histograms, counters, sql = collect()
+    lines = []
+    seen_types = set()
+
+    def header(name, kind):
+        if name in seen_types:
+            return
+        seen_types.add(name)
+        if name in HELP:
+            lines.append(f'# HELP {name} {HELP[name]}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, 'counter')
+        lines.append(f'{name}{_labels(labels)} {value}')
+
+    for (name, labels), hist in sorted(histograms.items()):
+        header(name, 'histogram')
+        cumulative = 0
+        for upper, count in zip(hist['buckets'], hist['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(labels, le=upper)} {cumulative}')
+        lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {hist["count"]}')
+        lines.append(f'{name}_sum{_labels(labels)} {hist["sum"]:.3f}')
+        lines.append(f'{name}_count{_labels(labels)} {hist["count"]}')
+
+    # Готовые оценки квантилей — чтобы не нужен был Prometheus для p95
+    for (name, labels), hist in sorted(histograms.items()):
+        estimate = f'{name}_estimate'
+        header(estimate, 'gauge')
+        for q in QUANTILES:
+            value = estimate_quantile(hist, q)
+            if value is not None:
+                lines.append(f'{estimate}{_labels(labels, quantile=q)} {value:.3f}')
+
+    if sql:
+        header('silant_sql_fingerprint_info', 'gauge')
+        for fingerprint, text in sorted(sql.items()):
+            lines.append(f'silant_sql_fingerprint_info{_labels((), fingerprint=fingerprint, sql=text)} 1')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,366 @@
+# core/middleware.py
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .audit import reset_request, set_request
+from .compression import (
+    COMPRESSIBLE_TYPES, MIN_SIZE, acompress_stream, compress, compress_stream, negotiate,
+)
+from .instrumentation import current_stats, finish_request, start_request
+from .metrics import QUERY_COUNT_BUCKETS, registry
+from .profiling import arun_profiled, run_profiled, save_profile
+from .routers import (
+    enable_replica_reads, replica_configured, reset_replica_reads, view_allows_replica,
+)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Ключ сессии: до какого момента читаем только с основной БД после записи
+STICKY_SESSION_KEY = '_replica_sticky_until'
+
+
+class HybridMiddleware:
+    """
+    Основа для middleware, работающих и под WSGI, и под ASGI без переходов
+    sync<->async (как django.utils.deprecation.MiddlewareMixin): в цепочке
+    с async-view вызывается __acall__, иначе handle(). Наследник
+    переопределяет оба; по умолчанию запрос просто передаётся дальше.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+def cached_user(request):
+    """Пользователь, если его уже загрузили (без запроса к БД из middleware)"""
+    user = getattr(request, '_cached_user', None) or getattr(request, '_acached_user', None)
+    return user if user is not None and user.is_authenticated else None
+
+
+class AuditMiddleware(HybridMiddleware):
+    """Запрос — в contextvar, чтобы журнал изменений (core/audit.py) знал пользователя"""
+
+    def handle(self, request):
+        token = set_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_request(token)
+
+    async def __acall__(self, request):
+        token = set_request(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            reset_request(token)
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Включает чтение с реплики для view, помеченных @replica_reads.
+
+    После успешного изменяющего запроса пользователь на REPLICA_STICKY_SECONDS
+    «прилипает» к основной БД, чтобы увидеть свои же изменения
+    (редирект после сохранения формы, дашборд после удаления и т.п.).
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.is_async:
+            # Флаг реплики — contextvar: его нужно ставить в том же контексте,
+            # где потом сбрасываем, а не в потоке sync_to_async
+            self.process_view = self.aprocess_view
+
+    def handle(self, request):
+        request._replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request._replica_token is not None:
+                reset_replica_reads(request._replica_token)
+
+        if self.sticks(request, response) and hasattr(request, 'user') and request.user.is_authenticated:
+            request.session[STICKY_SESSION_KEY] = self.sticky_until()
+        return response
+
+    async def __acall__(self, request):
+        request._replica_token = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            if request._replica_token is not None:
+                reset_replica_reads(request._replica_token)
+
+        if self.sticks(request, response) and hasattr(request, 'auser') and (await request.auser()).is_authenticated:
+            await request.session.aset(STICKY_SESSION_KEY, self.sticky_until())
+        return response
+
+    def sticks(self, request, response):
+        return (
+            replica_configured()
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and not getattr(request, '_replica_view', False)
+        )
+
+    def sticky_until(self):
+        return time.time() + getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_configured() or not view_allows_replica(view_func):
+            return None
+        request._replica_view = True
+
+        sticky_until = request.session.get(STICKY_SESSION_KEY) if hasattr(request, 'session') else None
+        if sticky_until and sticky_until > time.time():
+            return None
+
+        request._replica_token = enable_replica_reads()
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_configured() or not view_allows_replica(view_func):
+            return None
+        request._replica_view = True
+
+        sticky_until = await request.session.aget(STICKY_SESSION_KEY) if hasattr(request, 'session') else None
+        if sticky_until and sticky_until > time.time():
+            return None
+
+        request._replica_token = enable_replica_reads()
+        return None
+
+
+request_logger = logging.getLogger('silant.requests')
+
+INSTRUMENTATION_DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.05,        # доля запросов с подробной статистикой и структурным логом
+    'SLOW_REQUEST_MS': 1000,    # медленные запросы логируются всегда
+    'DUPLICATE_THRESHOLD': 3,   # столько одинаковых SQL за запрос — подозрение на N+1
+    'SERVER_TIMING': True,
+}
+
+
+def instrumentation_settings():
+    return {**INSTRUMENTATION_DEFAULTS, **getattr(settings, 'SILANT_INSTRUMENTATION', {})}
+
+
+class RequestInstrumentationMiddleware(HybridMiddleware):
+    """
+    Считает SQL-запросы, время в БД, рендер шаблонов и общее время запроса.
+
+    Счётчик запросов и времени работает всегда (это дёшево) и уходит
+    в заголовок Server-Timing. Отпечатки запросов (поиск N+1), время
+    шаблонов и JSON-строка в логе `silant.requests` — только для доли
+    SAMPLE_RATE запросов, а также для медленных.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.config = instrumentation_settings()
+
+    def handle(self, request):
+        if not self.config['ENABLED']:
+            return self.get_response(request)
+
+        stats, token = start_request(detailed=random.random() < self.config['SAMPLE_RATE'])
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        if not self.config['ENABLED']:
+            return await self.get_response(request)
+
+        stats, token = start_request(detailed=random.random() < self.config['SAMPLE_RATE'])
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        total_ms = stats.elapsed * 1000
+        if self.config['SERVER_TIMING']:
+            response['Server-Timing'] = self.server_timing(stats, total_ms)
+        self.record_metrics(request, response, stats, total_ms)
+
+        if stats.detailed or total_ms >= self.config['SLOW_REQUEST_MS']:
+            self.log(request, response, stats, total_ms)
+        return response
+
+    def server_timing(self, stats, total_ms):
+        parts = [f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries"']
+        if stats.detailed:
+            parts.append(f'tpl;dur={stats.template_time * 1000:.1f}')
+        parts.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(parts)
+
+    def record_metrics(self, request, response, stats, total_ms):
+        # Неразрешённые URL (404 сканеров и т.п.) сводим в одну метку, чтобы не плодить ряды
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        registry.observe('silant_request_duration_ms', total_ms, view=view, method=request.method)
+        registry.observe('silant_request_queries', stats.queries, buckets=QUERY_COUNT_BUCKETS, view=view)
+        registry.inc('silant_requests_total', view=view, status=response.status_code)
+        if stats.query_log:
+            for sql, duration in stats.query_log:
+                registry.observe_sql(sql, duration * 1000, view)
+
+    def log(self, request, response, stats, total_ms):
+        match = getattr(request, 'resolver_match', None)
+        user = cached_user(request)
+        duplicates = stats.duplicates(self.config['DUPLICATE_THRESHOLD'])
+        payload = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'user_id': user.pk if user is not None else None,
+            'duration_ms': round(total_ms, 1),
+            'queries': stats.queries,
+            'sql_ms': round(stats.sql_time * 1000, 1),
+            'template_ms': round(stats.template_time * 1000, 1) if stats.detailed else None,
+            'duplicates': [{'sql': sql, 'count': count} for sql, count in duplicates[:5]],
+        }
+        level = logging.WARNING if duplicates or total_ms >= self.config['SLOW_REQUEST_MS'] else logging.INFO
+        request_logger.log(level, json.dumps(payload, ensure_ascii=False))
+
+
+PROFILE_HEADER = 'HTTP_X_SILANT_PROFILE'
+PROFILE_PARAM = '_profile'
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """
+    Профилирует запрос по требованию персонала: заголовок `X-Silant-Profile: 1`
+    или параметр `?_profile=1`. Для остальных пользователей ничего не делает.
+
+    Профиль (pstats + свёрнутые стеки) сохраняется в PROFILE_DIR, его
+    идентификатор возвращается в заголовке ответа X-Silant-Profile;
+    список последних профилей — на странице /profiles/. Пока в процессе
+    профилируется другой запрос, запрос выполняется без профиля, а в
+    заголовке — `busy`.
+    Стоит после AuthenticationMiddleware.
+
+    Под ASGI профилируется поток event loop: в профиль попадут и другие
+    запросы, обрабатываемые в это же время, — это инструмент для отладки.
+    """
+
+    def handle(self, request):
+        user = getattr(request, 'user', None)
+        if not self.requested(request, user):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        response, profiler, sampler = run_profiled(self.get_response, request)
+        return self.finish(request, response, profiler, sampler, user, started)
+
+    async def __acall__(self, request):
+        user = await request.auser() if hasattr(request, 'auser') else None
+        if not self.requested(request, user):
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        response, profiler, sampler = await arun_profiled(self.get_response, request)
+        return self.finish(request, response, profiler, sampler, user, started)
+
+    def finish(self, request, response, profiler, sampler, user, started):
+        if profiler is None:
+            response['X-Silant-Profile'] = 'busy'
+            return response
+        match = getattr(request, 'resolver_match', None)
+        stats = current_stats()
+        profile_id = save_profile(profiler, sampler, {
+            'path': request.get_full_path(),
+            'method': request.method,
+            'view': match.view_name if match else None,
+            'user': user.get_username(),
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'queries': stats.queries if stats is not None else None,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        response['X-Silant-Profile'] = profile_id
+        return response
+
+    def requested(self, request, user):
+        if request.META.get(PROFILE_HEADER) != '1' and request.GET.get(PROFILE_PARAM) != '1':
+            return False
+        return user is not None and user.is_active and user.is_staff
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """
+    gzip/brotli для HTML, JSON, CSV и текста, включая потоковые ответы.
+    Аналог django.middleware.gzip.GZipMiddleware с поддержкой brotli
+    (core/compression.py). Ставится перед всем, что читает тело ответа.
+    """
+
+    def handle(self, request):
+        return self.process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process(request, await self.get_response(request))
+
+    def process(self, request, response):
+        if not self.compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            if len(response.content) < MIN_SIZE:
+                return response
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # Тело изменилось — сильный ETag больше не верен
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        return content_type in COMPRESSIBLE_TYPES
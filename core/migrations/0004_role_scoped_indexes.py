@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:15
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_failurenode_maintenancetype_recoverymethod_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['-failure_date'], name='core_claim_failure_1375ab_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['machine', '-failure_date'], name='core_claim_machine_6bb3d9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['service_company', '-failure_date'], name='core_claim_service_ba71b0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['client', '-shipment_date'], name='core_machin_client__dcb912_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['service_company', '-shipment_date'], name='core_machin_service_b015c6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(django.db.models.functions.text.Upper('serial_number'), name='core_machine_serial_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['-date'], name='core_mainte_date_509127_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['machine', '-date'], name='core_mainte_machine_331620_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['organization', '-date'], name='core_mainte_organiz_110cf0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['service_company', '-date'], name='core_mainte_service_6e035f_idx'),
+        ),
+    ]
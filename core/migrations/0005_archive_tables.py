@@ -0,0 +1,62 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_role_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedClaim',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('failure_date', models.DateField(verbose_name='дата отказа')),
+                ('hours', models.IntegerField(default=0, verbose_name='наработка, м/час')),
+                ('failure_description', models.TextField(blank=True, verbose_name='описание отказа')),
+                ('parts_used', models.TextField(blank=True, verbose_name='используемые запасные части')),
+                ('recovery_date', models.DateField(blank=True, null=True, verbose_name='дата восстановления')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('failure_node', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_claims', to='core.failurenode', verbose_name='узел отказа')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_claims', to='core.machine', verbose_name='машина')),
+                ('recovery_method', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_claims', to='core.recoverymethod', verbose_name='способ восстановления')),
+                ('service_company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_service_claims', to=settings.AUTH_USER_MODEL, verbose_name='сервисная компания')),
+            ],
+            options={
+                'verbose_name': 'рекламация (архив)',
+                'verbose_name_plural': 'рекламации (архив)',
+                'ordering': ['-failure_date'],
+                'indexes': [models.Index(fields=['machine', '-failure_date'], name='core_archiv_machine_359ec9_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedMaintenance',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='дата проведения ТО')),
+                ('hours', models.IntegerField(default=0, verbose_name='наработка, м/час')),
+                ('order_number', models.CharField(blank=True, max_length=100, verbose_name='№ заказ-наряда')),
+                ('order_date', models.DateField(blank=True, null=True, verbose_name='дата заказ-наряда')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_maintenances', to='core.machine', verbose_name='машина')),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_performed_maintenances', to=settings.AUTH_USER_MODEL, verbose_name='организация, проводившая ТО')),
+                ('service_company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_service_maintenances', to=settings.AUTH_USER_MODEL, verbose_name='сервисная компания')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_maintenances', to='core.maintenancetype', verbose_name='вид ТО')),
+            ],
+            options={
+                'verbose_name': 'ТО (архив)',
+                'verbose_name_plural': 'ТО (архив)',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['machine', '-date'], name='core_archiv_machine_6da3df_idx')],
+            },
+        ),
+    ]
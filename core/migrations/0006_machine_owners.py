@@ -0,0 +1,63 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_machine_owners(apps, schema_editor):
+    # Одним UPDATE на таблицу, до создания индексов — так быстрее
+    Machine = apps.get_model('core', 'Machine')
+    machine = Machine.objects.filter(pk=models.OuterRef('machine_id'))
+    for name in ('Maintenance', 'Claim'):
+        apps.get_model('core', name).objects.update(
+            machine_client=models.Subquery(machine.values('client_id')[:1]),
+            machine_service_company=models.Subquery(machine.values('service_company_id')[:1]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claim',
+            name='machine_client',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='клиент машины'),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='machine_service_company',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='сервисная компания машины'),
+        ),
+        migrations.AddField(
+            model_name='maintenance',
+            name='machine_client',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='клиент машины'),
+        ),
+        migrations.AddField(
+            model_name='maintenance',
+            name='machine_service_company',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='сервисная компания машины'),
+        ),
+        migrations.RunPython(copy_machine_owners, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['machine_client', '-failure_date'], name='core_claim_machine_51d684_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['machine_service_company', '-failure_date'], name='core_claim_machine_983289_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['machine_client', '-date'], name='core_mainte_machine_513d02_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['machine_service_company', '-date'], name='core_mainte_machine_879b45_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:58
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_machine_owners'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='когда')),
+                ('action', models.CharField(choices=[('create', 'создание'), ('update', 'изменение'), ('delete', 'удаление')], max_length=6, verbose_name='действие')),
+                ('model', models.CharField(max_length=20, verbose_name='модель')),
+                ('object_id', models.BigIntegerField(verbose_name='id записи')),
+                ('changes', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='изменения')),
+                ('machine', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.machine', verbose_name='машина')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='кто')),
+            ],
+            options={
+                'verbose_name': 'запись журнала',
+                'verbose_name_plural': 'журнал изменений',
+                'indexes': [models.Index(fields=['machine', '-id'], name='core_audite_machine_47dcaf_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourMeterChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(verbose_name='первое показание')),
+                ('end', models.DateTimeField(verbose_name='последнее показание')),
+                ('count', models.PositiveIntegerField(verbose_name='показаний')),
+                ('first_hours', models.IntegerField(verbose_name='первая наработка, 0,1 м/час')),
+                ('last_hours', models.IntegerField(verbose_name='последняя наработка, 0,1 м/час')),
+                ('data', models.BinaryField(verbose_name='данные')),
+                ('open', models.BooleanField(default=True, verbose_name='дописывается')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hour_meter_chunks', to='core.machine', verbose_name='машина')),
+            ],
+            options={
+                'verbose_name': 'пачка показаний счётчика',
+                'verbose_name_plural': 'показания счётчика моточасов',
+                'indexes': [models.Index(fields=['machine', '-end'], name='core_hourme_machine_722b53_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('open', True)), fields=('machine',), name='one_open_chunk_per_machine')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.parts import parse_parts
+
+
+def index_existing_claims(apps, schema_editor, batch_size=2000):
+    # Позиции уже заведённых рекламаций; дальше индекс ведут сигналы (core/parts.py)
+    Claim = apps.get_model('core', 'Claim')
+    Part = apps.get_model('core', 'Part')
+    ClaimPart = apps.get_model('core', 'ClaimPart')
+    claims = Claim.objects.exclude(parts_used='').order_by('pk').values_list('pk', 'parts_used')
+    ids = {}
+    last_pk = 0
+    while True:
+        rows = list(claims.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        parsed = {pk: parse_parts(text) for pk, text in rows}
+        missing = {}
+        for items in parsed.values():
+            for key, (name, _) in items.items():
+                if key not in ids:
+                    missing.setdefault(key, name)  # название — первое встреченное написание
+        Part.objects.bulk_create(Part(key=key, name=name[:200]) for key, name in missing.items())
+        ids.update(Part.objects.filter(key__in=list(missing)).values_list('key', 'pk'))
+        ClaimPart.objects.bulk_create(
+            ClaimPart(claim_id=pk, part_id=ids[key], quantity=quantity)
+            for pk, items in parsed.items()
+            for key, (_, quantity) in items.items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_hour_meter_chunks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Part',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='название')),
+                ('key', models.CharField(max_length=200, unique=True, verbose_name='ключ поиска')),
+            ],
+            options={
+                'verbose_name': 'запасная часть',
+                'verbose_name_plural': 'запасные части',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClaimPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='количество')),
+                ('claim', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_entries', to='core.claim', verbose_name='рекламация')),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='claim_entries', to='core.part', verbose_name='запасная часть')),
+            ],
+            options={
+                'verbose_name': 'запчасть в рекламации',
+                'verbose_name_plural': 'запчасти в рекламациях',
+                'constraints': [models.UniqueConstraint(fields=('part', 'claim'), name='claim_part_unique')],
+            },
+        ),
+        migrations.RunPython(index_existing_claims, migrations.RunPython.noop),
+    ]
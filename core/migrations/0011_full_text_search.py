@@ -0,0 +1,151 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:09
+
+import re
+
+import core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Таблицы FTS5 хранят основы слов (core/search.py), поэтому токенизатор — простой;
+# rank — bm25 с весами столбцов. Таблицы заполняются существующими рекламациями и машинами.
+FTS_TABLES = {
+    'core_claim_fts': ('Claim', ('failure_description', 'parts_used'), (1.0, 0.5)),
+    'core_machine_fts': ('Machine', ('serial_number', 'consignee', 'operation_address', 'options'), (4.0, 2.0, 1.0, 1.0)),
+}
+
+
+# Стеммер — копия core/utils/stemmer.py на момент миграции: его правки не должны
+# менять то, что записывает уже выпущенная миграция. Основы, записанные старой
+# версией, обновляет `manage.py rebuild_search_index`.
+VOWELS = 'аеиоуыэюя'
+
+
+def _endings(words):
+    return '|'.join(sorted(words.split(), key=len, reverse=True))
+
+
+PERFECTIVE_GERUND = re.compile(
+    rf'(?:(?<=[ая])(?:{_endings("в вши вшись")})|(?:{_endings("ив ивши ившись ыв ывши ывшись")}))$'
+)
+ADJECTIVE = _endings('ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую юю ая яя ою ею')
+PARTICIPLE = rf'(?<=[ая])(?:{_endings("ем нн вш ющ щ")})|(?:{_endings("ивш ывш ующ")})'
+ADJECTIVAL = re.compile(rf'(?:{PARTICIPLE})?(?:{ADJECTIVE})$')
+REFLEXIVE = re.compile(r'(?:ся|сь)$')
+VERB = re.compile(
+    rf'(?:(?<=[ая])(?:{_endings("ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно")})'
+    rf'|(?:{_endings("ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят ует уют ит ыт ены ить ыть ишь ую ю")}))$'
+)
+NOUN = re.compile(
+    rf'(?:{_endings("а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам ом о у ах иях ях ы ь ию ью ю ия ья я")})$'
+)
+SUPERLATIVE = re.compile(r'(?:ейше|ейш)$')
+DERIVATIONAL = re.compile(r'(?:ость|ост)$')
+CYRILLIC = re.compile(r'[а-я]')
+
+
+def _region(word, start):
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _cut(pattern, text):
+    match = pattern.search(text)
+    return (text[:match.start()], True) if match else (text, False)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv_start = next((i + 1 for i, letter in enumerate(word) if letter in VOWELS), len(word))
+    r2_start = _region(word, _region(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    rv, found = _cut(PERFECTIVE_GERUND, rv)
+    if not found:
+        rv, _ = _cut(REFLEXIVE, rv)
+        for pattern in (ADJECTIVAL, VERB, NOUN):
+            rv, found = _cut(pattern, rv)
+            if found:
+                break
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    match = DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+
+    rv, found = _cut(SUPERLATIVE, rv)
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif not found and rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
+
+
+def _stems(text):
+    return ' '.join(stem(word) for word in re.findall(r'\w+', text or ''))
+
+
+def create_fts_tables(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других СУБД поиск работает через LIKE (core/search.py)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, (model_name, columns, weights) in FTS_TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(columns)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {table}({table}, rank) VALUES ('rank', 'bm25({', '.join(map(str, weights))})')"
+        )
+        rows = apps.get_model('core', model_name).objects.order_by('pk').values_list('pk', *columns)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table}(rowid, {', '.join(columns)}) VALUES ({', '.join(['%s'] * (len(columns) + 1))})",
+                [(pk, *map(_stems, values)) for pk, *values in rows.iterator(chunk_size=2000)],
+            )
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in FTS_TABLES:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_parts_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimSearch',
+            fields=[
+                ('claim', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_row', serialize=False, to='core.claim')),
+                ('document', core.models.SearchDocumentField(db_column='core_claim_fts')),
+                ('rank', models.FloatField(db_column='rank')),
+            ],
+            options={
+                'db_table': 'core_claim_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MachineSearch',
+            fields=[
+                ('machine', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_row', serialize=False, to='core.machine')),
+                ('document', core.models.SearchDocumentField(db_column='core_machine_fts')),
+                ('rank', models.FloatField(db_column='rank')),
+            ],
+            options={
+                'db_table': 'core_machine_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
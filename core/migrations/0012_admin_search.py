@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:14
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Стеммер, замороженный в 0011, а не текущий core/utils/stemmer.py
+_stems = import_module('core.migrations.0011_full_text_search')._stems
+
+# Поиск машин в админке без LIKE: зав. номера двигателя и трансмиссии — в индекс FTS5
+MACHINE_COLUMNS = (
+    'serial_number', 'consignee', 'operation_address', 'options', 'engine_serial', 'transmission_serial',
+)
+MACHINE_WEIGHTS = (4.0, 2.0, 1.0, 1.0, 3.0, 3.0)
+
+
+def recreate_machine_fts(apps, schema_editor, columns=MACHINE_COLUMNS, weights=MACHINE_WEIGHTS):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS core_machine_fts')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE core_machine_fts USING fts5({', '.join(columns)}, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO core_machine_fts(core_machine_fts, rank) VALUES ('rank', 'bm25({', '.join(map(str, weights))})')"
+    )
+    Machine = apps.get_model('core', 'Machine')
+    rows = Machine.objects.order_by('pk').values_list('pk', *columns)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO core_machine_fts(rowid, {', '.join(columns)}) VALUES ({', '.join(['%s'] * (len(columns) + 1))})",
+            [(pk, *map(_stems, values)) for pk, *values in rows.iterator(chunk_size=2000)],
+        )
+
+
+def restore_machine_fts(apps, schema_editor):
+    recreate_machine_fts(apps, schema_editor, MACHINE_COLUMNS[:4], MACHINE_WEIGHTS[:4])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_full_text_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedmaintenance',
+            index=models.Index(fields=['order_number'], name='core_archiv_order_n_29bfcb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['order_number'], name='core_mainte_order_n_effba0_idx'),
+        ),
+        migrations.RunPython(recreate_machine_fts, restore_machine_fts),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils.translation import gettext_lazy as _
 
 
@@ -124,6 +127,26 @@ serial_number_validator = RegexValidator(
     code='invalid_serial'
 )
 
+
+def prefix_range(field, prefix):
+    """Q «field начинается с prefix» диапазоном: в отличие от LIKE, идёт по обычному индексу"""
+    return models.Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'})
+
+
+class MachineQuerySet(models.QuerySet):
+    def by_serial(self, serial_number):
+        """Поиск по зав. номеру без учёта регистра через индекс по UPPER(serial_number)"""
+        return self.alias(serial_upper=Upper('serial_number')).filter(
+            serial_upper=serial_number.strip().upper()
+        )
+
+    def by_serial_prefix(self, prefix):
+        """Зав. номера, начинающиеся с prefix (без учёта регистра), — по тому же индексу"""
+        return self.alias(serial_upper=Upper('serial_number')).filter(
+            prefix_range('serial_upper', prefix.strip().upper())
+        )
+
+
 class Machine(models.Model):
     serial_number = models.CharField(
         _('зав. № машины'),
@@ -202,6 +225,8 @@ class Machine(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MachineQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('машина')
         verbose_name_plural = _('машины')
@@ -209,6 +234,11 @@ class Machine(models.Model):
         indexes = [
             models.Index(fields=['serial_number']),
             models.Index(fields=['shipment_date']),
+            # Выборки по ролям: «мои машины» с сортировкой по дате отгрузки
+            models.Index(fields=['client', '-shipment_date']),
+            models.Index(fields=['service_company', '-shipment_date']),
+            # Поиск по зав. номеру без учёта регистра (Machine.objects.by_serial)
+            models.Index(Upper('serial_number'), name='core_machine_serial_upper_idx'),
         ]
 
     def __str__(self):
@@ -238,11 +268,72 @@ class RecoveryMethod(Directory):
         ordering = ['name']
 
 
+# ────────────────────────────────────────────────
+#        Владельцы машины в строках ТО и рекламаций
+# ────────────────────────────────────────────────
+# Списки «мои ТО / мои рекламации» клиента и сервиса фильтруются по владельцам
+# машины. Чтобы не соединять таблицу с core_machine на каждый запрос, клиент
+# и сервисная компания машины копируются в сами строки (machine_client,
+# machine_service_company) и индексируются вместе с датой. Копию обновляют
+# save() этих моделей и сохранение машины (core/signals.py); после массовых
+# изменений в обход save() — sync_machine_owners() или команда
+# backfill_machine_owners.
+
+def machine_owner_field(verbose_name):
+    # Индекс — составной, с датой (Meta.indexes); отдельный индекс FK не нужен
+    return models.ForeignKey(
+        User, verbose_name=verbose_name,
+        on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        db_index=False, related_name='+',
+    )
+
+
+class MachineOwnedQuerySet(models.QuerySet):
+    def sync_machine_owners(self):
+        """Переписывает копию владельцев из машин одним UPDATE; возвращает число строк"""
+        machine = Machine.objects.filter(pk=models.OuterRef('machine_id'))
+        return self.update(
+            machine_client=models.Subquery(machine.values('client_id')[:1]),
+            machine_service_company=models.Subquery(machine.values('service_company_id')[:1]),
+        )
+
+    def set_machine_owners(self, machine):
+        """Обновляет строки одной машины, у которых копия владельцев устарела"""
+        stale = self.filter(machine=machine).exclude(
+            machine_client_id=machine.client_id,
+            machine_service_company_id=machine.service_company_id,
+        )
+        return stale.update(
+            machine_client_id=machine.client_id,
+            machine_service_company_id=machine.service_company_id,
+        )
+
+
+class MachineOwnedMixin:
+    def save(self, *args, **kwargs):
+        self.machine_client_id = self.machine.client_id
+        self.machine_service_company_id = self.machine.service_company_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'machine_client', 'machine_service_company'}
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Удаление через объект (формы, админка) — в журнал изменений. Не в
+        # post_delete: тогда перенос в архив (QuerySet.delete()) попадал бы в
+        # журнал как удаление
+        from .audit import delete_entry, record_deleted
+        entry = delete_entry(self)  # после удаления у объекта уже нет pk
+        result = super().delete(*args, **kwargs)
+        record_deleted(entry)  # неудавшееся удаление в журнал не попадает
+        return result
+
+
 # ────────────────────────────────────────────────
 #                   Сущность ТО
 # ────────────────────────────────────────────────
 
-class Maintenance(models.Model):
+class Maintenance(MachineOwnedMixin, models.Model):
     type = models.ForeignKey(
         MaintenanceType, verbose_name=_('вид ТО'),
         on_delete=models.PROTECT, related_name='maintenances'
@@ -265,14 +356,27 @@ class Maintenance(models.Model):
         on_delete=models.SET_NULL, null=True, blank=True,
         related_name='service_maintenances'
     )
+    machine_client = machine_owner_field(_('клиент машины'))
+    machine_service_company = machine_owner_field(_('сервисная компания машины'))
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MachineOwnedQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('ТО')
         verbose_name_plural = _('ТО')
         ordering = ['-date']  # По умолчанию сортировка по дате проведения (как в ТЗ)
+        indexes = [
+            models.Index(fields=['-date']),
+            models.Index(fields=['machine', '-date']),
+            models.Index(fields=['organization', '-date']),
+            models.Index(fields=['service_company', '-date']),
+            models.Index(fields=['machine_client', '-date']),
+            models.Index(fields=['machine_service_company', '-date']),
+            models.Index(fields=['order_number']),  # поиск в админке
+        ]
 
     def __str__(self):
         return f"ТО {self.type} для {self.machine} ({self.date})"
@@ -282,7 +386,7 @@ class Maintenance(models.Model):
 #                   Сущность Рекламация
 # ────────────────────────────────────────────────
 
-class Claim(models.Model):
+class Claim(MachineOwnedMixin, models.Model):
     failure_date = models.DateField(_('дата отказа'))
     hours = models.IntegerField(_('наработка, м/час'), default=0)
     failure_node = models.ForeignKey(
@@ -305,14 +409,25 @@ class Claim(models.Model):
         on_delete=models.SET_NULL, null=True, blank=True,
         related_name='service_claims'
     )
+    machine_client = machine_owner_field(_('клиент машины'))
+    machine_service_company = machine_owner_field(_('сервисная компания машины'))
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MachineOwnedQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('рекламация')
         verbose_name_plural = _('рекламации')
         ordering = ['-failure_date']  # По умолчанию сортировка по дате отказа (как в ТЗ)
+        indexes = [
+            models.Index(fields=['-failure_date']),
+            models.Index(fields=['machine', '-failure_date']),
+            models.Index(fields=['service_company', '-failure_date']),
+            models.Index(fields=['machine_client', '-failure_date']),
+            models.Index(fields=['machine_service_company', '-failure_date']),
+        ]
 
     def __str__(self):
         return f"Рекламация для {self.machine} ({self.failure_date})"
@@ -322,4 +437,306 @@ class Claim(models.Model):
         """Расчётное поле: время простоя в днях"""
         if self.recovery_date and self.failure_date:
             return (self.recovery_date - self.failure_date).days
-        return None
\ No newline at end of file
+        return None
+
+# ────────────────────────────────────────────────
+#                   Архив (холодные ТО и рекламации)
+# ────────────────────────────────────────────────
+# Записи старше ARCHIVE_HORIZON_DAYS переносит команда `archive_records`.
+# id сохраняется исходный, поля совпадают с «горячими» моделями,
+# поэтому шаблоны и экспорт работают с ними одинаково (см. core/archive.py).
+
+class ArchivedMaintenance(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    type = models.ForeignKey(
+        MaintenanceType, verbose_name=_('вид ТО'),
+        on_delete=models.PROTECT, related_name='archived_maintenances'
+    )
+    date = models.DateField(_('дата проведения ТО'))
+    hours = models.IntegerField(_('наработка, м/час'), default=0)
+    order_number = models.CharField(_('№ заказ-наряда'), max_length=100, blank=True)
+    order_date = models.DateField(_('дата заказ-наряда'), null=True, blank=True)
+    organization = models.ForeignKey(
+        User, verbose_name=_('организация, проводившая ТО'),
+        on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='archived_performed_maintenances'
+    )
+    machine = models.ForeignKey(
+        Machine, verbose_name=_('машина'),
+        on_delete=models.CASCADE, related_name='archived_maintenances'
+    )
+    service_company = models.ForeignKey(
+        User, verbose_name=_('сервисная компания'),
+        on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='archived_service_maintenances'
+    )
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('ТО (архив)')
+        verbose_name_plural = _('ТО (архив)')
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['machine', '-date']),
+            models.Index(fields=['order_number']),  # поиск в админке
+        ]
+
+    def __str__(self):
+        return f"ТО {self.type} для {self.machine} ({self.date}, архив)"
+
+
+class ArchivedClaim(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    failure_date = models.DateField(_('дата отказа'))
+    hours = models.IntegerField(_('наработка, м/час'), default=0)
+    failure_node = models.ForeignKey(
+        FailureNode, verbose_name=_('узел отказа'),
+        on_delete=models.PROTECT, related_name='archived_claims'
+    )
+    failure_description = models.TextField(_('описание отказа'), blank=True)
+    recovery_method = models.ForeignKey(
+        RecoveryMethod, verbose_name=_('способ восстановления'),
+        on_delete=models.PROTECT, related_name='archived_claims'
+    )
+    parts_used = models.TextField(_('используемые запасные части'), blank=True)
+    recovery_date = models.DateField(_('дата восстановления'), null=True, blank=True)
+    machine = models.ForeignKey(
+        Machine, verbose_name=_('машина'),
+        on_delete=models.CASCADE, related_name='archived_claims'
+    )
+    service_company = models.ForeignKey(
+        User, verbose_name=_('сервисная компания'),
+        on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='archived_service_claims'
+    )
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('рекламация (архив)')
+        verbose_name_plural = _('рекламации (архив)')
+        ordering = ['-failure_date']
+        indexes = [
+            models.Index(fields=['machine', '-failure_date']),
+        ]
+
+    def __str__(self):
+        return f"Рекламация для {self.machine} ({self.failure_date}, архив)"
+
+    downtime = Claim.downtime
+
+
+
+# ────────────────────────────────────────────────
+#                 Журнал изменений
+# ────────────────────────────────────────────────
+# Пишется пачками из фонового потока (core/audit.py); только добавление.
+
+class AuditEntry(models.Model):
+    CREATE, UPDATE, DELETE = 'create', 'update', 'delete'
+    ACTIONS = [(CREATE, _('создание')), (UPDATE, _('изменение')), (DELETE, _('удаление'))]
+
+    created_at = models.DateTimeField(_('когда'))
+    user = models.ForeignKey(
+        User, verbose_name=_('кто'),
+        on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+    )
+    action = models.CharField(_('действие'), max_length=6, choices=ACTIONS)
+    model = models.CharField(_('модель'), max_length=20)  # model_name: machine, maintenance, claim
+    object_id = models.BigIntegerField(_('id записи'))
+    # Без внешнего ключа в БД: записи журнала переживают удаление машины
+    machine = models.ForeignKey(
+        Machine, verbose_name=_('машина'),
+        on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+',
+    )
+    changes = models.JSONField(_('изменения'), encoder=DjangoJSONEncoder)  # {поле: [было, стало]}
+
+    class Meta:
+        verbose_name = _('запись журнала')
+        verbose_name_plural = _('журнал изменений')
+        indexes = [
+            models.Index(fields=['machine', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.model} #{self.object_id}"
+
+    def audited_model(self):
+        return {model._meta.model_name: model for model in (Machine, Maintenance, Claim)}.get(self.model)
+
+    def model_label(self):
+        model = self.audited_model()
+        return model._meta.verbose_name if model is not None else self.model
+
+    def changed_fields(self):
+        """[(название поля, было, стало)] для показа"""
+        model = self.audited_model()
+        rows = []
+        for name, (old, new) in self.changes.items():
+            try:
+                label = model._meta.get_field(name.removesuffix('_id')).verbose_name
+            except (AttributeError, FieldDoesNotExist):
+                label = name
+            rows.append((label, old, new))
+        return rows
+
+
+# ────────────────────────────────────────────────
+#               Очередь фоновых задач
+# ────────────────────────────────────────────────
+# Задачи кладёт core/jobs.py, выполняет команда run_jobs.
+
+class Job(models.Model):
+    PENDING, RUNNING, FAILED = 'pending', 'running', 'failed'
+    STATUSES = [(PENDING, _('в очереди')), (RUNNING, _('выполняется')), (FAILED, _('ошибка'))]
+
+    kind = models.CharField(_('вид'), max_length=50)
+    payload = models.JSONField(_('данные'), default=dict, encoder=DjangoJSONEncoder)
+    # Ключ склейки: пока задача ждёт, новые данные с тем же ключом дописываются в неё
+    key = models.CharField(_('ключ склейки'), max_length=100, null=True, blank=True, unique=True)
+    status = models.CharField(_('состояние'), max_length=7, choices=STATUSES, default=PENDING)
+    run_at = models.DateTimeField(_('выполнить после'))
+    locked_until = models.DateTimeField(_('занята до'), null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(_('попыток'), default=0)
+    last_error = models.TextField(_('последняя ошибка'), blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('задача')
+        verbose_name_plural = _('очередь задач')
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+
+# ────────────────────────────────────────────────
+#            Показания счётчика моточасов
+# ────────────────────────────────────────────────
+# Не строка на показание, а пачки до TELEMETRY_CHUNK_SIZE показаний машины:
+# разности времени и наработки подряд идущих показаний, сжатые zlib
+# (кодирование — core/telemetry.py). Дописывается только последняя,
+# «открытая» пачка машины.
+
+class HourMeterChunk(models.Model):
+    machine = models.ForeignKey(
+        Machine, verbose_name=_('машина'),
+        on_delete=models.CASCADE, related_name='hour_meter_chunks',
+    )
+    start = models.DateTimeField(_('первое показание'))
+    end = models.DateTimeField(_('последнее показание'))
+    count = models.PositiveIntegerField(_('показаний'))
+    first_hours = models.IntegerField(_('первая наработка, 0,1 м/час'))
+    last_hours = models.IntegerField(_('последняя наработка, 0,1 м/час'))
+    data = models.BinaryField(_('данные'))
+    open = models.BooleanField(_('дописывается'), default=True)
+
+    class Meta:
+        verbose_name = _('пачка показаний счётчика')
+        verbose_name_plural = _('показания счётчика моточасов')
+        indexes = [
+            models.Index(fields=['machine', '-end']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['machine'], condition=models.Q(open=True), name='one_open_chunk_per_machine'),
+        ]
+
+    def __str__(self):
+        return f"{self.machine_id}: {self.count} показаний с {self.start:%d.%m.%Y}"
+
+
+# ────────────────────────────────────────────────
+#        Запасные части из рекламаций
+# ────────────────────────────────────────────────
+# Claim.parts_used — свободный текст; разобранные из него позиции
+# (core/parts.py) лежат в ClaimPart, индекс (part, claim) — обратный:
+# «рекламации с запчастью X» и отчёты читают его, а не текст.
+
+class Part(models.Model):
+    name = models.CharField(_('название'), max_length=200)
+    key = models.CharField(_('ключ поиска'), max_length=200, unique=True)  # нормализованное название
+
+    class Meta:
+        verbose_name = _('запасная часть')
+        verbose_name_plural = _('запасные части')
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class ClaimPart(models.Model):
+    claim = models.ForeignKey(
+        Claim, verbose_name=_('рекламация'),
+        on_delete=models.CASCADE, related_name='part_entries',
+    )
+    part = models.ForeignKey(
+        Part, verbose_name=_('запасная часть'),
+        on_delete=models.PROTECT, related_name='claim_entries',
+    )
+    quantity = models.PositiveIntegerField(_('количество'), default=1)
+
+    class Meta:
+        verbose_name = _('запчасть в рекламации')
+        verbose_name_plural = _('запчасти в рекламациях')
+        constraints = [
+            models.UniqueConstraint(fields=['part', 'claim'], name='claim_part_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.part} × {self.quantity}"
+
+
+# ────────────────────────────────────────────────
+#          Полнотекстовый поиск (SQLite FTS5)
+# ────────────────────────────────────────────────
+# Виртуальные таблицы FTS5 создаёт миграция 0011, пишет в них core/search.py
+# (основы слов после стеммера). Модели ниже — только для чтения через ORM:
+# Claim.objects.filter(search_row__document__match='...')
+# соединяет рекламации с индексом по rowid, ранг — search_row__rank (bm25).
+
+class SearchDocumentField(models.TextField):
+    """Скрытый столбец FTS5 с именем таблицы — левая часть MATCH"""
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+class ClaimSearch(models.Model):
+    claim = models.OneToOneField(
+        Claim, primary_key=True, db_column='rowid', db_constraint=False,
+        on_delete=models.DO_NOTHING, related_name='search_row',
+    )
+    document = SearchDocumentField(db_column='core_claim_fts')
+    rank = models.FloatField(db_column='rank')
+
+    class Meta:
+        managed = False
+        db_table = 'core_claim_fts'
+
+
+class MachineSearch(models.Model):
+    machine = models.OneToOneField(
+        Machine, primary_key=True, db_column='rowid', db_constraint=False,
+        on_delete=models.DO_NOTHING, related_name='search_row',
+    )
+    document = SearchDocumentField(db_column='core_machine_fts')
+    rank = models.FloatField(db_column='rank')
+
+    class Meta:
+        managed = False
+        db_table = 'core_machine_fts'
@@ -0,0 +1,55 @@
+# core/notifications.py
+"""
+Письма клиенту и сервисной компании машины о новых ТО и рекламациях.
+
+Письмо не отправляется в запросе: событие дописывается в задачу-дайджест
+получателя (core/jobs.py) с окном NOTIFY_DIGEST_SECONDS — все события
+за окно приходят одним письмом, отправляет его воркер run_jobs.
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .jobs import enqueue, handler
+from .models import Claim, User
+
+DIGEST = 'notify_digest'
+
+
+def _item(instance):
+    machine = instance.machine.serial_number
+    if isinstance(instance, Claim):
+        return {
+            'kind': 'claim', 'machine': machine, 'date': str(instance.failure_date),
+            'text': f'Рекламация: {instance.failure_node}',
+        }
+    return {
+        'kind': 'maintenance', 'machine': machine, 'date': str(instance.date),
+        'text': f'ТО: {instance.type}',
+    }
+
+
+def notify_owners(instance, author_id=None):
+    """Новое ТО или рекламация: событие — в дайджесты клиента и сервисной компании машины"""
+    recipients = {instance.machine_client_id, instance.machine_service_company_id} - {None, author_id}
+    if not recipients:
+        return
+    item = _item(instance)
+    delay = getattr(settings, 'NOTIFY_DIGEST_SECONDS', 300)
+    for recipient_id in sorted(recipients):
+        enqueue(DIGEST, {'recipient': recipient_id, 'items': [item]}, key=f'digest:{recipient_id}', delay=delay)
+
+
+@handler(DIGEST)
+def send_digest(payload):
+    user = User.objects.filter(pk=payload['recipient']).first()
+    if user is None or not user.email:
+        return
+    items = sorted(payload['items'], key=lambda item: (item['machine'], item['date']))
+    lines = [f"{item['machine']}, {item['date']}: {item['text']}" for item in items]
+    prefix = getattr(settings, 'ACCOUNT_EMAIL_SUBJECT_PREFIX', '')
+    send_mail(
+        f'{prefix}Новые события по вашим машинам ({len(items)})',
+        'По вашим машинам зарегистрированы:\n\n' + '\n'.join(lines),
+        None,
+        [user.email],
+    )
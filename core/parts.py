@@ -0,0 +1,146 @@
+# core/parts.py
+"""
+Индекс запасных частей по тексту Claim.parts_used.
+
+Текст делится на позиции по «;», запятым и переводам строк, из позиции
+отрезается количество («— 3 шт», «x2», «(2 шт.)»), название приводится к
+ключу (регистр, ё/е, пробелы, кавычки) — «Фильтр масляный» и «фильтр
+масляный.» становятся одной Part. Позиции рекламации — строки ClaimPart.
+
+Индекс поддерживается при сохранении рекламации (post_save, только если
+parts_used могло измениться и разбор дал другой набор); после загрузок в
+обход save() и смены правил разбора — `manage.py reindex_parts`.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import ClaimPart, Part
+
+SEPARATORS_RE = re.compile(r'[;,\n]+')
+UNIT = r'(?:шт|штук[аи]?|компл|к-т)\.?'
+QUANTITY_RE = re.compile(
+    rf'\s*\(?\s*(?:(?<!\S)[—–\-:xх×*]\s*(?P<marked>\d+)\s*(?:{UNIT})?|(?P<unit>\d+)\s*{UNIT})\s*\)?\s*$',
+    re.IGNORECASE,
+)
+ONLY_QUANTITY_RE = re.compile(rf'^\s*(?P<quantity>\d+)\s*{UNIT}\s*$', re.IGNORECASE)
+PUNCTUATION = ' \t.:—–-"\'«»()'
+
+
+def part_key(name):
+    """Нормализованное название — ключ Part"""
+    return ' '.join(name.casefold().replace('ё', 'е').strip(PUNCTUATION).split())
+
+
+def parse_parts(text):
+    """parts_used -> {ключ: (название, количество)}; повторы складываются"""
+    parsed = {}
+    last_key = None
+    for chunk in SEPARATORS_RE.split(text or ''):
+        only_quantity = ONLY_QUANTITY_RE.match(chunk)
+        if only_quantity and last_key is not None:
+            # «Болт М10, 2 шт» — количество отделено запятой (вместо единицы по умолчанию)
+            name, quantity = parsed[last_key]
+            parsed[last_key] = (name, quantity - 1 + max(int(only_quantity['quantity']), 1))
+            last_key = None
+            continue
+        match = QUANTITY_RE.search(chunk)
+        quantity = int(match['marked'] or match['unit']) if match else 1
+        name = chunk[:match.start()] if match else chunk
+        key = part_key(name)
+        if not key:
+            continue
+        name = ' '.join(name.strip(PUNCTUATION).split())
+        previous = parsed.get(key)
+        parsed[key] = (previous[0] if previous else name, (previous[1] if previous else 0) + max(quantity, 1))
+        last_key = key if match is None else None
+    return parsed
+
+
+def _part_ids(parsed):
+    """{ключ: id Part}; недостающие Part создаются"""
+    keys = list(parsed)
+    ids = dict(Part.objects.filter(key__in=keys).values_list('key', 'pk'))
+    missing = [Part(key=key, name=parsed[key][0][:200]) for key in keys if key not in ids]
+    if missing:
+        # Соседний процесс мог создать те же Part — конфликт не ошибка, id перечитываются
+        Part.objects.bulk_create(missing, ignore_conflicts=True)
+        ids.update(Part.objects.filter(key__in=[part.key for part in missing]).values_list('key', 'pk'))
+    return ids
+
+
+def index_claim(claim, created=False):
+    """Приводит строки ClaimPart рекламации к её parts_used"""
+    parsed = parse_parts(claim.parts_used)
+    if not created:
+        current = dict(ClaimPart.objects.filter(claim=claim).values_list('part__key', 'quantity'))
+        if current == {key: quantity for key, (_, quantity) in parsed.items()}:
+            return
+    with transaction.atomic():
+        ids = _part_ids(parsed)
+        if not created:
+            ClaimPart.objects.filter(claim=claim).delete()
+        ClaimPart.objects.bulk_create(
+            ClaimPart(claim=claim, part_id=ids[key], quantity=quantity) for key, (_, quantity) in parsed.items()
+        )
+
+
+def reindex_claims(claims, batch_size=2000):
+    """Перестраивает индекс для рекламаций queryset'а пачками; возвращает (рекламаций, позиций)"""
+    total = entries = 0
+    last_pk = 0
+    while True:
+        rows = list(claims.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'parts_used')[:batch_size])
+        if not rows:
+            return total, entries
+        last_pk = rows[-1][0]
+        parsed = {pk: parse_parts(text) for pk, text in rows}
+        names = {}
+        for items in parsed.values():
+            for key, value in items.items():
+                names.setdefault(key, value)  # название — первое встреченное написание
+        with transaction.atomic():
+            ids = _part_ids(names)
+            ClaimPart.objects.filter(claim_id__in=list(parsed)).delete()
+            created = ClaimPart.objects.bulk_create(
+                ClaimPart(claim_id=pk, part_id=ids[key], quantity=quantity)
+                for pk, items in parsed.items()
+                for key, (_, quantity) in items.items()
+            )
+        total += len(rows)
+        entries += len(created)
+
+
+def claims_with_part(claims, text):
+    """Рекламации из claims, где есть запчасть, название которой начинается с text"""
+    key = part_key(text)
+    if not key:
+        return claims
+    return claims.filter(pk__in=ClaimPart.objects.filter(part__key__startswith=key).values('claim_id'))
+
+
+def parts_usage(claims, limit=20):
+    """Самые частые запчасти в рекламациях claims: [{'part_id', 'part__name', 'claims', 'quantity'}]"""
+    return list(
+        ClaimPart.objects.filter(claim__in=claims)
+        .values('part_id', 'part__name')
+        .annotate(claims=Count('claim_id'), quantity=Sum('quantity'))
+        .order_by('-claims', '-quantity', 'part__name')[:limit]
+    )
+
+
+def parts_by_failure_node(claims, limit=5):
+    """Для каждого узла отказа — limit самых частых запчастей: [(узел, [{...}, ...])]"""
+    rows = (
+        ClaimPart.objects.filter(claim__in=claims)
+        .values('claim__failure_node__name', 'part__name')
+        .annotate(claims=Count('claim_id'), quantity=Sum('quantity'))
+        .order_by('claim__failure_node__name', '-claims', '-quantity', 'part__name')
+    )
+    nodes = {}
+    for row in rows:
+        top = nodes.setdefault(row['claim__failure_node__name'], [])
+        if len(top) < limit:
+            top.append(row)
+    return list(nodes.items())
@@ -0,0 +1,103 @@
+# core/permissions.py
+"""
+Правила доступа к строкам в виде фильтров queryset'а.
+
+Вместо «загрузить объект, потом проверить obj.machine.client == user»
+правило накладывается на запрос: scope(Maintenance.objects.all(), user, 'change')
+вернёт только то, что пользователь может редактировать, и объект
+достаётся и проверяется одним индексированным запросом.
+Одни и те же правила используют дашборд, карточка машины, формы и экспорт.
+"""
+from django.db.models import Q
+
+from .models import Machine, Maintenance, Claim
+
+MANAGER = 'Менеджер'
+CLIENT = 'Клиент'
+SERVICE = 'Сервисная_организация'
+
+# Порядок важен: при нескольких группах берётся первая подходящая роль
+ROLES = (MANAGER, CLIENT, SERVICE)
+
+
+def get_role(user):
+    """Роль пользователя по группе; результат кешируется на объекте user (один запрос на запрос)"""
+    if not user.is_authenticated:
+        return None
+    if not hasattr(user, '_silant_role'):
+        names = set(user.groups.values_list('name', flat=True))
+        user._silant_role = next((role for role in ROLES if role in names), None)
+    return user._silant_role
+
+
+def is_manager(user):
+    return get_role(user) == MANAGER
+
+
+# (модель, действие) → {роль: функция user → Q}. Роли, которых нет в словаре, не видят ничего.
+RULES = {
+    (Machine, 'view'): {
+        MANAGER: lambda user: Q(),
+        CLIENT: lambda user: Q(client=user),
+        SERVICE: lambda user: Q(service_company=user),
+    },
+    (Machine, 'add_maintenance'): {
+        MANAGER: lambda user: Q(),
+        CLIENT: lambda user: Q(client=user),
+        SERVICE: lambda user: Q(service_company=user),
+    },
+    (Machine, 'add_claim'): {
+        MANAGER: lambda user: Q(),
+        SERVICE: lambda user: Q(service_company=user),
+    },
+    (Machine, 'change'): {
+        MANAGER: lambda user: Q(),
+    },
+
+    # Владельцы машины берутся из копии в самой строке (machine_client,
+    # machine_service_company) — без соединения с core_machine
+    (Maintenance, 'view'): {
+        MANAGER: lambda user: Q(),
+        CLIENT: lambda user: Q(machine_client=user),
+        SERVICE: lambda user: Q(organization=user) | Q(service_company=user),
+    },
+    (Maintenance, 'change'): {
+        MANAGER: lambda user: Q(),
+        CLIENT: lambda user: Q(machine_client=user),
+        SERVICE: lambda user: Q(machine_service_company=user),
+    },
+    (Maintenance, 'delete'): {
+        MANAGER: lambda user: Q(),
+        CLIENT: lambda user: Q(machine_client=user),
+        SERVICE: lambda user: (
+            (Q(organization=user) | Q(service_company=user)) & Q(machine_service_company=user)
+        ),
+    },
+
+    (Claim, 'view'): {
+        MANAGER: lambda user: Q(),
+        CLIENT: lambda user: Q(machine_client=user),
+        SERVICE: lambda user: Q(service_company=user),
+    },
+    (Claim, 'change'): {
+        MANAGER: lambda user: Q(),
+        SERVICE: lambda user: Q(machine_service_company=user),
+    },
+    (Claim, 'delete'): {
+        MANAGER: lambda user: Q(),
+        SERVICE: lambda user: Q(service_company=user, machine_service_company=user),
+    },
+}
+
+
+def role_can(user, model, action='view'):
+    """Есть ли у роли пользователя хоть какое-то право action на model (без запроса к строкам)"""
+    return get_role(user) in RULES[(model, action)]
+
+
+def scope(queryset, user, action='view'):
+    """Сужает queryset до строк, на которые у пользователя есть право action"""
+    rule = RULES[(queryset.model, action)].get(get_role(user))
+    if rule is None:
+        return queryset.none()
+    return queryset.filter(rule(user))
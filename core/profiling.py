@@ -0,0 +1,155 @@
+# core/profiling.py
+"""
+Профилирование отдельных запросов по требованию (см. ProfilingMiddleware).
+
+Запрос выполняется под cProfile (точные счётчики вызовов, файл .prof для
+pstats/snakeviz), а параллельный поток раз в PROFILE_SAMPLE_INTERVAL
+снимает стек потока запроса — из этих выборок получается файл .collapsed
+в формате «свёрнутых стеков» для flamegraph.pl / speedscope.
+
+Профили лежат в PROFILE_DIR; хранится не больше PROFILE_KEEP последних.
+
+cProfile (с Python 3.12) может быть включён только один на процесс: пока
+профилируется один запрос, остальные выполняются без профиля.
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+# Имена файлов профилей: только то, что генерируем сами (защита скачивания от ../)
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+$')
+
+# Занят, пока в процессе идёт профилирование (одно на процесс)
+_active = threading.Lock()
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILE_DIR', settings.BASE_DIR / 'var' / 'profiles'))
+
+
+class StackSampler(threading.Thread):
+    """Снимает стек заданного потока с фиксированным интервалом"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True, name='silant-profile-sampler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        if self.ident is not None:  # поток мог не успеть запуститься
+            self.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _start():
+    """(profiler, sampler) или None, если профилировщик процесса занят"""
+    if not _active.acquire(blocking=False):
+        return None
+    sampler = StackSampler(threading.get_ident(), getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.005))
+    profiler = cProfile.Profile()
+    try:
+        sampler.start()
+        profiler.enable()
+    except ValueError:  # 'Another profiling tool is already active' — не наш запрос, а отладчик и т.п.
+        _stop(profiler, sampler)
+        return None
+    except BaseException:
+        _stop(profiler, sampler)
+        raise
+    return profiler, sampler
+
+
+def _stop(profiler, sampler):
+    try:
+        profiler.disable()
+        sampler.stop()
+    finally:
+        _active.release()
+
+
+def run_profiled(func, *args):
+    """
+    Вызывает func(*args) под cProfile и сэмплером; возвращает (результат, profiler, sampler).
+    Если профилировщик занят, func выполняется без профиля, а profiler и sampler — None.
+    """
+    started = _start()
+    if started is None:
+        return func(*args), None, None
+    try:
+        return func(*args), *started
+    finally:
+        _stop(*started)
+
+
+async def arun_profiled(func, *args):
+    """Асинхронный вариант run_profiled: профилируется поток event loop"""
+    started = _start()
+    if started is None:
+        return await func(*args), None, None
+    try:
+        return await func(*args), *started
+    finally:
+        _stop(*started)
+
+
+def save_profile(profiler, sampler, meta):
+    """Сохраняет .prof, .collapsed и .json с описанием; возвращает идентификатор профиля"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    view = re.sub(r'[^\w-]', '_', meta.get('view') or 'unresolved')
+    # Время — для сортировки, pid и случайный суффикс — от совпадений между воркерами и потоками
+    profile_id = (
+        f'{time.strftime("%Y%m%d-%H%M%S")}-{int(time.time() * 1000) % 1000:03d}'
+        f'-{os.getpid()}-{uuid.uuid4().hex[:8]}-{view}'
+    )
+
+    profiler.dump_stats(directory / f'{profile_id}.prof')
+    (directory / f'{profile_id}.collapsed').write_text(sampler.collapsed())
+    (directory / f'{profile_id}.json').write_text(json.dumps(meta, ensure_ascii=False))
+    prune_profiles()
+    return profile_id
+
+
+def prune_profiles():
+    keep = getattr(settings, 'PROFILE_KEEP', 50)
+    metas = sorted(profile_dir().glob('*.json'), reverse=True)
+    for meta in metas[keep:]:
+        for path in profile_dir().glob(f'{meta.stem}.*'):
+            path.unlink(missing_ok=True)
+
+
+def recent_profiles():
+    profiles = []
+    for path in sorted(profile_dir().glob('*.json'), reverse=True):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        profiles.append({'id': path.stem, **meta})
+    return profiles
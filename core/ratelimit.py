@@ -0,0 +1,49 @@
+# core/ratelimit.py
+"""
+Ограничение частоты запросов «ведром токенов» в кеше Django (по умолчанию
+LocMemCache, то есть отдельно в каждом процессе): ведро на BURST токенов
+пополняется со скоростью RATE в секунду, каждый запрос забирает один токен.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def client_ip(request):
+    # За обратным прокси REMOTE_ADDR должен выставлять сам прокси (uvicorn --proxy-headers и т.п.)
+    return request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+class TokenBucket:
+    def __init__(self, scope, rate, burst):
+        self.scope = scope
+        self.rate = rate
+        self.burst = burst
+
+    def key(self, ident):
+        return f'ratelimit:{self.scope}:{ident}'
+
+    def take(self, state, now):
+        """(новое состояние, через сколько секунд появится токен — 0, если запрос разрешён)"""
+        tokens, updated = state if state is not None else (self.burst, now)
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return (tokens - 1, now), 0
+        return (tokens, now), (1 - tokens) / self.rate
+
+    @property
+    def timeout(self):
+        # Полное ведро хранить незачем: через это время оно и так полное
+        return int(self.burst / self.rate) + 1
+
+    def consume(self, ident):
+        key = self.key(ident)
+        state, retry_after = self.take(cache.get(key), time.time())
+        cache.set(key, state, self.timeout)
+        return retry_after
+
+    async def aconsume(self, ident):
+        key = self.key(ident)
+        state, retry_after = self.take(await cache.aget(key), time.time())
+        await cache.aset(key, state, self.timeout)
+        return retry_after
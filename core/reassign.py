@@ -0,0 +1,68 @@
+# core/reassign.py
+"""
+Массовая передача машин другому клиенту и/или сервисной компании
+(например, при переходе дилерского договора): UPDATE по пачкам id в одной
+транзакции вместо сохранения машин по одной через MachineForm.
+
+update() не шлёт post_save, поэтому работа обработчиков сохранения машины
+(копия владельцев в ТО и рекламациях, журнал изменений) делается здесь же,
+а кеши сбрасывает сигнал machines_reassigned — один раз на пачку, после коммита.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+
+from .audit import record_bulk_update
+from .models import Claim, Machine, Maintenance
+from .signals import machines_reassigned
+
+BATCH_SIZE = 500
+
+
+def reassign_machines(machines, client=None, service_company=None, cascade=False, batch_size=BATCH_SIZE):
+    """
+    Назначает машинам из queryset'а machines клиента и/или сервисную компанию
+    (None — не менять). cascade — передать новой сервисной компании и ТО/рекламации,
+    которые числились за прежней сервисной компанией машины.
+    Возвращает число изменённых машин, ТО и рекламаций.
+    """
+    changes = {}
+    if client is not None:
+        changes['client'] = client
+    if service_company is not None:
+        changes['service_company'] = service_company
+    if not changes:
+        raise ValueError('Не указаны ни клиент, ни сервисная компания')
+    owners = {f'machine_{field}': value for field, value in changes.items()}
+    # Для журнала: client_id -> id нового владельца
+    new_ids = {Machine._meta.get_field(field).attname: value.pk for field, value in changes.items()}
+
+    counts = {'machines': 0, 'maintenances': 0, 'claims': 0}
+    with transaction.atomic():
+        # Список фиксируется до UPDATE: фильтр может зависеть от меняемых полей
+        ids = list(machines.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            before = Machine.objects.filter(pk__in=batch).values_list('pk', *new_ids)
+            audit_rows = [
+                (pk, pk, {field: [old, new_ids[field]] for field, old in zip(new_ids, olds) if old != new_ids[field]})
+                for pk, *olds in before
+            ]
+            counts['machines'] += Machine.objects.filter(pk__in=batch).update(**changes)
+            record_bulk_update(Machine, audit_rows)
+            for model, key in ((Maintenance, 'maintenances'), (Claim, 'claims')):
+                rows = model.objects.filter(machine_id__in=batch)
+                if cascade and service_company is not None:
+                    # Прежняя компания машины ещё лежит в копии machine_service_company
+                    moved = rows.filter(service_company=F('machine_service_company'))
+                    audit_rows = [
+                        (pk, machine_id, {'service_company_id': [old, service_company.pk]})
+                        for pk, machine_id, old in moved.exclude(service_company=service_company)
+                        .values_list('pk', 'machine_id', 'service_company_id')
+                    ]
+                    counts[key] += moved.update(service_company=service_company)
+                    record_bulk_update(model, audit_rows)
+                rows.update(**owners)
+            transaction.on_commit(partial(machines_reassigned.send, sender=Machine, pks=batch))
+    return counts
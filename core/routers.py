@@ -0,0 +1,67 @@
+# core/routers.py
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+
+# Флаг «этот запрос может читать с реплики» выставляется ReplicaRoutingMiddleware
+_replica_reads = ContextVar('silant_replica_reads', default=False)
+
+
+def replica_reads(view):
+    """
+    Помечает view как read-only: её чтения можно отправлять на реплику.
+    Работает и для функций, и для классов (as_view() сохраняет view_class).
+    """
+    view.replica_reads = True
+    return view
+
+
+def view_allows_replica(view_func):
+    if getattr(view_func, 'replica_reads', False):
+        return True
+    view_class = getattr(view_func, 'view_class', None)
+    return bool(getattr(view_class, 'replica_reads', False))
+
+
+def enable_replica_reads():
+    return _replica_reads.set(True)
+
+
+def reset_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    """
+    Чтения моделей приложения core из помеченных view уходят на реплику,
+    всё остальное (записи, сессии, auth, формы) — на основную БД.
+    """
+    route_app_labels = {'core'}
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label in self.route_app_labels
+            and _replica_reads.get()
+            and replica_configured()
+        ):
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной БД, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема на реплику приезжает вместе с данными (sync_replica)
+        if db == REPLICA_ALIAS:
+            return False
+        return None
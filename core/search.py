@@ -0,0 +1,125 @@
+# core/search.py
+"""
+Полнотекстовый поиск по рекламациям (описание отказа, запчасти) и машинам
+(зав. номера машины и агрегатов, грузополучатель, адрес эксплуатации, комплектация).
+
+Индекс — виртуальные таблицы SQLite FTS5 (миграции 0011, 0012), строка на объект,
+rowid = id. В индекс пишутся не слова, а их основы (core/utils/stemmer.py),
+и запрос стеммится так же: «течь масла из фильтров» находит «течи масляного
+фильтра». Каждое слово запроса — префикс основы, все слова обязательны.
+Результаты ранжируются по bm25 с весами столбцов.
+
+Индекс обновляется в той же транзакции, что и сохранение или удаление (сигналы
+post_save — только при изменении индексируемых полей — и post_delete, в том
+числе для рекламаций, удалённых каскадом от машины или перенесённых в архив);
+после загрузок в обход save() — `manage.py rebuild_search_index`.
+
+Без SQLite (другая СУБД) matching() ищет те же слова через icontains.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Claim, Machine
+from .utils.stemmer import stem
+
+WORD_RE = re.compile(r'\w+')
+
+# Модель -> (таблица FTS5, индексируемые поля в порядке столбцов таблицы)
+INDEXES = {
+    Claim: ('core_claim_fts', ('failure_description', 'parts_used')),
+    Machine: ('core_machine_fts', (
+        'serial_number', 'consignee', 'operation_address', 'options', 'engine_serial', 'transmission_serial',
+    )),
+}
+
+
+def stems(text):
+    return ' '.join(stem(word) for word in WORD_RE.findall(text or ''))
+
+
+def fts_query(text):
+    """Строка поиска -> выражение MATCH ('"фильтр"* "маслян"*') или ''"""
+    return ' '.join(f'"{stem(word)}"*' for word in WORD_RE.findall(text or ''))
+
+
+def available(using):
+    return connections[using].vendor == 'sqlite'
+
+
+def matching(queryset, text, ranked=True):
+    """Объекты queryset (рекламации или машины), подходящие под text; ranked — по релевантности"""
+    query = fts_query(text)
+    if not query:
+        return queryset
+    if not available(queryset.db):
+        _, fields = INDEXES[queryset.model]
+        for word in WORD_RE.findall(text):
+            queryset = queryset.filter(reduce(or_, (Q(**{f'{field}__icontains': word}) for field in fields)))
+        return queryset
+    queryset = queryset.filter(search_row__document__match=query)
+    return queryset.order_by('search_row__rank', '-pk') if ranked else queryset
+
+
+def _connection(model):
+    connection = connections[router.db_for_write(model)]
+    return connection if connection.vendor == 'sqlite' else None
+
+
+def _insert(cursor, model, rows):
+    """rows — кортежи (pk, значения индексируемых полей)"""
+    table, fields = INDEXES[model]
+    placeholders = ', '.join(['%s'] * (len(fields) + 1))
+    cursor.executemany(
+        f"INSERT INTO {table}(rowid, {', '.join(fields)}) VALUES ({placeholders})",
+        [(pk, *map(stems, values)) for pk, *values in rows],
+    )
+
+
+def index(instance, update_fields=None):
+    """Обновляет строку индекса объекта (post_save)"""
+    model = type(instance)
+    table, fields = INDEXES[model]
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return
+    connection = _connection(model)
+    if connection is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [instance.pk])
+        _insert(cursor, model, [(instance.pk, *(getattr(instance, field) for field in fields))])
+
+
+def unindex(model, pks):
+    """Убирает объекты из индекса (удаление, перенос в архив)"""
+    connection = _connection(model) if model in INDEXES else None
+    if connection is None or not pks:
+        return
+    table, _ = INDEXES[model]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk in pks])
+
+
+def rebuild(model, batch_size=2000):
+    """Строит индекс модели заново; возвращает число объектов"""
+    connection = _connection(model)
+    if connection is None:
+        return 0
+    table, fields = INDEXES[model]
+    objects = model.objects.order_by('pk').values_list('pk', *fields)
+    total = last_pk = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        while True:
+            rows = list(objects.filter(pk__gt=last_pk)[:batch_size])
+            if not rows:
+                break
+            _insert(cursor, model, rows)
+            total += len(rows)
+            last_pk = rows[-1][0]
+        # Слияние сегментов индекса — быстрее последующие запросы
+        cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+    return total
@@ -0,0 +1,149 @@
+# core/serial_index.py
+"""
+Поиск машины по зав. номеру для анонимной формы на главной.
+
+Перед запросом к БД номер проверяется по фильтру Блума со всеми номерами
+парка: если фильтр говорит «нет», машины точно нет — БД не трогаем
+(опечатки и перебор номеров скриптами). «Может быть» проверяется в БД;
+найденные машины кешируются в небольшом LRU.
+
+Фильтр строится лениво одним запросом номеров, дополняется при сохранении
+машины (сигналы в core/signals.py) и перестраивается после удаления и
+раз в SERIAL_INDEX_TTL секунд — так подхватываются изменения из других
+процессов и массовые загрузки (bulk_create сигналов не шлёт).
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .metrics import registry
+from .models import Machine
+
+
+def normalize(serial):
+    """Как в Machine.objects.by_serial: без пробелов по краям и регистра"""
+    return serial.strip().upper()
+
+
+class BloomFilter:
+    """Битовый массив на bytearray, k позиций — двойным хешированием одного blake2b"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class SerialIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._filter = None
+        self._built_at = 0.0
+        self._added_during_build = None  # номера, сохранённые, пока строится новый фильтр
+        self._found = OrderedDict()  # номер -> (машина, когда положили)
+
+    def _config(self):
+        return (
+            getattr(settings, 'SERIAL_INDEX_TTL', 60),
+            getattr(settings, 'SERIAL_INDEX_ERROR_RATE', 0.01),
+            getattr(settings, 'SERIAL_CACHE_SIZE', 1024),
+        )
+
+    def _fresh_filter(self, ttl):
+        bloom = self._filter
+        if bloom is not None and time.monotonic() - self._built_at < ttl:
+            return bloom
+        return None
+
+    def _current_filter(self):
+        ttl, error_rate, _ = self._config()
+        bloom = self._fresh_filter(ttl)
+        if bloom is not None:
+            return bloom
+        with self._build_lock:
+            # Пока ждали блокировку, фильтр мог построить соседний поток
+            bloom = self._fresh_filter(ttl)
+            if bloom is not None:
+                return bloom
+            with self._lock:
+                self._added_during_build = []
+            serials = Machine.objects.values_list('serial_number', flat=True)
+            # Запас на рост парка до следующей перестройки
+            bloom = BloomFilter(int(serials.count() * 1.2) + 1024, error_rate)
+            for serial in serials.iterator(chunk_size=5000):
+                bloom.add(normalize(serial))
+            with self._lock:
+                for serial in self._added_during_build:
+                    bloom.add(serial)
+                self._added_during_build = None
+                self._filter, self._built_at = bloom, time.monotonic()
+            return bloom
+
+    def find(self, serial, related=()):
+        """Машина (со связями related для карточки) или None"""
+        key = normalize(serial)
+        ttl, _, cache_size = self._config()
+
+        with self._lock:
+            entry = self._found.get(key)
+            if entry is not None and time.monotonic() - entry[1] < ttl:
+                self._found.move_to_end(key)
+                registry.cache_hit('serial_lru')
+                return entry[0]
+        registry.cache_miss('serial_lru')
+
+        if key not in self._current_filter():
+            registry.inc('silant_serial_lookups_total', result='filtered')
+            return None
+
+        machine = Machine.objects.by_serial(key).select_related(*related).first()
+        registry.inc('silant_serial_lookups_total', result='found' if machine is not None else 'false_positive')
+        if machine is not None:
+            with self._lock:
+                self._found[key] = (machine, time.monotonic())
+                while len(self._found) > cache_size:
+                    self._found.popitem(last=False)
+        return machine
+
+    def added(self, serial):
+        """Машина сохранена: номер в фильтр (если он уже построен), кеш карточек — сбросить"""
+        serial = normalize(serial)
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(serial)
+            if self._added_during_build is not None:
+                self._added_during_build.append(serial)
+            self._found.clear()
+
+    def changed(self):
+        """Машины изменены в обход save(): номера те же, кеш карточек — сбросить"""
+        with self._lock:
+            self._found.clear()
+
+    def invalidate(self):
+        """Машина удалена: фильтр перестроится при следующем поиске"""
+        with self._lock:
+            self._filter = None
+            self._found.clear()
+
+
+serial_index = SerialIndex()
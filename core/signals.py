@@ -0,0 +1,67 @@
+# core/signals.py
+"""Обработчики сигналов моделей; подключаются в CoreConfig.ready()"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .audit import AUDITED_MODELS, current_user_id, record_delete, record_save, remember_state
+from .models import Claim, Machine, Maintenance
+from .notifications import notify_owners
+from .parts import index_claim
+from .search import index as index_search, unindex as unindex_search
+from .serial_index import serial_index
+
+# Машины переданы массово в обход save() (core/reassign.py); pks — id пачки
+machines_reassigned = Signal()
+
+
+@receiver(post_save, sender=Machine)
+def machine_saved(sender, instance, created, update_fields=None, **kwargs):
+    serial_index.added(instance.serial_number)
+    index_search(instance, update_fields)
+    if not created:
+        # Клиент или сервисная компания могли смениться — копия в ТО и рекламациях
+        for model in (Maintenance, Claim):
+            model.objects.set_machine_owners(instance)
+
+
+@receiver(post_delete, sender=Machine)
+def machine_deleted(sender, instance, **kwargs):
+    serial_index.invalidate()
+    record_delete(instance)
+    unindex_search(Machine, [instance.pk])
+
+
+@receiver(post_save, sender=Maintenance)
+@receiver(post_save, sender=Claim)
+def record_created(sender, instance, created, **kwargs):
+    if created:
+        # Письмо отправит воркер run_jobs; сам автор записи о ней не уведомляется
+        notify_owners(instance, author_id=current_user_id())
+
+
+@receiver(post_save, sender=Claim)
+def claim_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Индекс запчастей (core/parts.py); сохранения без parts_used его не трогают
+    if update_fields is None or 'parts_used' in update_fields:
+        index_claim(instance, created=created)
+    index_search(instance, update_fields)
+
+
+@receiver(post_delete, sender=Claim)
+def claim_deleted(sender, instance, **kwargs):
+    # Удаление через объект, QuerySet.delete(), каскад от машины и перенос в архив
+    unindex_search(Claim, [instance.pk])
+
+
+@receiver(machines_reassigned)
+def machines_batch_reassigned(sender, pks, **kwargs):
+    # Карточки в кеше поиска содержат прежних владельцев
+    serial_index.changed()
+
+
+# Журнал изменений (core/audit.py)
+for audited in AUDITED_MODELS:
+    pre_save.connect(lambda sender, instance, **kwargs: remember_state(instance),
+                     sender=audited, weak=False, dispatch_uid=f'audit_pre_save_{audited.__name__}')
+    post_save.connect(lambda sender, instance, created, **kwargs: record_save(instance, created),
+                      sender=audited, weak=False, dispatch_uid=f'audit_post_save_{audited.__name__}')
@@ -0,0 +1,35 @@
+# core/storage.py
+"""
+Хранилище статики: имена с хешем содержимого (ManifestStaticFilesStorage)
+плюс готовые .gz/.br рядом с каждым сжимаемым файлом. Всё делает
+`manage.py collectstatic`; отдавать такие файлы можно с Cache-Control: immutable.
+Без манифеста (collectstatic не запускался) {% static %} падает, как у
+родительского класса, — при DEBUG хранилище имена не хеширует.
+"""
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+from .compression import COMPRESSIBLE_EXTENSIONS, available_encodings, compress_file
+
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            with self.open(name) as source:
+                data = source.read()
+            for encoding in available_encodings():
+                compressed = compress_file(data, encoding)
+                if len(compressed) >= len(data):
+                    continue
+                target = name + ENCODING_SUFFIXES[encoding]
+                if self.exists(target):
+                    self.delete(target)
+                self._save(target, ContentFile(compressed))
@@ -1,34 +1,130 @@
+from urllib.parse import quote
+
 import django_tables2 as tables
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 
 from .models import Machine, Maintenance, Claim
+from .permissions import is_manager
+
+# Строки таблиц рендерятся не шаблоном на каждую ячейку, а одной строкой формата
+# на всю строку таблицы (FastRowsMixin): URL собираются из заранее вычисленных
+# шаблонов, права считаются один раз на страницу. Заголовки и пагинацию
+# по-прежнему рисует django_tables2 (шаблоны core/tables/*.html).
+
+EMPTY = '—'
+
+# Значения-заглушки для reverse(): подставляются один раз и заменяются на {поле}
+_URL_PLACEHOLDERS = {'serial_number': 'SERIAL-PLACEHOLDER', 'pk': 987654321}
+
+
+def url_template(name, *fields):
+    """'core:machine_detail', 'serial_number' -> '/machines/{serial_number}/'"""
+    url = reverse(name, kwargs={field: _URL_PLACEHOLDERS[field] for field in fields})
+    url = url.replace('{', '{{').replace('}', '}}')
+    for field in fields:
+        url = url.replace(str(_URL_PLACEHOLDERS[field]), '{%s}' % field)
+    return url
+
+
+def text(value):
+    return EMPTY if value is None or value == '' else escape(value)
+
+
+def date(value):
+    return value.strftime('%d.%m.%Y') if value else EMPTY
+
+
+def email(user):
+    return escape(user.email) if user is not None else EMPTY
+
+
+class FastRowsMixin:
+    """
+    Рендер <tbody> одной строкой формата на строку таблицы.
+
+    Наследник задаёт row_template (str.format, значения уже экранированы)
+    и row_values(record, page) — словарь значений для строки; page — то,
+    что посчитано один раз на страницу в page_context(). По умолчанию
+    каждый столбец выводится экранированным текстом значения.
+    """
+    row_template = None
+
+    def page_context(self):
+        user = getattr(self.request, 'user', None)
+        authenticated = user is not None and user.is_authenticated
+        return {
+            'user_id': user.pk if authenticated else None,
+            'is_manager': authenticated and is_manager(user),
+            'detail_url': url_template('core:machine_detail', 'serial_number'),
+        }
+
+    def get_row_template(self):
+        if self.row_template is not None:
+            return self.row_template
+        return '<tr class="{parity}">' + ''.join('<td>{%s}</td>' % column.name for column in self.columns) + '</tr>'
+
+    def row_values(self, record, page):
+        return {column.name: text(column.accessor.resolve(record, quiet=True)) for column in self.columns}
 
+    def render_rows(self):
+        page = self.page_context()
+        template = self.get_row_template()
+        rows = [
+            template.format(parity='odd' if index % 2 else 'even', **self.row_values(row.record, page))
+            for index, row in enumerate(self.paginated_rows)
+        ]
+        if not rows and self.empty_text:
+            rows.append(f'<tr><td colspan="{len(self.columns)}">{escape(self.empty_text)}</td></tr>')
+        return mark_safe(''.join(rows))
 
-class MachineTable(tables.Table):
+    @staticmethod
+    def row_link(page, serial_number):
+        # Как reverse(), но без «'» в safe: URL стоит внутри JS-строки в onclick
+        return escape(page['detail_url'].format(serial_number=quote(serial_number, safe="!$&()*+,;=:@~")))
+
+
+ROW_OPEN = (
+    '<tr onclick="window.location.href=&#x27;{url}&#x27;;" style="cursor: pointer;" class="{parity}">'
+)
+
+
+class MachineTable(FastRowsMixin, tables.Table):
     serial_number = tables.Column(verbose_name=_("Зав. №"))
     model = tables.Column(verbose_name=_("Модель"))
     shipment_date = tables.DateColumn(format="d.m.Y", verbose_name=_("Дата отгрузки"))
     client = tables.Column(accessor="client.email", verbose_name=_("Клиент"))
     service_company = tables.Column(accessor="service_company.email", verbose_name=_("Сервисная орг."))
 
+    row_template = (
+        ROW_OPEN + '<td>{serial_number}</td><td>{model}</td><td>{shipment_date}</td>'
+        '<td>{client}</td><td>{service_company}</td></tr>'
+    )
+
     class Meta:
         model = Machine
-        template_name = "django_tables2/semantic.html"
+        template_name = "core/tables/fast_semantic.html"
         fields = ("serial_number", "model", "shipment_date", "client", "service_company")
         orderable = False
         attrs = {
             "class": "data-table",
             "thead": {"class": "no-sort"},
         }
-        row_attrs = {
-            "onclick": lambda
-                record: f"window.location.href='{reverse('core:machine_detail', args=[record.serial_number])}';",
-            "style": "cursor: pointer;",
+
+    def row_values(self, record, page):
+        return {
+            'url': self.row_link(page, record.serial_number),
+            'serial_number': escape(record.serial_number),
+            'model': text(record.model),
+            'shipment_date': date(record.shipment_date),
+            'client': email(record.client),
+            'service_company': email(record.service_company),
         }
 
 
-class MaintenanceTable(tables.Table):
+class MaintenanceTable(FastRowsMixin, tables.Table):
     machine = tables.Column(
         accessor="machine.serial_number",
         verbose_name=_("Машина")
@@ -48,24 +144,20 @@ class MaintenanceTable(tables.Table):
         verbose_name=_("Сервисная компания"),
         empty_values=(),
     )
+    actions = tables.Column(empty_values=(), orderable=False, verbose_name=_("Действия"))
 
-    actions = tables.TemplateColumn(
-        template_code="""
-            {% if is_manager or request.user == record.organization or request.user == record.service_company %}
-                <a href="{% url 'core:maintenance_edit' pk=record.pk %}" 
-                   title="Редактировать" 
-                   onclick="event.stopPropagation();">✏️</a>
-                <a href="{% url 'core:maintenance_delete' pk=record.pk %}" 
-                   title="Удалить" 
-                   onclick="event.stopPropagation(); return confirm('Уверены?');">🗑</a>
-            {% endif %}
-        """,
-        orderable=False,
-        verbose_name=_("Действия"),
+    row_template = (
+        ROW_OPEN + '<td>{machine}</td><td>{type}</td><td>{date}</td><td>{hours}</td>'
+        '<td>{organization}</td><td>{service_company}</td><td>{actions}</td></tr>'
+    )
+    actions_template = (
+        '<a href="{edit}" title="Редактировать" onclick="event.stopPropagation();">✏️</a> '
+        '<a href="{delete}" title="Удалить" onclick="event.stopPropagation(); return confirm(&#x27;Уверены?&#x27;);">🗑</a>'
     )
 
     class Meta:
         model = Maintenance
+        template_name = "core/tables/fast_table.html"
         fields = (
             "machine",
             "type",
@@ -78,14 +170,36 @@ class MaintenanceTable(tables.Table):
         order_by = "-date"
         orderable = False
         attrs = {"class": "data-table", "thead": {"class": "no-sort"}}
-        row_attrs = {
-            "onclick": lambda
-                record: f"window.location.href='{reverse('core:machine_detail', args=[record.machine.serial_number])}';",
-            "style": "cursor: pointer;",
+
+    def page_context(self):
+        return {
+            **super().page_context(),
+            'edit_url': url_template('core:maintenance_edit', 'pk'),
+            'delete_url': url_template('core:maintenance_delete', 'pk'),
+        }
+
+    def row_values(self, record, page):
+        user_id = page['user_id']
+        can_edit = page['is_manager'] or (
+            user_id is not None and user_id in (record.organization_id, record.service_company_id)
+        )
+        actions = self.actions_template.format(
+            edit=page['edit_url'].format(pk=record.pk),
+            delete=page['delete_url'].format(pk=record.pk),
+        ) if can_edit else ''
+        return {
+            'url': self.row_link(page, record.machine.serial_number),
+            'machine': escape(record.machine.serial_number),
+            'type': text(record.type),
+            'date': date(record.date),
+            'hours': record.hours,
+            'organization': email(record.organization),
+            'service_company': email(record.service_company),
+            'actions': actions,
         }
 
 
-class ClaimTable(tables.Table):
+class ClaimTable(FastRowsMixin, tables.Table):
     machine = tables.Column(
         accessor="machine.serial_number",
         verbose_name=_("Машина")
@@ -99,21 +213,20 @@ class ClaimTable(tables.Table):
         verbose_name=_("Сервис"),
         empty_values=(),
     )
-    actions = tables.TemplateColumn(
-        template_code="""
-            {% if is_manager or request.user == record.service_company %}
-                <a href="{% url 'core:claim_edit' pk=record.pk %}" 
-                   onclick="event.stopPropagation();">✏️</a>
-                <a href="{% url 'core:claim_delete' pk=record.pk %}" 
-                   onclick="event.stopPropagation(); return confirm('Уверены?');">🗑</a>
-            {% endif %}
-        """,
-        orderable=False,
-        verbose_name=_("Действия"),
+    actions = tables.Column(empty_values=(), orderable=False, verbose_name=_("Действия"))
+
+    row_template = (
+        ROW_OPEN + '<td>{machine}</td><td>{failure_date}</td><td>{failure_node}</td><td>{recovery_date}</td>'
+        '<td>{downtime}</td><td>{service_company}</td><td>{actions}</td></tr>'
+    )
+    actions_template = (
+        '<a href="{edit}" onclick="event.stopPropagation();">✏️</a> '
+        '<a href="{delete}" onclick="event.stopPropagation(); return confirm(&#x27;Уверены?&#x27;);">🗑</a>'
     )
 
     class Meta:
         model = Claim  # ← было Maintenance — исправлено!
+        template_name = "core/tables/fast_table.html"
         fields = (
             "machine",
             "failure_date",
@@ -126,8 +239,29 @@ class ClaimTable(tables.Table):
         order_by = "-failure_date"
         orderable = False
         attrs = {"class": "data-table", "thead": {"class": "no-sort"}}
-        row_attrs = {
-            "onclick": lambda
-                record: f"window.location.href='{reverse('core:machine_detail', args=[record.machine.serial_number])}';",
-            "style": "cursor: pointer;",
-        }
\ No newline at end of file
+
+    def page_context(self):
+        return {
+            **super().page_context(),
+            'edit_url': url_template('core:claim_edit', 'pk'),
+            'delete_url': url_template('core:claim_delete', 'pk'),
+        }
+
+    def row_values(self, record, page):
+        user_id = page['user_id']
+        can_edit = page['is_manager'] or (user_id is not None and record.service_company_id == user_id)
+        actions = self.actions_template.format(
+            edit=page['edit_url'].format(pk=record.pk),
+            delete=page['delete_url'].format(pk=record.pk),
+        ) if can_edit else ''
+        downtime = record.downtime
+        return {
+            'url': self.row_link(page, record.machine.serial_number),
+            'machine': escape(record.machine.serial_number),
+            'failure_date': date(record.failure_date),
+            'failure_node': text(record.failure_node),
+            'recovery_date': date(record.recovery_date),
+            'downtime': EMPTY if downtime is None else downtime,
+            'service_company': email(record.service_company),
+            'actions': actions,
+        }
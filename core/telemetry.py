@@ -0,0 +1,262 @@
+# core/telemetry.py
+"""
+Показания счётчиков моточасов: приём пачками и хранение пачками.
+
+Машина присылает (зав. номер, время, наработка). Показания хранятся не
+строкой на показание, а в HourMeterChunk: до TELEMETRY_CHUNK_SIZE показаний
+одной машины — разности времени (секунды) и наработки (0,1 м/ч) соседних
+показаний, массивы int32, сжатые zlib. Маленькие разности сжимаются в
+1–2 байта на показание против ~50 байт строки с индексом.
+
+Приём (ingest) группирует показания по машинам и пишет их несколькими
+запросами на весь вызов: номера -> id, открытые пачки машин, bulk_update
+и bulk_create. Показания не новее последнего сохранённого для машины
+пропускаются (повторная отправка, опоздавшие).
+
+Чтение (hour_meter_series) прореживает ряд до заданного числа точек — для
+графика на карточке машины и прогноза ТО (maintenance_forecast); длинные
+интервалы строятся по границам пачек без распаковки.
+"""
+import datetime
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from .models import HourMeterChunk, Machine
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Допустимые показания: разности времени (с) и наработки (0,1 м/ч) внутри пачки
+# хранятся в int32 — 60 лет и миллион м/ч в него помещаются
+FIRST_YEAR, LAST_YEAR = 2000, 2059
+MAX_HOURS = 1_000_000
+
+
+class TelemetryError(ValueError):
+    """Неверное показание во входных данных"""
+
+
+def _chunk_size():
+    return getattr(settings, 'TELEMETRY_CHUNK_SIZE', 1024)
+
+
+def _to_bytes(values):
+    data = array('i', values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _from_bytes(raw):
+    data = array('i')
+    data.frombytes(raw)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def encode(readings):
+    """[(секунды epoch, наработка в 0,1 м/ч)] по возрастанию времени -> bytes"""
+    times = [t for t, _ in readings]
+    hours = [h for _, h in readings]
+    time_deltas = [0] + [b - a for a, b in zip(times, times[1:])]
+    hour_deltas = [0] + [b - a for a, b in zip(hours, hours[1:])]
+    return zlib.compress(_to_bytes(time_deltas) + _to_bytes(hour_deltas))
+
+
+def decode(chunk):
+    """Пачка -> [(секунды epoch, наработка в 0,1 м/ч)]"""
+    raw = zlib.decompress(bytes(chunk.data))
+    half = len(raw) // 2
+    start = _epoch(chunk.start)
+    times = accumulate(_from_bytes(raw[:half]), initial=start)
+    hours = accumulate(_from_bytes(raw[half:]), initial=chunk.first_hours)
+    next(times), next(hours)  # initial + первая нулевая разность
+    return list(zip(times, hours))
+
+
+def _epoch(moment):
+    return int((moment - EPOCH).total_seconds())
+
+
+def _moment(seconds):
+    return EPOCH + datetime.timedelta(seconds=seconds)
+
+
+def _parse_time(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        moment = datetime.datetime.fromisoformat(value)
+        if timezone.is_naive(moment):
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return _epoch(moment)
+    raise TypeError(value)
+
+
+def _group(readings):
+    """Показания -> {номер в верхнем регистре: {секунды: наработка}}"""
+    grouped = {}
+    lower = _epoch(datetime.datetime(FIRST_YEAR, 1, 1, tzinfo=datetime.timezone.utc))
+    upper = _epoch(datetime.datetime(LAST_YEAR + 1, 1, 1, tzinfo=datetime.timezone.utc))
+    for index, reading in enumerate(readings):
+        try:
+            serial, moment, hours = reading
+            key, seconds, tenths = serial.strip().upper(), _parse_time(moment), round(float(hours) * 10)
+        except (TypeError, ValueError, AttributeError, OverflowError):  # OverflowError — inf, год > 9999
+            raise TelemetryError(f'Показание {index}: ожидается [зав. номер, время, наработка]')
+        if not lower <= seconds < upper:
+            raise TelemetryError(f'Показание {index}: время вне {FIRST_YEAR}–{LAST_YEAR} гг.')
+        if not 0 <= tenths <= MAX_HOURS * 10:
+            raise TelemetryError(f'Показание {index}: наработка вне 0–{MAX_HOURS} м/ч')
+        grouped.setdefault(key, {})[seconds] = tenths
+    return grouped
+
+
+def _new_chunk(machine_id, readings):
+    return HourMeterChunk(
+        machine_id=machine_id,
+        start=_moment(readings[0][0]), end=_moment(readings[-1][0]), count=len(readings),
+        first_hours=readings[0][1], last_hours=readings[-1][1],
+        data=encode(readings), open=False,
+    )
+
+
+def _fill(chunk, readings):
+    chunk.end, chunk.count = _moment(readings[-1][0]), len(readings)
+    chunk.last_hours = readings[-1][1]
+    chunk.data = encode(readings)
+
+
+def ingest(readings):
+    """
+    Сохраняет показания [(зав. номер, время, наработка м/ч), ...]; время —
+    секунды epoch или ISO 8601. Возвращает {'accepted', 'skipped', 'unknown'}.
+    """
+    grouped = _group(readings)
+    machines = dict(
+        Machine.objects.annotate(serial_upper=Upper('serial_number'))
+        .filter(serial_upper__in=list(grouped)).values_list('serial_upper', 'pk')
+    )
+    unknown = sorted(set(grouped) - set(machines))
+    size = _chunk_size()
+    accepted = skipped = 0
+    changed, created = [], []
+
+    with transaction.atomic():
+        open_chunks = {
+            chunk.machine_id: chunk
+            for chunk in HourMeterChunk.objects.select_for_update().filter(machine_id__in=list(machines.values()), open=True)
+        }
+        for serial, machine_id in machines.items():
+            new = sorted(grouped[serial].items())
+            current = open_chunks.get(machine_id)
+            if current is not None:
+                last = _epoch(current.end)
+                fresh = [reading for reading in new if reading[0] > last]
+                skipped += len(new) - len(fresh)
+                if not fresh:
+                    continue
+                new = decode(current) + fresh
+                accepted += len(fresh)
+            else:
+                accepted += len(new)
+
+            # Дописывается только последняя пачка машины, остальные закрыты
+            pieces = [new[i:i + size] for i in range(0, len(new), size)]
+            if current is not None:
+                _fill(current, pieces.pop(0))
+                current.open = not pieces
+                changed.append(current)
+            chunks = [_new_chunk(machine_id, piece) for piece in pieces]
+            if chunks:
+                chunks[-1].open = True
+            created.extend(chunks)
+
+        if changed:
+            # Сначала закрываем старые открытые пачки, потом создаём новые (уникальность открытой)
+            HourMeterChunk.objects.bulk_update(changed, ['end', 'count', 'last_hours', 'data', 'open'])
+        HourMeterChunk.objects.bulk_create(created, batch_size=500)
+
+    skipped += sum(len(grouped[serial]) for serial in unknown)
+    return {'accepted': accepted, 'skipped': skipped, 'unknown': unknown}
+
+
+def _chunks(machine, since=None, until=None):
+    chunks = HourMeterChunk.objects.filter(machine=machine)
+    if since is not None:
+        chunks = chunks.filter(end__gte=since)
+    if until is not None:
+        chunks = chunks.filter(start__lte=until)
+    return chunks.order_by('start')
+
+
+def hour_meter_series(machine, since=None, until=None, points=100):
+    """
+    Наработка за интервал, не больше points точек: интервал делится на равные
+    отрезки, от каждого берётся последнее показание. [(datetime, м/ч)]
+
+    Если пачек в интервале хватает на points точек, берутся их первые и
+    последние показания из полей пачки — без чтения и распаковки данных.
+    """
+    summaries = list(_chunks(machine, since, until).defer('data'))
+    if not summaries:
+        return []
+    if len(summaries) * 2 >= points:
+        readings = [
+            reading
+            for chunk in summaries
+            for reading in ((_epoch(chunk.start), chunk.first_hours), (_epoch(chunk.end), chunk.last_hours))
+        ]
+    else:
+        low = _epoch(since) if since is not None else None
+        high = _epoch(until) if until is not None else None
+        readings = [
+            reading
+            for chunk in _chunks(machine, since, until)
+            for reading in decode(chunk)
+            if (low is None or reading[0] >= low) and (high is None or reading[0] <= high)
+        ]
+    if not readings:
+        return []
+    first, last = readings[0][0], readings[-1][0]
+    width = max(1, (last - first + points) // points)
+    buckets = {}
+    for moment, hours in readings:
+        buckets[(moment - first) // width] = (moment, hours)
+    return [(_moment(moment), hours / 10) for moment, hours in buckets.values()]
+
+
+def latest_reading(machine):
+    """(datetime, м/ч) последнего показания или None — без распаковки"""
+    chunk = HourMeterChunk.objects.filter(machine=machine).order_by('-end').only('end', 'last_hours').first()
+    return (chunk.end, chunk.last_hours / 10) if chunk is not None else None
+
+
+def maintenance_forecast(series, last_maintenance_hours=None, interval=None):
+    """
+    Прогноз по ряду hour_meter_series: средняя наработка в сутки и, если известна
+    наработка последнего ТО, когда наберётся следующий интервал ТО.
+    """
+    if len(series) < 2:
+        return None
+    (start, start_hours), (end, end_hours) = series[0], series[-1]
+    days = (end - start).total_seconds() / 86400
+    if days <= 0:
+        return None
+    per_day = (end_hours - start_hours) / days
+    forecast = {'hours': end_hours, 'at': end, 'per_day': per_day, 'next_hours': None, 'next_date': None}
+
+    interval = interval or getattr(settings, 'MAINTENANCE_INTERVAL_HOURS', 500)
+    if last_maintenance_hours is not None:
+        next_hours = last_maintenance_hours + interval
+        forecast['next_hours'] = next_hours
+        if per_day > 0:
+            forecast['next_date'] = (end + datetime.timedelta(days=max(0, next_hours - end_hours) / per_day)).date()
+    return forecast
@@ -0,0 +1,88 @@
+# core/templatetags/admin_drilldown.py
+"""
+date_hierarchy админки без DISTINCT по всей таблице.
+
+Стандартный тег на верхнем уровне выбирает все строки таблицы, чтобы
+получить список лет (SELECT DISTINCT django_date_trunc(...)); на миллионе
+рекламаций это полный проход на каждое открытие списка. Здесь каждое
+следующее значение (год, месяц, день) находится поиском минимума по
+индексу поля даты: число запросов — по числу значений, каждый — O(log n).
+
+При поиске или фильтрах списка минимум уже не найти по одному индексу, и
+каждый такой запрос проходил бы отобранные строки заново — тогда остаётся
+стандартный DISTINCT, один проход по отобранному.
+"""
+import copy
+import datetime
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.db.models import Min
+
+register = template.Library()
+
+
+def _truncate(value, kind):
+    if kind == 'year':
+        return value.replace(month=1, day=1)
+    if kind == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def _following(value, kind):
+    if kind == 'year':
+        return value.replace(year=value.year + 1)
+    if kind == 'month':
+        return value.replace(year=value.year + value.month // 12, month=value.month % 12 + 1)
+    return value + datetime.timedelta(days=1)
+
+
+def distinct_dates(queryset, field_name, kind):
+    """Как queryset.dates(field_name, kind), но поиском по индексу на каждое значение"""
+    queryset = queryset.order_by()
+    found = []
+    lower = None
+    while True:
+        candidates = queryset if lower is None else queryset.filter(**{f'{field_name}__gte': lower})
+        first = candidates.aggregate(first=Min(field_name))['first']
+        if first is None:
+            return found
+        found.append(_truncate(first, kind))
+        try:
+            lower = _following(found[-1], kind)
+        except (OverflowError, ValueError):  # 9999 год
+            return found
+
+
+class _IndexedDates:
+    """Queryset, у которого dates() идёт по индексу; остальное — как у исходного"""
+
+    def __init__(self, queryset):
+        self._queryset = queryset
+
+    def __getattr__(self, name):
+        return getattr(self._queryset, name)
+
+    def dates(self, field_name, kind, order='ASC'):
+        return distinct_dates(self._queryset, field_name, kind)
+
+
+def indexed_date_hierarchy(cl):
+    if cl.query or cl.has_active_filters:
+        return date_hierarchy(cl)
+    changelist = copy.copy(cl)
+    changelist.queryset = _IndexedDates(cl.queryset)
+    return date_hierarchy(changelist)
+
+
+@register.tag(name='indexed_date_hierarchy')
+def indexed_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser,
+        token,
+        func=indexed_date_hierarchy,
+        template_name='date_hierarchy.html',
+        takes_context=False,
+    )
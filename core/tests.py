@@ -1,3 +1,1984 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from html.parser import HTMLParser
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models.signals import pre_delete
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import django_tables2 as tables2
+from django_tables2 import RequestConfig
+from openpyxl import load_workbook
+
+from .admin import EstimatedCountPaginator
+from .archive import archive_batches, archive_cutoff, machine_claims, machine_maintenances
+from .audit import audit_writer
+from .metrics import LATENCY_BUCKETS_MS, _worker_id, collect, estimate_quantile
+from .instrumentation import record_query
+from .management.commands.benchmark import Command as BenchmarkCommand
+from .jobs import HANDLERS, claim_jobs, enqueue, handler, run_due_jobs
+from .telemetry import decode, encode, hour_meter_series, ingest, maintenance_forecast
+from .benchmarks import build_scenarios, compare, run_scenario
+from .loadtest import Results, cleanup, run as run_loadtest
+from .async_views import AsyncDashboardView, AsyncListAPIView, AsyncMachineDetailView, gather_reads
+from .parts import parse_parts, parts_usage
+from .profiling import _active as profiler_lock
+from .permissions import is_manager, role_can, scope
+from .routers import REPLICA_ALIAS, PrimaryReplicaRouter, enable_replica_reads, reset_replica_reads
+from .search import matching
+from .tables import ClaimTable, FastRowsMixin, MachineTable, MaintenanceTable
+from .utils.stemmer import stem
+from .serial_index import BloomFilter, serial_index
+from .templatetags.admin_drilldown import distinct_dates
+from .compression import negotiate
+from .middleware import STICKY_SESSION_KEY, CompressionMiddleware, HybridMiddleware
+from .views import HASHED_STATIC_RE, DashboardView, MachineDetailView, static_asset
+from .models import (
+    User, MachineModel, EngineModel, TransmissionModel, DriveAxleModel, SteerAxleModel,
+    Machine, MaintenanceType, FailureNode, RecoveryMethod, Maintenance, Claim, AuditEntry, Job,
+    HourMeterChunk, Part, ClaimPart, ArchivedMaintenance, ArchivedClaim,
+)
+
+
+class FleetTestData:
+    """Небольшой парк техники: по пользователю на каждую роль, машины, ТО и рекламации"""
+
+    @classmethod
+    def setUpTestData(cls):
+        groups = {name: Group.objects.create(name=name)
+                  for name in ('Менеджер', 'Клиент', 'Сервисная_организация')}
+
+        cls.manager = User.objects.create_user('manager@test.ru', 'pass')
+        cls.manager.groups.add(groups['Менеджер'])
+        cls.client_user = User.objects.create_user('client@test.ru', 'pass')
+        cls.client_user.groups.add(groups['Клиент'])
+        cls.service = User.objects.create_user('service@test.ru', 'pass')
+        cls.service.groups.add(groups['Сервисная_организация'])
+
+        model = MachineModel.objects.create(name='ПД1,5')
+        engine = EngineModel.objects.create(name='Kubota D1803')
+        transmission = TransmissionModel.objects.create(name='10VB-00106')
+        drive_axle = DriveAxleModel.objects.create(name='20VA-00101')
+        steer_axle = SteerAxleModel.objects.create(name='VS20-00001')
+        maintenance_type = MaintenanceType.objects.create(name='ТО-1')
+        failure_node = FailureNode.objects.create(name='Двигатель')
+        recovery_method = RecoveryMethod.objects.create(name='Ремонт узла')
+
+        cls.machines = []
+        for i in range(3):
+            machine = Machine.objects.create(
+                serial_number=f'SN{i:04d}',
+                model=model,
+                engine_model=engine,
+                transmission_model=transmission,
+                drive_axle_model=drive_axle,
+                steer_axle_model=steer_axle,
+                shipment_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i),
+                client=cls.client_user,
+                service_company=cls.service,
+            )
+            cls.machines.append(machine)
+            for day in range(3):
+                Maintenance.objects.create(
+                    machine=machine,
+                    type=maintenance_type,
+                    date=datetime.date(2025, 1, 1) + datetime.timedelta(days=day),
+                    hours=100 * (day + 1),
+                    organization=cls.service,
+                    service_company=cls.service,
+                )
+            Claim.objects.create(
+                machine=machine,
+                failure_date=datetime.date(2025, 2, 1),
+                failure_node=failure_node,
+                recovery_method=recovery_method,
+                recovery_date=datetime.date(2025, 2, 5),
+                service_company=cls.service,
+            )
+
+    def users_by_role(self):
+        return {
+            'manager': self.manager,
+            'client': self.client_user,
+            'service': self.service,
+        }
+
+
+class QueryPlanTests(FleetTestData, TestCase):
+    """
+    Прогоняет дашборд и карточку машины под каждой ролью и проверяет
+    EXPLAIN QUERY PLAN каждого SELECT: полный проход по таблице без индекса
+    (``SCAN core_machine``) считается регрессией. Обход индекса
+    (``SCAN ... USING INDEX``) допустим — он ограничен LIMIT пагинации.
+    """
+
+    # Справочники и служебные таблицы малы и целиком выводятся в фильтрах
+    ALLOWED_FULL_SCANS = {
+        'core_machinemodel', 'core_enginemodel', 'core_transmissionmodel',
+        'core_driveaxlemodel', 'core_steeraxlemodel', 'core_maintenancetype',
+        'core_failurenode', 'core_recoverymethod', 'auth_group',
+    }
+    FULL_SCAN_RE = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)')
+    # Подзапросы с LIMIT (ветки ленты, core/timeline.py) читаются целиком — это не таблицы
+    SUBQUERY_RE = re.compile(r'\bCO-ROUTINE (\w+)')
+
+    def assertNoFullScans(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            subqueries = {match.group(1) for line in plan for match in self.SUBQUERY_RE.finditer(line)}
+            for line in plan:
+                match = self.FULL_SCAN_RE.search(line)
+                if match and match.group(1) not in self.ALLOWED_FULL_SCANS | subqueries:
+                    self.fail(f'{url}: полный скан {match.group(1)}\n{sql}\n' + '\n'.join(plan))
+
+    def test_dashboard_tabs(self):
+        for role, user in self.users_by_role().items():
+            self.client.force_login(user)
+            for tab in ('machines', 'maintenance', 'claims'):
+                with self.subTest(role=role, tab=tab):
+                    self.assertNoFullScans(f"{reverse('core:dashboard')}?tab={tab}")
+
+    def test_machine_detail(self):
+        url = reverse('core:machine_detail', args=[self.machines[0].serial_number])
+        for role, user in self.users_by_role().items():
+            self.client.force_login(user)
+            with self.subTest(role=role):
+                self.assertNoFullScans(url)
+
+
+class PermissionTests(FleetTestData, TestCase):
+    """
+    Права ролей (core/permissions.py): что каждая роль видит, меняет и удаляет.
+    Чужой объект не находится (404), действие, которого у роли нет, — 403,
+    добавление к несуществующей или чужой машине — 403.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_client = User.objects.create_user('other-client@test.ru', 'pass')
+        cls.other_client.groups.add(Group.objects.get(name='Клиент'))
+        cls.other_service = User.objects.create_user('other-service@test.ru', 'pass')
+        cls.other_service.groups.add(Group.objects.get(name='Сервисная_организация'))
+        own = cls.machines[0]
+        cls.other_machine = Machine.objects.create(
+            serial_number='OTHER1', model=own.model, engine_model=own.engine_model,
+            transmission_model=own.transmission_model, drive_axle_model=own.drive_axle_model,
+            steer_axle_model=own.steer_axle_model, shipment_date=own.shipment_date,
+            client=cls.other_client, service_company=cls.other_service,
+        )
+        # ТО чужой машины, которое проводила наша сервисная организация: видит, но не меняет
+        cls.other_maintenance = Maintenance.objects.create(
+            machine=cls.other_machine, type=MaintenanceType.objects.get(), date=datetime.date(2025, 3, 1),
+            hours=10, organization=cls.service, service_company=cls.other_service,
+        )
+        cls.other_claim = Claim.objects.create(
+            machine=cls.other_machine, failure_date=datetime.date(2025, 3, 1),
+            failure_node=FailureNode.objects.get(), recovery_method=RecoveryMethod.objects.get(),
+            recovery_date=datetime.date(2025, 3, 2), service_company=cls.other_service,
+        )
+
+    def test_scope_per_role(self):
+        own_machines = {machine.pk for machine in self.machines}
+        own_maintenances = set(Maintenance.objects.filter(machine_id__in=own_machines).values_list('pk', flat=True))
+        own_claims = set(Claim.objects.filter(machine_id__in=own_machines).values_list('pk', flat=True))
+        all_machines = own_machines | {self.other_machine.pk}
+        all_maintenances = own_maintenances | {self.other_maintenance.pk}
+        all_claims = own_claims | {self.other_claim.pk}
+        expected = {
+            (Machine, 'view'): (all_machines, own_machines, own_machines),
+            (Machine, 'add_maintenance'): (all_machines, own_machines, own_machines),
+            (Machine, 'add_claim'): (all_machines, set(), own_machines),
+            (Machine, 'change'): (all_machines, set(), set()),
+            (Maintenance, 'view'): (all_maintenances, own_maintenances, all_maintenances),
+            (Maintenance, 'change'): (all_maintenances, own_maintenances, own_maintenances),
+            (Maintenance, 'delete'): (all_maintenances, own_maintenances, own_maintenances),
+            (Claim, 'view'): (all_claims, own_claims, own_claims),
+            (Claim, 'change'): (all_claims, set(), own_claims),
+            (Claim, 'delete'): (all_claims, set(), own_claims),
+        }
+        for (model, action), sets in expected.items():
+            for user, ids in zip((self.manager, self.client_user, self.service), sets):
+                with self.subTest(model=model.__name__, action=action, user=user.email):
+                    self.assertEqual(set(scope(model.objects.all(), user, action).values_list('pk', flat=True)), ids)
+                    self.assertEqual(role_can(user, model, action), bool(ids))
+        for model in (Machine, Maintenance, Claim):
+            self.assertFalse(scope(model.objects.all(), User.objects.create_user(f'{model.__name__}@test.ru')).exists())
+
+    def assertStatus(self, user, url, status):
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, status, f'{user.email} {url}')
+
+    def test_object_views(self):
+        own_maintenance = self.machines[0].maintenances.first()
+        own_claim = self.machines[0].claims.get()
+        cases = (
+            ('core:machine_detail', self.machines[0].serial_number, (200, 200, 200)),
+            ('core:machine_detail', self.other_machine.serial_number, (200, 404, 404)),
+            ('core:machine_edit', self.machines[0].serial_number, (200, 403, 403)),
+            ('core:maintenance_edit', own_maintenance.pk, (200, 200, 200)),
+            ('core:maintenance_edit', self.other_maintenance.pk, (200, 404, 404)),
+            ('core:maintenance_delete', own_maintenance.pk, (200, 200, 200)),
+            ('core:maintenance_delete', self.other_maintenance.pk, (200, 404, 404)),
+            ('core:claim_edit', own_claim.pk, (200, 403, 200)),
+            ('core:claim_edit', self.other_claim.pk, (200, 403, 404)),
+            ('core:claim_delete', own_claim.pk, (200, 403, 200)),
+            ('core:claim_delete', self.other_claim.pk, (200, 403, 404)),
+        )
+        for name, arg, statuses in cases:
+            for user, status in zip((self.manager, self.client_user, self.service), statuses):
+                self.assertStatus(user, reverse(name, args=[arg]), status)
+
+    def test_create_views(self):
+        cases = (
+            ('core:maintenance_create', self.machines[0].serial_number, (200, 200, 200)),
+            ('core:maintenance_create', self.other_machine.serial_number, (200, 403, 403)),
+            ('core:maintenance_create', 'NOPE', (403, 403, 403)),
+            ('core:claim_create', self.machines[0].serial_number, (200, 403, 200)),
+            ('core:claim_create', self.other_machine.serial_number, (200, 403, 403)),
+            ('core:claim_create', 'NOPE', (403, 403, 403)),
+        )
+        for name, serial, statuses in cases:
+            for user, status in zip((self.manager, self.client_user, self.service), statuses):
+                self.assertStatus(user, reverse(name, args=[serial]), status)
+
+        # Запись тоже проверяется: клиент не добавит ТО чужой машине
+        self.client.force_login(self.client_user)
+        response = self.client.post(reverse('core:maintenance_create', args=[self.other_machine.serial_number]), {
+            'type': MaintenanceType.objects.get().pk, 'date': '2025-04-01', 'hours': 20,
+            'organization': self.service.pk, 'service_company': self.service.pk,
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.other_machine.maintenances.count(), 1)
+
+
+class ReplicaRoutingTests(FleetTestData, TestCase):
+    """
+    Чтения из view с @replica_reads уходят на реплику, кроме REPLICA_STICKY_SECONDS
+    после успешной записи пользователя. Реплики в тестах нет: решение роутера
+    записывается, а читается всё равно основная БД.
+    """
+
+    def setUp(self):
+        for target in ('core.routers.replica_configured', 'core.middleware.replica_configured'):
+            patcher = mock.patch(target, return_value=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def routed(self, method, url, data=None):
+        """Ответ и базы, куда роутер отправил чтения моделей core"""
+        aliases = set()
+        route = PrimaryReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            alias = route(router, model, **hints)
+            if model._meta.app_label == 'core':
+                aliases.add(alias)
+            return 'default'
+
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read):
+            response = getattr(self.client, method)(url, data)
+        return response, aliases
+
+    def test_marked_views_read_from_replica(self):
+        self.client.force_login(self.manager)
+        for url in (reverse('core:dashboard'), reverse('core:parts_report')):
+            with self.subTest(url=url):
+                response, aliases = self.routed('get', url)
+                self.assertEqual((response.status_code, aliases), (200, {REPLICA_ALIAS}))
+
+        url = reverse('core:machine_detail', args=[self.machines[0].serial_number])
+        self.assertEqual(self.routed('get', url)[1], {'default'})
+        # Флаг не переживает запрос
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(Machine), 'default')
+
+    @override_settings(REPLICA_STICKY_SECONDS=10)
+    def test_reads_after_write_stick_to_primary(self):
+        self.client.force_login(self.manager)
+        maintenance = self.machines[0].maintenances.first()
+        response, _ = self.routed('post', reverse('core:maintenance_delete', args=[maintenance.pk]))
+        self.assertEqual(response.status_code, 302)
+
+        response, aliases = self.routed('get', reverse('core:dashboard'))
+        self.assertEqual((response.status_code, aliases), (200, {'default'}))
+
+        # Окно прошло — снова реплика
+        session = self.client.session
+        session[STICKY_SESSION_KEY] = time.time() - 1
+        session.save()
+        self.assertEqual(self.routed('get', reverse('core:dashboard'))[1], {REPLICA_ALIAS})
+
+    def test_failed_write_does_not_stick(self):
+        self.client.force_login(self.client_user)
+        claim = self.machines[0].claims.first()
+        response, _ = self.routed('post', reverse('core:claim_delete', args=[claim.pk]))
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn(STICKY_SESSION_KEY, self.client.session)
+        self.assertEqual(self.routed('get', reverse('core:dashboard'))[1], {REPLICA_ALIAS})
+
+
+class QueryBudgetTests(FleetTestData, TestCase):
+    """
+    Для каждого URL из core/urls.py — предельное число SQL-запросов по ролям.
+    Бюджет не должен зависеть от числа строк на странице: запрос на каждую
+    строку таблицы (N+1) сразу выводит тест за предел.
+    """
+
+    # имя URL -> {роль: максимум запросов}; запросы сессии и пользователя входят в бюджет.
+    # Запрещённые роли (403) укладываются в проверку доступа.
+    BUDGETS = {
+        'home': {'manager': 2, 'client': 2, 'service': 2},
+        'dashboard': {'manager': 19, 'client': 19, 'service': 19},
+        'machine_create': {'manager': 10, 'client': 3, 'service': 3},
+        'machine_reassign': {'manager': 8, 'client': 3, 'service': 3},
+        'machine_edit': {'manager': 12, 'client': 3, 'service': 3},
+        'machine_detail': {'manager': 8, 'client': 8, 'service': 8},
+        'machine_timeline': {'manager': 5, 'client': 5, 'service': 5},
+        'maintenance_create': {'manager': 7, 'client': 7, 'service': 7},
+        'maintenance_edit': {'manager': 9, 'client': 9, 'service': 9},
+        'claim_create': {'manager': 7, 'client': 3, 'service': 7},
+        'claim_edit': {'manager': 8, 'client': 3, 'service': 8},
+        'maintenance_delete': {'manager': 4, 'client': 4, 'service': 4},
+        'claim_delete': {'manager': 4, 'client': 3, 'service': 4},
+        'export_machines': {'manager': 4, 'client': 4, 'service': 4},
+        'export_machine_history': {'manager': 8, 'client': 8, 'service': 8},
+        'metrics': {'manager': 2, 'client': 2, 'service': 2},
+        'profiles': {'manager': 2, 'client': 2, 'service': 2},
+        'profile_download': {'manager': 2, 'client': 2, 'service': 2},
+        'api_machines': {'manager': 5, 'client': 5, 'service': 5},
+        'api_maintenance': {'manager': 5, 'client': 5, 'service': 5},
+        'api_claims': {'manager': 5, 'client': 5, 'service': 5},
+        'telemetry_ingest': {'manager': 2, 'client': 2, 'service': 2},
+        'parts_report': {'manager': 5, 'client': 5, 'service': 5},
+    }
+
+    # Ответ, если не 200: действие, которого у роли нет, — 403; страницы
+    # персонала остальным — редирект на вход в админку; телеметрия — только POST
+    STATUSES = {
+        'machine_create': {'client': 403, 'service': 403},
+        'machine_reassign': {'client': 403, 'service': 403},
+        'machine_edit': {'client': 403, 'service': 403},
+        'claim_create': {'client': 403},
+        'claim_edit': {'client': 403},
+        'claim_delete': {'client': 403},
+        'metrics': {'client': 302, 'service': 302},
+        'profiles': {'client': 302, 'service': 302},
+        'profile_download': {'manager': 404, 'client': 302, 'service': 302},
+        'telemetry_ingest': {'manager': 405, 'client': 405, 'service': 405},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Менеджер — ещё и персонал: страницы метрик и профилей проходят с реальной работой
+        cls.manager.is_staff = True
+        cls.manager.save()
+
+    def url_for(self, name):
+        machine = self.machines[0]
+        kwargs = {
+            'machine_edit': {'serial_number': machine.serial_number},
+            'machine_detail': {'serial_number': machine.serial_number},
+            'machine_timeline': {'serial_number': machine.serial_number},
+            'maintenance_create': {'serial_number': machine.serial_number},
+            'claim_create': {'serial_number': machine.serial_number},
+            'export_machine_history': {'serial_number': machine.serial_number},
+            'maintenance_edit': {'pk': machine.maintenances.first().pk},
+            'maintenance_delete': {'pk': machine.maintenances.first().pk},
+            'claim_edit': {'pk': machine.claims.first().pk},
+            'claim_delete': {'pk': machine.claims.first().pk},
+            'profile_download': {'name': 'missing.prof'},
+        }.get(name, {})
+        return reverse(f'core:{name}', kwargs=kwargs)
+
+    def assertQueryBudget(self, url, budget, status=200):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status, url)
+        if status == 302:
+            self.assertTrue(response['Location'].startswith(reverse('admin:login')), response['Location'])
+        if len(ctx) > budget:
+            queries = '\n'.join(f'{i}. {q["sql"]}' for i, q in enumerate(ctx.captured_queries, 1))
+            self.fail(f'{url}: {len(ctx)} запросов при бюджете {budget}\n{queries}')
+
+    def test_every_url_has_budget(self):
+        from .urls import urlpatterns
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names - set(self.BUDGETS), set(), 'URL без бюджета запросов')
+
+    def test_budgets(self):
+        for role, user in self.users_by_role().items():
+            self.client.force_login(user)
+            for name, budgets in self.BUDGETS.items():
+                with self.subTest(url=name, role=role):
+                    status = self.STATUSES.get(name, {}).get(role, 200)
+                    self.assertQueryBudget(self.url_for(name), budgets[role], status)
+
+    def test_dashboard_does_not_grow_with_rows(self):
+        url = reverse('core:dashboard')
+        self.client.force_login(self.manager)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+
+        # Ещё строки со своими клиентами и сервисными компаниями — N+1 дал бы по запросу на каждую
+        clients = Group.objects.get(name='Клиент')
+        services = Group.objects.get(name='Сервисная_организация')
+        sample = self.machines[0]
+        sample_claim = sample.claims.first()
+        for i in range(10):
+            client = User.objects.create_user(f'client{i}@test.ru', 'pass')
+            client.groups.add(clients)
+            service = User.objects.create_user(f'service{i}@test.ru', 'pass')
+            service.groups.add(services)
+            machine = Machine.objects.create(
+                serial_number=f'EXTRA{i:04d}', model=sample.model, shipment_date=sample.shipment_date,
+                client=client, service_company=service,
+            )
+            Maintenance.objects.create(
+                machine=machine, type=sample.maintenances.first().type, date=datetime.date(2025, 3, 1),
+                hours=10, organization=service, service_company=service,
+            )
+            Claim.objects.create(
+                machine=machine, failure_date=datetime.date(2025, 3, 1),
+                failure_node=sample_claim.failure_node, recovery_method=sample_claim.recovery_method,
+                service_company=service,
+            )
+
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(after), len(before))
+
+
+class AsyncViewsTests(FleetTestData, TestCase):
+    """Асинхронные страницы (SILANT_ASYNC_VIEWS) и JSON-списки"""
+
+    CSRF_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]+')
+
+    def get(self, view, user, url, **kwargs):
+        request = RequestFactory().get(url)
+        request.user = user
+        request.session = {}
+
+        async def auser():
+            return user
+        request.auser = auser
+
+        view = view.as_view()
+        if view.view_class.view_is_async:
+            response = async_to_sync(view)(request, **kwargs)
+        else:
+            response = view(request, **kwargs)
+        self.assertEqual(response.status_code, 200, url)
+        # CSRF-токен маскируется заново при каждом рендере
+        return self.CSRF_RE.sub(rb'\1-', response.content)
+
+    def test_same_html_as_sync_views(self):
+        serial_number = self.machines[0].serial_number
+        pages = [
+            (DashboardView, AsyncDashboardView, f"{reverse('core:dashboard')}?tab=maintenance", {}),
+            (MachineDetailView, AsyncMachineDetailView, reverse('core:machine_detail', args=[serial_number]),
+             {'serial_number': serial_number}),
+        ]
+        for role, user in self.users_by_role().items():
+            for sync_view, async_view, url, kwargs in pages:
+                with self.subTest(role=role, url=url):
+                    self.assertEqual(self.get(async_view, user, url, **kwargs), self.get(sync_view, user, url, **kwargs))
+
+    def test_api_list(self):
+        url = reverse('core:api_maintenance')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.client.force_login(self.client_user)
+        data = self.client.get(url, {'per_page': 2, 'page': 2}).json()
+        self.assertEqual(data['count'], 9)
+        self.assertEqual([row['date'] for row in data['results']], ['2025-01-03', '2025-01-02'])
+
+        self.assertEqual(self.client.get(url, {'page': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'type': 'x'}).status_code, 400)
+
+    def test_hybrid_middleware_passes_through(self):
+        response = HttpResponse('ok')
+
+        async def aget_response(request):
+            return response
+
+        request = RequestFactory().get('/')
+        self.assertIs(HybridMiddleware(lambda request: response)(request), response)
+        self.assertIs(async_to_sync(HybridMiddleware(aget_response))(request), response)
+
+    def test_default_serialize(self):
+        claim = self.machines[0].claims.get()
+        data = AsyncListAPIView().serialize(claim)
+        self.assertEqual(
+            {name: data[name] for name in ('id', 'failure_date', 'machine_id', 'service_company_id')},
+            {'id': claim.pk, 'failure_date': datetime.date(2025, 2, 1),
+             'machine_id': claim.machine_id, 'service_company_id': self.service.pk},
+        )
+        self.assertEqual(json.loads(JsonResponse(data).content)['recovery_date'], '2025-02-05')
+
+
+class GatherReadsTests(FleetTestData, TransactionTestCase):
+    """
+    gather_reads вне транзакции: чтения идут одновременно в потоках пула
+    со своими соединениями, флаг реплики переходит в каждый поток.
+    TransactionTestCase — в транзакции TestCase соседние соединения данных не видят.
+    """
+
+    def setUp(self):
+        self.setUpTestData()
+
+    def reads(self, parties=None):
+        barrier = threading.Barrier(parties, timeout=5) if parties else None
+        threads, aliases = set(), set()
+        route = PrimaryReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            aliases.add(route(router, model, **hints))
+            return 'default'  # реплики в тестах нет
+
+        def count(model):
+            def run():
+                if barrier is not None:
+                    barrier.wait()  # все чтения выполняются одновременно
+                threads.add(threading.current_thread().name)
+                return model.objects.count()
+            return run
+
+        async def view():
+            token = enable_replica_reads()
+            try:
+                return await gather_reads(count(Machine), count(Maintenance), count(Claim))
+            finally:
+                reset_replica_reads(token)
+
+        with mock.patch('core.routers.replica_configured', return_value=True), \
+                mock.patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read):
+            results = async_to_sync(view)()
+        return results, threads, aliases
+
+    def test_reads_run_concurrently_on_replica(self):
+        results, threads, aliases = self.reads(parties=3)
+        self.assertEqual(results, [3, 9, 3])
+        self.assertEqual(len(threads), 3)
+        self.assertTrue(all(name.startswith('silant-read') for name in threads), threads)
+        self.assertEqual(aliases, {REPLICA_ALIAS})
+
+    def test_reads_inside_transaction_run_in_request_thread(self):
+        with transaction.atomic():
+            Machine.objects.filter(pk=self.machines[0].pk).delete()
+            results, threads, aliases = self.reads()
+        self.assertEqual(results, [2, 6, 2])
+        self.assertFalse(any(name.startswith('silant-read') for name in threads), threads)
+        self.assertEqual(aliases, {REPLICA_ALIAS})
+
+
+class _Markup(HTMLParser):
+    """Разметка как список тегов (атрибуты без учёта порядка и экранирования) и текста"""
+
+    def __init__(self, html):
+        super().__init__()
+        self.items = []
+        self.feed(html)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        self.items.append((tag, sorted(attrs)))
+
+    def handle_endtag(self, tag):
+        self.items.append(('/' + tag,))
+
+    def handle_data(self, data):
+        data = ' '.join(data.split())
+        if data:
+            self.items.append(data)
+
+
+def _legacy_row_attrs(serial_number):
+    return {
+        'onclick': lambda record: f"window.location.href='{reverse('core:machine_detail', args=[serial_number(record)])}';",
+        'style': 'cursor: pointer;',
+    }
+
+
+class LegacyMachineTable(MachineTable):
+    class Meta(MachineTable.Meta):
+        template_name = 'django_tables2/semantic.html'
+        row_attrs = _legacy_row_attrs(lambda record: record.serial_number)
+
+
+class LegacyMaintenanceTable(MaintenanceTable):
+    actions = tables2.TemplateColumn(
+        template_code="""
+            {% if is_manager or request.user == record.organization or request.user == record.service_company %}
+                <a href="{% url 'core:maintenance_edit' pk=record.pk %}"
+                   title="Редактировать"
+                   onclick="event.stopPropagation();">✏️</a>
+                <a href="{% url 'core:maintenance_delete' pk=record.pk %}"
+                   title="Удалить"
+                   onclick="event.stopPropagation(); return confirm('Уверены?');">🗑</a>
+            {% endif %}
+        """,
+        orderable=False,
+        verbose_name='Действия',
+    )
+
+    class Meta(MaintenanceTable.Meta):
+        template_name = 'django_tables2/table.html'
+        row_attrs = _legacy_row_attrs(lambda record: record.machine.serial_number)
+
+
+class LegacyClaimTable(ClaimTable):
+    actions = tables2.TemplateColumn(
+        template_code="""
+            {% if is_manager or request.user == record.service_company %}
+                <a href="{% url 'core:claim_edit' pk=record.pk %}"
+                   onclick="event.stopPropagation();">✏️</a>
+                <a href="{% url 'core:claim_delete' pk=record.pk %}"
+                   onclick="event.stopPropagation(); return confirm('Уверены?');">🗑</a>
+            {% endif %}
+        """,
+        orderable=False,
+        verbose_name='Действия',
+    )
+
+    class Meta(ClaimTable.Meta):
+        template_name = 'django_tables2/table.html'
+        row_attrs = _legacy_row_attrs(lambda record: record.machine.serial_number)
+
+
+class FastTablesTests(FleetTestData, TestCase):
+    """
+    Строки таблиц дашборда (FastRowsMixin) совпадают с прежним рендером
+    django_tables2 через TemplateColumn: разметка, экранирование, ссылки действий по ролям.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Пользовательский текст с разметкой и кавычками
+        machine = cls.machines[0]
+        machine.serial_number = 'SN<b>&"0'
+        machine.save()
+        MachineModel.objects.filter(pk=machine.model_id).update(name='ПД<i>1,5 & "B"')
+        FailureNode.objects.update(name='<script>alert(1)</script>')
+        # Часть записей — чужой сервисной организации: у неё своих действий нет
+        cls.other_service = User.objects.create_user('other-service@test.ru', 'pass')
+        cls.other_service.groups.add(Group.objects.get(name='Сервисная_организация'))
+        Maintenance.objects.filter(machine=cls.machines[1]).update(
+            organization=cls.other_service, service_company=cls.other_service,
+        )
+        Claim.objects.filter(machine=cls.machines[2]).update(service_company=cls.other_service)
+
+    def render(self, table_class, queryset, user):
+        request = RequestFactory().get(reverse('core:dashboard'))
+        request.user = user
+        table = table_class(queryset)
+        RequestConfig(request).configure(table)
+        template = Template('{% load django_tables2 %}{% render_table table %}')
+        html = template.render(Context({
+            'table': table,
+            'request': request,
+            'is_manager': is_manager(user),
+        }))
+        return _Markup(html[html.index('<tbody'):html.index('</tbody>')]).items
+
+    def rows_by_role(self, fast, legacy, queryset):
+        rows = {}
+        for role, user in self.users_by_role().items():
+            rows[role] = self.render(fast, queryset, user)
+            self.assertEqual(rows[role], self.render(legacy, queryset, user), f'{fast.__name__}, {role}')
+        return rows
+
+    def test_machine_rows(self):
+        queryset = Machine.objects.select_related('model', 'client', 'service_company')
+        for rows in self.rows_by_role(MachineTable, LegacyMachineTable, queryset).values():
+            self.assertIn('SN<b>&"0', rows)
+            self.assertIn('ПД<i>1,5 & "B"', rows)
+
+    def test_maintenance_rows(self):
+        queryset = Maintenance.objects.select_related('machine', 'type', 'organization', 'service_company')
+        rows = self.rows_by_role(MaintenanceTable, LegacyMaintenanceTable, queryset)
+        edits = {role: sum(1 for tag in items if tag[0] == 'a' and ('title', 'Редактировать') in tag[1])
+                 for role, items in rows.items()}
+        self.assertEqual(edits, {'manager': 9, 'client': 0, 'service': 6})
+
+    def test_claim_rows(self):
+        queryset = Claim.objects.select_related('machine', 'failure_node', 'service_company')
+        rows = self.rows_by_role(ClaimTable, LegacyClaimTable, queryset)
+        links = {role: [dict(tag[1])['href'] for tag in items if tag[0] == 'a'] for role, items in rows.items()}
+        self.assertEqual({role: len(hrefs) for role, hrefs in links.items()}, {'manager': 6, 'client': 0, 'service': 4})
+        claim = Claim.objects.get(machine=self.machines[0])
+        self.assertIn(reverse('core:claim_delete', args=[claim.pk]), links['service'])
+        self.assertIn('<script>alert(1)</script>', rows['client'])
+
+    def test_quote_in_serial_stays_inside_js_string(self):
+        # Прежний рендер оставлял «'» в URL внутри onclick — строка JS обрывалась
+        Machine.objects.filter(pk=self.machines[0].pk).update(serial_number="SN'0")
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('core:dashboard'))
+        self.assertContains(response, "window.location.href=&#x27;/machines/SN%270/&#x27;;")
+
+    def test_default_hooks(self):
+        class PlainTable(FastRowsMixin, tables2.Table):
+            serial_number = tables2.Column()
+            model = tables2.Column()
+
+            class Meta:
+                model = Machine
+                template_name = 'core/tables/fast_table.html'
+                fields = ('serial_number', 'model')
+
+        queryset = Machine.objects.filter(pk=self.machines[0].pk)
+        self.assertEqual(
+            self.render(PlainTable, queryset, self.manager),
+            [('tbody', []), ('tr', [('class', 'even')]),
+             ('td', []), 'SN<b>&"0', ('/td',), ('td', []), 'ПД<i>1,5 & "B"', ('/td',), ('/tr',)],
+        )
+
+
+class SerialSearchTests(FleetTestData, TestCase):
+    """Поиск на главной: фильтр номеров, кеш найденных машин, ограничение частоты"""
+
+    def setUp(self):
+        serial_index.invalidate()
+        cache.clear()
+
+    def search(self, serial):
+        return self.client.post(reverse('core:home'), {'serial_number': serial})
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'SN{i}')
+        self.assertTrue(all(f'SN{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'OTHER{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_found_machine_is_cached(self):
+        response = self.search(' sn0001 ')
+        self.assertContains(response, 'SN0001')
+        with self.assertNumQueries(0):
+            self.assertContains(self.search('SN0001'), 'SN0001')
+
+    def test_unknown_serial_skips_database(self):
+        self.search('SN0001')  # строит фильтр
+        with self.assertNumQueries(0):
+            response = self.search('NO-SUCH-SERIAL')
+        self.assertContains(response, 'не найдена')
+
+    def test_saved_machine_is_found(self):
+        self.search('SN0001')
+        Machine.objects.create(serial_number='SN9999', model=self.machines[0].model)
+        self.assertContains(self.search('SN9999'), 'Найденная машина')
+
+        Machine.objects.filter(serial_number='SN9999').get().delete()
+        self.assertContains(self.search('SN9999'), 'не найдена')
+
+    @override_settings(SERIAL_SEARCH_BURST=2, SERIAL_SEARCH_RATE=0.01)
+    def test_rate_limit(self):
+        self.assertEqual(self.search('SN0001').status_code, 200)
+        self.assertEqual(self.search('SN0002').status_code, 200)
+        response = self.search('SN0003')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '100')
+
+
+class MachineOwnersCopyTests(FleetTestData, TestCase):
+    """Копия владельцев машины в ТО и рекламациях следует за машиной"""
+
+    def test_rows_follow_machine_owners(self):
+        machine = self.machines[0]
+        self.assertEqual(
+            set(Maintenance.objects.filter(machine=machine).values_list('machine_client', 'machine_service_company')),
+            {(self.client_user.pk, self.service.pk)},
+        )
+
+        other = User.objects.create_user('other@test.ru', 'pass')
+        other.groups.add(Group.objects.get(name='Клиент'))
+        machine.client = other
+        machine.save()
+
+        self.assertEqual(scope(Maintenance.objects.filter(machine=machine), self.client_user).count(), 0)
+        self.assertEqual(scope(Maintenance.objects.filter(machine=machine), other).count(), 3)
+        self.assertEqual(scope(Claim.objects.filter(machine=machine), other).count(), 1)
+
+    def test_backfill_command(self):
+        Maintenance.objects.update(machine_client=None, machine_service_company=None)
+        Claim.objects.update(machine_client=None)
+        call_command('backfill_machine_owners', batch_size=2, stdout=open(os.devnull, 'w'))
+        self.assertFalse(Maintenance.objects.filter(machine_client__isnull=True).exists())
+        self.assertFalse(Claim.objects.filter(machine_client__isnull=True).exists())
+
+
+
+@override_settings(SERIAL_SEARCH_BURST=10 ** 6)
+class BenchmarkTests(FleetTestData, TestCase):
+    """Сценарии manage.py benchmark и код выхода при регрессии относительно эталона"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_scenarios(self):
+        scenarios = {scenario.name: scenario for scenario in build_scenarios(pages=(1,))}
+        for name in ('dashboard.claims.client.p1', 'machine_update.post.manager',
+                     'claim_create.post.manager', 'claim_create.post.service', 'maintenance_create.post.client'):
+            self.assertIn(name, scenarios)
+        self.assertNotIn('claim_create.post.client', scenarios)
+
+        counts = (Machine.objects.count(), Maintenance.objects.count(), Claim.objects.count())
+        for name, scenario in scenarios.items():
+            with self.subTest(scenario=name):
+                result = run_scenario(scenario, repeat=2, warmup=0)
+                expected = 302 if scenario.rollback else 200
+                self.assertEqual(result['status'], expected)
+                self.assertLessEqual(result['min_ms'], result['p50_ms'])
+        # Изменяющие сценарии откатываются
+        self.assertEqual((Machine.objects.count(), Maintenance.objects.count(), Claim.objects.count()), counts)
+
+    def test_compare(self):
+        baseline = {'a': {'p50_ms': 10.0, 'queries': 5, 'peak_kb': 100.0}}
+        self.assertEqual(compare({'a': {'p50_ms': 11.9, 'queries': 5, 'peak_kb': 119.0}}, baseline, 0.2), [])
+        self.assertEqual(
+            compare({'a': {'p50_ms': 12.1, 'queries': 6, 'peak_kb': 100.0}, 'new': baseline['a']}, baseline, 0.2),
+            [('a', 'p50_ms', 10.0, 12.1), ('a', 'queries', 5, 6)],
+        )
+
+    def run_benchmark(self, *args):
+        """Как из командной строки: CommandError — сообщение в stderr и код выхода"""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        argv = ['manage.py', 'benchmark', '--only', 'machine_detail.manager', '--repeat', '2', '--warmup', '0', *args]
+        with mock.patch('sys.stdout', stdout), mock.patch('sys.stderr', stderr):
+            try:
+                BenchmarkCommand().run_from_argv(argv)
+            except SystemExit as exc:
+                return exc.code, stdout.getvalue(), stderr.getvalue()
+        return 0, stdout.getvalue(), stderr.getvalue()
+
+    def test_regression_exits_non_zero(self):
+        report = os.path.join(self.directory, 'report.json')
+        code, out, _ = self.run_benchmark('--output', report)
+        self.assertEqual(code, 0)
+        with open(report) as f:
+            results = json.load(f)['results']
+        self.assertEqual(list(results), ['machine_detail.manager'])
+
+        def baseline(**changes):
+            path = os.path.join(self.directory, 'baseline.json')
+            with open(path, 'w') as f:
+                json.dump({'results': {name: {**result, **changes} for name, result in results.items()}}, f)
+            return path
+
+        generous = baseline(p50_ms=10 ** 6, queries=10 ** 6, peak_kb=10 ** 9)
+        code, out, _ = self.run_benchmark('--output', report, '--baseline', generous)
+        self.assertEqual(code, 0)
+        self.assertIn('Регрессий относительно эталона нет', out)
+
+        strict = baseline(p50_ms=0.001, queries=results['machine_detail.manager']['queries'] - 1)
+        code, out, err = self.run_benchmark('--output', report, '--baseline', strict, '--threshold', '0.5')
+        self.assertEqual(code, 1)
+        self.assertIn('Регрессия machine_detail.manager: p50_ms 0.001', out)
+        self.assertIn('Регрессий: 2', err)
+
+
+
+class LoadTestTests(FleetTestData, TransactionTestCase):
+    """
+    Короткий прогон loadtest через тестовый клиент: один менеджер, несколько сценариев.
+    TransactionTestCase — поток пользователя ходит в БД своим соединением.
+    """
+
+    def setUp(self):
+        self.setUpTestData()
+
+    def test_bounded_run(self):
+        with override_settings(SERIAL_SEARCH_BURST=10**6):
+            summary = run_loadtest({'Менеджер': 1, 'Клиент': 0}, duration=60, seed=23, iterations=6)
+
+        self.assertEqual(summary['users'], {'Менеджер': 1, 'Клиент': 0})
+        self.assertEqual(summary['errors'], 0)
+        self.assertEqual(summary['lock_errors'], 0)
+        steps = summary['steps']
+        self.assertEqual(summary['requests'], sum(row['requests'] for row in steps.values()))
+        # сценарии с записью делают два запроса (форма и POST), остальные — один
+        self.assertGreaterEqual(summary['requests'], 6)
+        self.assertLessEqual(summary['requests'], 12)
+        for step, row in steps.items():
+            self.assertEqual(sum(row['statuses'].values()), row['requests'], step)
+            self.assertTrue(all(status < 500 for status in row['statuses']), step)
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertLessEqual(row['p95_ms'], row['p99_ms'])
+            self.assertLessEqual(row['p99_ms'], row['max_ms'])
+            self.assertEqual((row['errors'], row['lock_errors']), (0, 0))
+        # с этим seed среди шести сценариев есть оба сохранения; созданное уносит cleanup
+        self.assertEqual(steps['maintenance_create.post']['statuses'], {302: 1})
+        self.assertEqual(steps['claim_create.post']['statuses'], {302: 1})
+        self.assertEqual(cleanup(), (1, 1))
+        self.assertEqual((Maintenance.objects.count(), Claim.objects.count()), (9, 3))
+
+    def test_summary_percentiles_and_errors(self):
+        results = Results()
+        with mock.patch('core.loadtest.time.perf_counter', return_value=100.0):
+            for ms in range(1, 101):
+                results.record('page', 100.0 - ms / 1000, status=200)
+            results.record('page', 100.0 - 0.5, status=500)
+            results.record('post', 100.0 - 0.2, error=DatabaseError('database is locked'))
+            results.record('post', 100.0 - 0.3, error=ValueError('boom'))
+        summary = results.summary(duration=2)
+
+        page = summary['steps']['page']
+        self.assertEqual(page['requests'], 101)
+        self.assertEqual(page['statuses'], {200: 100, 500: 1})
+        self.assertEqual((page['p50_ms'], page['p95_ms'], page['max_ms']), (51.0, 96.0, 500.0))
+        self.assertEqual((page['errors'], page['lock_errors']), (1, 0))
+        post = summary['steps']['post']
+        self.assertEqual((post['errors'], post['lock_errors'], post['statuses']), (1, 1, {}))
+        self.assertEqual((summary['requests'], summary['rps']), (103, 51.5))
+        self.assertEqual((summary['errors'], summary['lock_errors']), (2, 1))
+
+class GenerateFleetTests(TestCase):
+    """manage.py generate_fleet в малом масштабе: объёмы и воспроизводимость по seed"""
+
+    OPTIONS = {
+        'machines': 30, 'clients': 5, 'service_companies': 2, 'managers': 1,
+        'maintenance_per_machine': 4, 'claims_per_machine': 2, 'batch_size': 7, 'seed': 7,
+    }
+
+    def generate(self, prefix, **options):
+        out = io.StringIO()
+        call_command('generate_fleet', prefix=prefix, stdout=out, **{**self.OPTIONS, **options})
+        return out.getvalue()
+
+    def fleet(self, prefix):
+        """Сгенерированные данные без id, времени создания и префикса номера"""
+        def number(serial):
+            return serial.removeprefix(prefix)
+
+        machines = [
+            (number(m.serial_number), m.model.name, m.engine_serial, m.shipment_date,
+             m.client.email, m.service_company.email, m.operation_address)
+            for m in Machine.objects.filter(serial_number__startswith=prefix)
+            .select_related('model', 'client', 'service_company').order_by('serial_number')
+        ]
+        maintenances = [
+            (number(serial), date, hours, type_name)
+            for serial, date, hours, type_name in Maintenance.objects.filter(machine__serial_number__startswith=prefix)
+            .order_by('machine__serial_number', 'date', 'hours', 'type__name')
+            .values_list('machine__serial_number', 'date', 'hours', 'type__name')
+        ]
+        claims = [
+            (number(serial), *rest)
+            for serial, *rest in Claim.objects.filter(machine__serial_number__startswith=prefix)
+            .order_by('machine__serial_number', 'failure_date', 'pk')
+            .values_list('machine__serial_number', 'failure_date', 'hours', 'failure_node__name',
+                         'failure_description', 'parts_used', 'recovery_date')
+        ]
+        return machines, maintenances, claims
+
+    def test_counts(self):
+        out = self.generate('GA')
+
+        self.assertEqual(Machine.objects.filter(serial_number__startswith='GA').count(), 30)
+        for role, count in (('Менеджер', 1), ('Клиент', 5), ('Сервисная_организация', 2)):
+            self.assertEqual(User.objects.filter(groups__name=role).count(), count, role)
+        maintenances = Maintenance.objects.count()
+        claims = Claim.objects.count()
+        self.assertGreater(maintenances, 0)
+        self.assertGreater(claims, 0)
+        self.assertIn(f'ТО: {maintenances}, рекламации: {claims}', out)
+        # Индексы запчастей и поиска перестроены
+        self.assertIn(f'Запчасти: {ClaimPart.objects.count()} позиций', out)
+        self.assertEqual(Machine.objects.filter(client__isnull=True).count(), 0)
+
+        with self.assertRaisesMessage(CommandError, 'Машины с префиксом GA уже есть'):
+            self.generate('GA')
+
+    def test_same_seed_same_fleet(self):
+        self.generate('GA')
+        self.generate('GB')
+        self.generate('GC', seed=8)
+        self.assertEqual(self.fleet('GA'), self.fleet('GB'))
+        self.assertNotEqual(self.fleet('GA'), self.fleet('GC'))
+
+
+class ArchiveTests(FleetTestData, TestCase):
+    """Перенос старых ТО и рекламаций в архив и чтение истории из обоих источников"""
+
+    def test_moves_records_in_batches(self):
+        before = {m.pk: (m.machine_id, m.date, m.hours, m.organization_id)
+                  for m in Maintenance.objects.filter(date__lt=datetime.date(2025, 1, 3))}
+
+        moved = list(archive_batches(Maintenance, datetime.date(2025, 1, 3), batch_size=4))
+
+        self.assertEqual(moved, [4, 2])
+        self.assertEqual(set(Maintenance.objects.values_list('date', flat=True)), {datetime.date(2025, 1, 3)})
+        self.assertEqual(
+            {m.pk: (m.machine_id, m.date, m.hours, m.organization_id) for m in ArchivedMaintenance.objects.all()},
+            before,
+        )
+        self.assertEqual(Claim.objects.count(), 3)
+
+    def test_cutoff_is_exclusive(self):
+        # Запись с датой, равной границе, остаётся в горячей таблице
+        self.assertEqual(list(archive_batches(Claim, datetime.date(2025, 2, 1))), [])
+        self.assertEqual(Claim.objects.count(), 3)
+
+        self.assertEqual(list(archive_batches(Claim, datetime.date(2025, 2, 2))), [3])
+        self.assertFalse(Claim.objects.exists())
+        self.assertEqual(ArchivedClaim.objects.count(), 3)
+
+        self.assertEqual(archive_cutoff(10), timezone.localdate() - datetime.timedelta(days=10))
+
+    def test_history_merges_hot_and_archived(self):
+        machine = self.machines[0]
+        list(archive_batches(Maintenance, datetime.date(2025, 1, 3)))
+        list(archive_batches(Claim, datetime.date(2025, 2, 2)))
+        Claim.objects.create(
+            machine=machine, failure_date=datetime.date(2025, 1, 2),
+            failure_node=FailureNode.objects.get(), recovery_method=RecoveryMethod.objects.get(),
+            service_company=self.service,
+        )
+
+        self.assertEqual(
+            [(type(m), m.date) for m in machine_maintenances(machine, limit=2)],
+            [(Maintenance, datetime.date(2025, 1, 3)), (ArchivedMaintenance, datetime.date(2025, 1, 2))],
+        )
+        self.assertEqual(
+            [(type(c), c.failure_date) for c in machine_claims(machine)],
+            [(ArchivedClaim, datetime.date(2025, 2, 1)), (Claim, datetime.date(2025, 1, 2))],
+        )
+
+        self.client.force_login(self.client_user)
+        response = self.client.get(reverse('core:export_machine_history', args=[machine.serial_number]))
+        self.assertEqual(response.status_code, 200)
+        rows = list(load_workbook(io.BytesIO(response.content)).active.iter_rows(min_row=2, values_only=True))
+        self.assertEqual(
+            [(kind, date.date(), hours) for kind, date, hours, *_ in rows],
+            [
+                ('Рекламация', datetime.date(2025, 2, 1), 0),
+                ('ТО', datetime.date(2025, 1, 3), 300),
+                ('ТО', datetime.date(2025, 1, 2), 200),
+                ('Рекламация', datetime.date(2025, 1, 2), 0),
+                ('ТО', datetime.date(2025, 1, 1), 100),
+            ],
+        )
+
+
+class MachineTimelineTests(FleetTestData, TestCase):
+    """Общая лента ТО и рекламаций: порядок, архив, постраничная подгрузка"""
+
+    def test_pages_through_full_history(self):
+        machine = self.machines[0]
+        # Рекламация в один день с ТО идёт после него; самое старое ТО — в архиве
+        Claim.objects.create(
+            machine=machine, failure_date=datetime.date(2025, 1, 2),
+            failure_node=FailureNode.objects.get(), recovery_method=RecoveryMethod.objects.get(),
+            service_company=self.service,
+        )
+        self.assertEqual(sum(archive_batches(Maintenance, datetime.date(2025, 1, 2))), 3)
+
+        self.client.force_login(self.client_user)
+        url = reverse('core:machine_timeline', args=[machine.serial_number]) + '?limit=2&format=json'
+        events = []
+        while url:
+            data = self.client.get(url).json()
+            events += data['results']
+            url = data['next']
+        self.assertEqual(
+            [(event['kind'], event['date'], event['archived']) for event in events],
+            [
+                ('claim', '2025-02-01', False),
+                ('maintenance', '2025-01-03', False),
+                ('maintenance', '2025-01-02', False),
+                ('claim', '2025-01-02', False),
+                ('maintenance', '2025-01-01', True),
+            ],
+        )
+
+    def test_fragment_and_errors(self):
+        machine = self.machines[0]
+        url = reverse('core:machine_timeline', args=[machine.serial_number])
+        self.client.force_login(self.service)
+
+        response = self.client.get(url, {'limit': 1})
+        self.assertContains(response, 'data-timeline-more')
+        self.assertContains(response, reverse('core:claim_edit', args=[machine.claims.get().pk]))
+
+        self.assertEqual(self.client.get(url, {'before': 'вчера'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, 400)
+
+        other = User.objects.create_user('other@test.ru', 'pass')
+        other.groups.add(Group.objects.get(name='Клиент'))
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class MachineReassignTests(FleetTestData, TestCase):
+    """Массовая передача машин менеджером"""
+
+    def setUp(self):
+        serial_index.invalidate()
+        self.new_service = User.objects.create_user('new-service@test.ru', 'pass')
+        self.new_service.groups.add(Group.objects.get(name='Сервисная_организация'))
+
+    def test_reassign_filtered_machines_with_cascade(self):
+        serial_index.find('SN0000')  # карточка в кеше поиска
+        url = reverse('core:machine_reassign') + '?serial_quick=SN000'
+
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.manager)
+        self.assertContains(self.client.get(url), '<strong>3</strong>')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'service_company': self.new_service.pk, 'cascade': 'on'})
+        self.assertRedirects(response, reverse('core:dashboard') + '?serial_quick=SN000', fetch_redirect_response=False)
+
+        self.assertEqual(Machine.objects.filter(service_company=self.new_service).count(), 3)
+        self.assertEqual(Machine.objects.filter(client=self.client_user).count(), 3)
+        self.assertEqual(scope(Maintenance.objects.all(), self.new_service, 'change').count(), 9)
+        self.assertEqual(Claim.objects.filter(service_company=self.new_service).count(), 3)
+        self.assertEqual(serial_index.find('SN0000').service_company_id, self.new_service.pk)
+
+    def test_form_requires_new_owner(self):
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse('core:machine_reassign') + '?serial_quick=SN', {'cascade': 'on'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Machine.objects.filter(service_company=self.service).count(), 3)
+
+    def test_whole_fleet_requires_confirmation(self):
+        url = reverse('core:machine_reassign')
+        self.client.force_login(self.manager)
+        self.assertContains(self.client.get(url), 'name="all_machines"')
+        self.assertContains(self.client.get(url, {'m-model': '', 'serial_quick': ' '}), 'name="all_machines"')
+        response = self.client.post(url, {'service_company': self.new_service.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'подтвердите передачу всего парка')
+        self.assertFalse(Machine.objects.filter(service_company=self.new_service).exists())
+
+        # С фильтром подтверждение не нужно
+        model = self.machines[0].model_id
+        self.assertNotContains(self.client.get(url, {'m-model': model}), 'name="all_machines"')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'service_company': self.new_service.pk, 'all_machines': 'on'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Machine.objects.filter(service_company=self.new_service).count(), 3)
+
+
+@override_settings(AUDIT_BACKGROUND=False, AUDIT_BATCH_SIZE=100, AUDIT_FLUSH_SECONDS=3600)
+class AuditLogTests(FleetTestData, TestCase):
+    """Журнал изменений: разница полей, пользователь из запроса, запись пачкой"""
+
+    def setUp(self):
+        audit_writer.discard()  # записи других тестов
+        self.addCleanup(audit_writer.discard)
+
+    def test_form_changes_are_logged_in_one_batch(self):
+        maintenance = self.machines[0].maintenances.order_by('pk').first()
+        self.client.force_login(self.service)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('core:maintenance_edit', args=[maintenance.pk]), {
+                'type': maintenance.type_id, 'date': '2025-01-01', 'hours': 150,
+                'order_number': 'ЗН-1', 'organization': self.service.pk, 'service_company': self.service.pk,
+            })
+        self.assertEqual(response.status_code, 302)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.machines[0].claims.get().delete()
+
+        # До сброса в БД ничего не пишется
+        self.assertEqual(AuditEntry.objects.count(), 0)
+        self.assertEqual(audit_writer.pending(), 2)
+        with self.assertNumQueries(1):
+            audit_writer.flush()
+
+        update, delete = AuditEntry.objects.order_by('pk')
+        self.assertEqual((update.action, update.user, update.machine), ('update', self.service, self.machines[0]))
+        self.assertEqual(update.changes, {'hours': [100, 150], 'order_number': ['', 'ЗН-1']})
+        self.assertEqual((delete.action, delete.user, delete.model), ('delete', None, 'claim'))
+
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('core:machine_detail', args=[self.machines[0].serial_number]))
+        self.assertContains(response, 'Журнал изменений')
+        self.assertContains(response, 'наработка, м/час: 100 → 150')
+
+    def test_rolled_back_changes_are_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Machine.objects.filter(pk=self.machines[0].pk).get().save()
+                    self.machines[1].delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(audit_writer.pending(), 0)
+
+    def test_failed_delete_is_not_logged(self):
+        def fail(sender, **kwargs):
+            raise DatabaseError('database is locked')
+        pre_delete.connect(fail, sender=Claim, weak=False)
+        self.addCleanup(pre_delete.disconnect, fail, sender=Claim)
+
+        with self.captureOnCommitCallbacks() as callbacks, self.assertRaises(DatabaseError):
+            self.machines[0].claims.get().delete()
+        self.assertEqual(callbacks, [])
+
+    def test_reassign_is_logged(self):
+        new_service = User.objects.create_user('new-service@test.ru', 'pass')
+        new_service.groups.add(Group.objects.get(name='Сервисная_организация'))
+        machine = self.machines[0]
+        self.client.force_login(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('core:machine_reassign') + f'?serial_quick={machine.serial_number}',
+                {'service_company': new_service.pk, 'cascade': 'on'},
+            )
+        self.assertEqual(response.status_code, 302)
+        audit_writer.flush()
+
+        entries = AuditEntry.objects.filter(machine=machine)
+        self.assertEqual(sorted(entries.values_list('model', flat=True)), ['claim'] + ['machine'] + ['maintenance'] * 3)
+        self.assertEqual({entry.user_id for entry in entries}, {self.manager.pk})
+        for entry in entries:
+            self.assertEqual(entry.action, 'update')
+            self.assertEqual(entry.changes, {'service_company_id': [self.service.pk, new_service.pk]})
+        self.assertFalse(AuditEntry.objects.exclude(machine=machine).exists())
+
+
+class JobQueueTests(FleetTestData, TestCase):
+    """Очередь задач: дайджест уведомлений, склейка, повторы"""
+
+    def setUp(self):
+        Job.objects.all().delete()  # задачи от ТО и рекламаций FleetTestData
+        self.later = timezone.now() + datetime.timedelta(hours=1)
+
+    def test_new_records_are_sent_as_one_digest(self):
+        machine = self.machines[0]
+        self.client.force_login(self.service)
+        for day in ('2025-03-01', '2025-03-02'):
+            response = self.client.post(reverse('core:claim_create', args=[machine.serial_number]), {
+                'failure_date': day, 'hours': 10, 'failure_node': FailureNode.objects.get().pk,
+                'recovery_method': RecoveryMethod.objects.get().pk, 'service_company': self.service.pk,
+            })
+            self.assertEqual(response.status_code, 302)
+
+        # Автор (сервис) не уведомляется; клиенту — одна задача на оба события, письмо не отправлено
+        self.assertEqual(list(Job.objects.values_list('key', flat=True)), [f'digest:{self.client_user.pk}'])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(run_due_jobs(), (0, 0))  # окно склейки ещё не прошло
+
+        self.assertEqual(run_due_jobs(now=self.later), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.client_user.email])
+        self.assertIn('(2)', mail.outbox[0].subject)
+        self.assertFalse(Job.objects.exists())
+
+    def test_append_to_job_claimed_in_between(self):
+        first = enqueue('test_digest', {'items': [1]}, key='digest:test')
+        claimed = None
+
+        def claim_after_read(execute, sql, params, many, context):
+            nonlocal claimed
+            result = execute(sql, params, many, context)
+            if claimed is None and sql.startswith('SELECT') and '"core_job"' in sql:
+                claimed = []
+                claimed += claim_jobs()  # воркер забирает задачу между чтением и записью
+            return result
+
+        with connection.execute_wrapper(claim_after_read):
+            second = enqueue('test_digest', {'items': [2]}, key='digest:test')
+        self.assertEqual([job.pk for job in claimed], [first.pk])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.payload), (Job.RUNNING, {'items': [1]}))
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertEqual(Job.objects.get(key='digest:test').payload, {'items': [2]})
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        @handler('test_broken')
+        def broken(payload):
+            raise ValueError('нет связи')
+        self.addCleanup(HANDLERS.pop, 'test_broken')
+
+        with override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_SECONDS=60), \
+                self.assertLogs('core.jobs', 'ERROR') as logs:
+            job = enqueue('test_broken')
+            self.assertEqual(run_due_jobs(), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+            self.assertIn('нет связи', job.last_error)
+
+            self.assertEqual(run_due_jobs(), (0, 0))  # пауза перед повтором
+            self.assertEqual(run_due_jobs(now=self.later), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(len(logs.records), 2)
+
+
+@override_settings(TELEMETRY_TOKENS=['secret'], TELEMETRY_CHUNK_SIZE=4)
+class TelemetryTests(FleetTestData, TestCase):
+    start = int(datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc).timestamp())
+
+    def readings(self, serial, hours, count, first=0):
+        # Показание раз в час, наработка растёт на 0,5 м/ч
+        return [(serial, self.start + 3600 * i, hours + 0.5 * i) for i in range(first, first + count)]
+
+    def test_codec_roundtrip(self):
+        readings = [(self.start, 1000), (self.start + 60, 1001), (self.start + 7200, 1001), (self.start + 7260, 1030)]
+        chunk = HourMeterChunk(start=datetime.datetime.fromtimestamp(self.start, datetime.timezone.utc),
+                               first_hours=1000, data=encode(readings))
+        self.assertEqual(decode(chunk), readings)
+
+    def test_ingest_splits_chunks_and_skips_old_readings(self):
+        machine = self.machines[0]
+        result = ingest(self.readings('sn0000', 100, 6) + [('NOPE', self.start, 1)])
+        self.assertEqual(result, {'accepted': 6, 'skipped': 1, 'unknown': ['NOPE']})
+
+        # Повтор уже принятых показаний пропускается, новые дописываются в открытую пачку
+        result = ingest(self.readings('SN0000', 100, 10, first=3))
+        self.assertEqual(result, {'accepted': 7, 'skipped': 3, 'unknown': []})
+
+        chunks = list(HourMeterChunk.objects.filter(machine=machine).order_by('start'))
+        self.assertEqual([chunk.count for chunk in chunks], [4, 4, 4, 1])
+        self.assertEqual([chunk.open for chunk in chunks], [False, False, False, True])
+        self.assertEqual(chunks[-1].last_hours, 1060)
+        self.assertEqual([reading for chunk in chunks for reading in decode(chunk)],
+                         [(self.start + 3600 * i, 1000 + 5 * i) for i in range(13)])
+
+    def test_series_and_forecast(self):
+        machine = self.machines[0]
+        ingest(self.readings(machine.serial_number, 100, 13))
+        series = hour_meter_series(machine, points=100)
+        self.assertEqual(len(series), 13)
+        self.assertEqual(series[-1][1], 106.0)
+        # Прореженный ряд — по границам пачек, без распаковки
+        with self.assertNumQueries(1):
+            coarse = hour_meter_series(machine, points=4)
+        self.assertLessEqual(len(coarse), 4)
+        self.assertEqual(coarse[-1][1], 106.0)
+
+        forecast = maintenance_forecast(series, last_maintenance_hours=100, interval=500)
+        self.assertAlmostEqual(forecast['per_day'], 12.0)
+        self.assertEqual(forecast['next_hours'], 600)
+        self.assertEqual(forecast['next_date'], (series[-1][0] + datetime.timedelta(days=494 / 12)).date())
+
+    def test_endpoint(self):
+        url = reverse('core:telemetry_ingest')
+        payload = {'readings': [[serial, ts, hours] for serial, ts, hours in self.readings('SN0001', 10, 3)]}
+        body = json.dumps(payload)
+
+        response = self.client.post(url, body, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post(url, '{"readings": [[1]]}', content_type='application/json',
+                                    HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url, body, content_type='application/json', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['accepted'], 3)
+        self.assertEqual(HourMeterChunk.objects.get(machine=self.machines[1]).count, 3)
+
+    def test_out_of_range_readings_are_rejected(self):
+        url = reverse('core:telemetry_ingest')
+        for reading in (
+            '["SN0001", 1e400, 1]',  # inf
+            '["SN0001", NaN, 1]',
+            f'["SN0001", {self.start}, 1e400]',
+            f'["SN0001", {self.start}, NaN]',
+            f'["SN0001", {self.start}, -1]',
+            f'["SN0001", {self.start}, 1000001]',
+            '["SN0001", 253402300800, 1]',  # после 9999 года
+            '["SN0001", "9999-12-31T23:59:59+00:00", 1]',
+            '["SN0001", 0, 1]',  # разность с 2025 годом не помещается в int32
+        ):
+            response = self.client.post(url, f'{{"readings": [{reading}, ["SN0001", {self.start}, 5]]}}',
+                                        content_type='application/json', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 400, reading)
+            self.assertIn('Показание 0', response.json()['detail'])
+        self.assertFalse(HourMeterChunk.objects.exists())
+
+
+class PartsIndexTests(FleetTestData, TestCase):
+    """Индекс запчастей из parts_used: разбор, обновление при сохранении, фильтр и отчёт"""
+
+    def test_parse_parts(self):
+        self.assertEqual(parse_parts('Фильтр масляный — 2 шт; помпа x2\nфильтр  МАСЛЯНЫЙ.'), {
+            'фильтр масляный': ('Фильтр масляный', 3),
+            'помпа': ('помпа', 2),
+        })
+        self.assertEqual(parse_parts('Болт М10, 4 шт, Ремень 6PK-1200 (1 шт.)'), {
+            'болт м10': ('Болт М10', 4),
+            'ремень 6pk-1200': ('Ремень 6PK-1200', 1),
+        })
+        self.assertEqual(parse_parts(''), {})
+
+    def test_index_follows_claim_saves(self):
+        claim = self.machines[0].claims.first()
+        claim.parts_used = 'Стартер — 1 шт; Сальник — 2 шт'
+        claim.save()
+        self.assertEqual(
+            sorted(ClaimPart.objects.filter(claim=claim).values_list('part__name', 'quantity')),
+            [('Сальник', 2), ('Стартер', 1)],
+        )
+
+        # Тот же набор запчастей — индекс только читается, сохранение без parts_used
+        # его не трогает; другой набор — заменяется
+        with CaptureQueriesContext(connection) as ctx:
+            claim.save(update_fields=['parts_used'])
+        self.assertEqual([q['sql'].split()[0] for q in ctx.captured_queries if 'core_claimpart' in q['sql']], ['SELECT'])
+        with CaptureQueriesContext(connection) as ctx:
+            claim.save(update_fields=['hours'])
+        self.assertFalse([q for q in ctx.captured_queries if 'core_claimpart' in q['sql']])
+        claim.parts_used = 'стартер 3 шт'
+        claim.save()
+        self.assertEqual(list(ClaimPart.objects.filter(claim=claim).values_list('part__key', 'quantity')),
+                         [('стартер', 3)])
+        self.assertEqual(Part.objects.filter(key='стартер').count(), 1)
+
+    def test_filter_report_and_reindex(self):
+        claims = [machine.claims.first() for machine in self.machines]
+        Claim.objects.filter(pk=claims[0].pk).update(parts_used='Фильтр масляный — 2 шт; Помпа')
+        Claim.objects.filter(pk=claims[1].pk).update(parts_used='Фильтр топливный; фильтр масляный')
+        self.assertFalse(ClaimPart.objects.exists())  # update() в обход save()
+        call_command('reindex_parts', stdout=io.StringIO())
+        self.assertEqual(ClaimPart.objects.count(), 4)
+
+        usage = parts_usage(Claim.objects.all())
+        self.assertEqual([(row['part__name'], row['claims'], row['quantity']) for row in usage][0],
+                         ('Фильтр масляный', 2, 3))
+
+        self.client.force_login(self.service)
+        response = self.client.get(reverse('core:dashboard'), {'tab': 'claims', 'cl-part': 'ФИЛЬТР'})
+        self.assertEqual(response.context['claims_table'].paginator.count, 2)
+        response = self.client.get(reverse('core:dashboard'), {'tab': 'claims', 'cl-part': 'помпа'})
+        self.assertEqual(response.context['claims_table'].paginator.count, 1)
+
+        response = self.client.get(reverse('core:parts_report'), {'cl-failure_node': claims[0].failure_node_id})
+        self.assertContains(response, 'Фильтр масляный')
+        self.assertContains(response, 'Двигатель')
+
+
+class FullTextSearchTests(FleetTestData, TestCase):
+    """Полнотекстовый поиск: стеммер, обновление индекса, ранжирование, дашборд/API/админка"""
+
+    def setUp(self):
+        self.claims = [machine.claims.first() for machine in self.machines]
+        self.claims[0].failure_description = 'Течь масла из-под масляного фильтра'
+        self.claims[0].save()
+        self.claims[1].failure_description = 'Не запускается двигатель'
+        self.claims[1].parts_used = 'Фильтр масляный — 1 шт'
+        self.claims[1].save()
+
+    def test_stemmer(self):
+        self.assertEqual({stem(word) for word in ('фильтры', 'фильтров', 'Фильтра')}, {'фильтр'})
+        self.assertEqual(stem('масляного'), stem('масляный'))
+        self.assertEqual(stem('течи'), stem('течь'))
+        self.assertEqual(stem('SN-0001'), 'sn-0001')
+
+    def test_inflected_query_ranks_description_first(self):
+        found = list(matching(Claim.objects.all(), 'масляные фильтры'))
+        self.assertEqual(found, [self.claims[0], self.claims[1]])
+        self.assertEqual(list(matching(Claim.objects.all(), 'теч')), [self.claims[0]])
+        self.assertEqual(list(matching(Claim.objects.all(), 'течь стартер')), [])
+
+    def test_index_follows_saves_and_rebuild(self):
+        claim = self.claims[0]
+        with self.assertNumQueries(2):  # журнал и UPDATE — индекс не трогается
+            claim.save(update_fields=['hours'])
+        claim.failure_description = 'Стук в коробке'
+        claim.save(update_fields=['failure_description'])
+        self.assertEqual(list(matching(Claim.objects.all(), 'течь')), [])
+        self.assertEqual(list(matching(Claim.objects.all(), 'коробка')), [claim])
+
+        Claim.objects.filter(pk=claim.pk).update(failure_description='Трещина рамы')  # в обход save()
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(list(matching(Claim.objects.all(), 'трещины')), [claim])
+
+        machine = self.machines[2]
+        Machine.objects.filter(pk=machine.pk).update(consignee='ООО «Лесоповал»')
+        machine.refresh_from_db()
+        machine.save()
+        self.assertEqual(list(matching(Machine.objects.all(), 'лесоповала')), [machine])
+        machine.delete()
+        self.assertEqual(list(matching(Machine.objects.all(), 'лесоповал')), [])
+
+    def test_deletes_leave_no_orphan_rows(self):
+        def indexed():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT rowid FROM core_claim_fts ORDER BY rowid')
+                return [row[0] for row in cursor.fetchall()]
+
+        self.assertEqual(indexed(), [claim.pk for claim in self.claims])
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse('core:claim_delete', args=[self.claims[0].pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(indexed(), [self.claims[1].pk, self.claims[2].pk])
+
+        self.machines[1].delete()  # рекламации удаляются каскадом
+        self.assertEqual(indexed(), [self.claims[2].pk])
+        Claim.objects.all().delete()
+        self.assertEqual(indexed(), [])
+
+    def test_dashboard_api_and_admin(self):
+        self.client.force_login(self.client_user)
+        response = self.client.get(reverse('core:dashboard'), {'tab': 'claims', 'cl-text': 'двигатель'})
+        self.assertEqual(response.context['claims_table'].paginator.count, 1)
+
+        response = self.client.get(reverse('core:api_claims'), {'text': 'фильтр'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.claims[0].pk, self.claims[1].pk])
+
+        admin_user = User.objects.create_superuser('admin@test.ru', 'pass')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:core_claim_changelist'), {'q': 'запускается'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.claims[1]])
+        response = self.client.get(reverse('admin:core_claim_changelist'), {'q': 'SN0002'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.claims[2]])
+
+
+class AdminScalabilityTests(FleetTestData, TestCase):
+    """Админка больших таблиц: запросы списка, оценка числа строк, date_hierarchy, автодополнение, поиск"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin@test.ru', 'pass'))
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:core_maintenance_changelist')
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        maintenance = Maintenance.objects.first()
+        for machine in self.machines:  # те же даты — тот же набор значений date_hierarchy
+            Maintenance.objects.create(
+                machine=machine, type=maintenance.type, date=maintenance.date, hours=10,
+                organization=self.service, service_company=self.service,
+            )
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertEqual(len(after), len(before))
+        self.assertEqual(response.context['cl'].result_count, 12)
+
+    def test_estimated_count(self):
+        queryset = Maintenance.objects.order_by('-date')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with override_settings(ADMIN_ESTIMATED_COUNT_FROM=1), CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 9)
+            self.assertEqual(EstimatedCountPaginator(queryset.filter(machine=self.machines[0]), 100).count, 3)
+        self.assertEqual(sum('COUNT(' in query['sql'] for query in ctx.captured_queries), 1)  # только с фильтром
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 9)  # таблица меньше порога
+        self.assertIn('COUNT(', ctx.captured_queries[-1]['sql'])
+
+    def test_distinct_dates(self):
+        queryset = Maintenance.objects.all()
+        for kind in ('year', 'month', 'day'):
+            self.assertEqual(distinct_dates(queryset, 'date', kind), list(queryset.dates('date', kind)))
+        self.assertEqual(distinct_dates(queryset.none(), 'date', 'year'), [])
+
+    def test_change_page_uses_autocomplete(self):
+        maintenance = self.machines[0].maintenances.first()
+        response = self.client.get(reverse('admin:core_maintenance_change', args=[maintenance.pk]))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, self.machines[1].serial_number)  # только выбранная машина
+        response = self.client.get(
+            reverse('admin:autocomplete'),
+            {'app_label': 'core', 'model_name': 'maintenance', 'field_name': 'machine', 'term': 'sn0001'},
+        )
+        self.assertEqual([row['id'] for row in response.json()['results']], [str(self.machines[1].pk)])
+
+    def test_search_by_serial_prefix_and_order_number(self):
+        url = reverse('admin:core_maintenance_changelist')
+        response = self.client.get(url, {'q': 'sn000'})
+        self.assertEqual(response.context['cl'].result_count, 9)
+        maintenance = self.machines[2].maintenances.first()
+        Maintenance.objects.filter(pk=maintenance.pk).update(order_number='ЗН-2025-117')
+        response = self.client.get(url, {'q': 'ЗН-2025'})
+        self.assertEqual(list(response.context['cl'].result_list), [maintenance])
+
+        machine = self.machines[1]
+        machine.engine_serial = 'D1803-55501'
+        machine.save()
+        response = self.client.get(reverse('admin:core_machine_changelist'), {'q': 'D1803-55501'})
+        self.assertEqual(list(response.context['cl'].result_list), [machine])
+
+
+class MetricsTests(FleetTestData, TestCase):
+    """/metrics/: только персонал, сумма снимков воркеров, оценки квантилей, удаление устаревших снимков"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(METRICS_DIR=directory.name, METRICS_FLUSH_SECONDS=10)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.directory = directory.name
+        self.manager.is_staff = True
+        self.manager.save()
+
+    def write_snapshot(self, worker, requests, counts, total, age=0, buckets=LATENCY_BUCKETS_MS, sql=None):
+        path = os.path.join(self.directory, f'{worker}.json')
+        with open(path, 'w') as f:
+            json.dump({
+                'histograms': [['silant_request_duration_ms', {'view': 'test:view'},
+                                {'buckets': list(buckets), 'counts': counts, 'sum': total, 'count': sum(counts)}]],
+                'counters': [['silant_requests_total', {'view': 'test:view', 'status': 200}, requests]],
+                'sql': sql or {},
+            }, f)
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+    def test_staff_only(self):
+        url = reverse('core:metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.manager)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def test_sums_workers_and_estimates_quantiles(self):
+        empty = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        fast, slow = list(empty), list(empty)
+        fast[1] = 10   # 5..10 мс
+        slow[2] = 10   # 10..25 мс
+        self.write_snapshot('worker-a', 3, fast, 80.0)
+        self.write_snapshot('worker-b', 4, slow, 170.0)
+        # Свой снимок берётся из памяти, а не с диска
+        self.write_snapshot(_worker_id(), 1000, fast, 1.0)
+        stale = self.write_snapshot('worker-gone', 100, slow, 1.0, age=7 * 10)
+
+        self.client.force_login(self.manager)
+        lines = self.client.get(reverse('core:metrics')).content.decode().splitlines()
+
+        for line in (
+            'silant_requests_total{status="200",view="test:view"} 7',
+            'silant_request_duration_ms_bucket{view="test:view",le="5"} 0',
+            'silant_request_duration_ms_bucket{view="test:view",le="10"} 10',
+            'silant_request_duration_ms_bucket{view="test:view",le="25"} 20',
+            'silant_request_duration_ms_bucket{view="test:view",le="+Inf"} 20',
+            'silant_request_duration_ms_sum{view="test:view"} 250.000',
+            'silant_request_duration_ms_count{view="test:view"} 20',
+            'silant_request_duration_ms_estimate{view="test:view",quantile="0.5"} 10.000',
+            'silant_request_duration_ms_estimate{view="test:view",quantile="0.95"} 23.500',
+            'silant_request_duration_ms_estimate{view="test:view",quantile="0.99"} 24.700',
+        ):
+            self.assertIn(line, lines)
+        self.assertFalse(os.path.exists(stale))
+
+    def test_mismatched_buckets_and_sql_texts(self):
+        empty = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        counts = list(empty)
+        counts[1] = 10
+        self.write_snapshot('worker-a', 1, counts, 80.0, sql={'aaa': 'SELECT a'})
+        self.write_snapshot('worker-b', 1, counts, 80.0, sql={'bbb': 'SELECT b'})
+        self.write_snapshot('worker-z-old', 1, [5, 5], 10.0, buckets=(100,), sql={'aaa': 'SELECT a'})
+
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            histograms, counters, sql = collect()
+        self.assertEqual(len(logs.records), 1)
+        hist = histograms[('silant_request_duration_ms', (('view', 'test:view'),))]
+        self.assertEqual((hist['count'], hist['buckets']), (20, list(LATENCY_BUCKETS_MS)))
+        self.assertEqual(counters[('silant_requests_total', (('status', 200), ('view', 'test:view')))], 3)
+        self.assertEqual({key: sql[key] for key in ('aaa', 'bbb')}, {'aaa': 'SELECT a', 'bbb': 'SELECT b'})
+
+    def test_quantile_beyond_last_bucket(self):
+        counts = [0] * len(LATENCY_BUCKETS_MS) + [4]
+        hist = {'buckets': list(LATENCY_BUCKETS_MS), 'counts': counts, 'sum': 0, 'count': 4}
+        self.assertEqual(estimate_quantile(hist, 0.5), float(LATENCY_BUCKETS_MS[-1]))
+        self.assertIsNone(estimate_quantile({**hist, 'counts': [0] * len(counts), 'count': 0}, 0.5))
+
+
+class RequestInstrumentationTests(FleetTestData, TestCase):
+    """Server-Timing на каждый запрос, подробный лог `silant.requests` — для выборки и медленных"""
+
+    SERVER_TIMING_RE = re.compile(r'^db;dur=[\d.]+;desc="(\d+) queries"(, tpl;dur=[\d.]+)?, total;dur=[\d.]+$')
+
+    def get_dashboard(self):
+        self.client.force_login(self.manager)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('core:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        match = self.SERVER_TIMING_RE.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertEqual(int(match.group(1)), len(ctx.captured_queries))
+        return response, bool(match.group(2))
+
+    def test_server_timing_without_sampling(self):
+        with self.assertNoLogs('silant.requests'):
+            _, detailed = self.get_dashboard()
+        self.assertFalse(detailed)
+
+    @override_settings(SILANT_INSTRUMENTATION={'SAMPLE_RATE': 1.0})
+    def test_sampled_request_is_logged(self):
+        with self.assertLogs('silant.requests', 'INFO') as logs:
+            _, detailed = self.get_dashboard()
+        self.assertTrue(detailed)
+        payload = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((payload['view'], payload['status'], payload['user_id']),
+                         ('core:dashboard', 200, self.manager.pk))
+        self.assertIsNotNone(payload['template_ms'])
+
+    @override_settings(SILANT_INSTRUMENTATION={'SAMPLE_RATE': 0.5})
+    def test_sampling_decision(self):
+        with mock.patch('core.middleware.random.random', return_value=0.49), \
+                self.assertLogs('silant.requests', 'INFO'):
+            self.assertTrue(self.get_dashboard()[1])
+        with mock.patch('core.middleware.random.random', return_value=0.5), \
+                self.assertNoLogs('silant.requests'):
+            self.assertFalse(self.get_dashboard()[1])
+
+    @override_settings(SILANT_INSTRUMENTATION={'SAMPLE_RATE': 0, 'SLOW_REQUEST_MS': 0})
+    def test_slow_request_is_always_logged(self):
+        with self.assertLogs('silant.requests', 'WARNING') as logs:
+            _, detailed = self.get_dashboard()
+        self.assertFalse(detailed)
+        self.assertIsNone(json.loads(logs.records[-1].getMessage())['template_ms'])
+
+    def test_recorder_survives_wrapper_opened_before_connection(self):
+        def wrapper(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        conn = connections.create_connection('default')
+        self.addCleanup(conn.close)
+        with conn.execute_wrapper(wrapper):
+            conn.ensure_connection()  # connection_created — внутри чужой обёртки
+            self.assertEqual(conn.execute_wrappers, [record_query, wrapper])
+        self.assertEqual(conn.execute_wrappers, [record_query])
+
+    @override_settings(SILANT_INSTRUMENTATION={'SAMPLE_RATE': 0, 'SERVER_TIMING': False})
+    def test_server_timing_can_be_disabled(self):
+        self.client.force_login(self.manager)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('core:dashboard')))
+
+
+class ProfilingTests(FleetTestData, TestCase):
+    """Профилирование по требованию: только персонал, один профиль на процесс, страница и скачивание"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PROFILE_DIR=directory.name, PROFILE_KEEP=3)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.manager.is_staff = True
+        self.manager.save()
+
+    def test_only_staff_requests_are_profiled(self):
+        self.client.force_login(self.client_user)
+        response = self.client.get(reverse('core:dashboard'), {'_profile': '1'})
+        self.assertNotIn('X-Silant-Profile', response)
+
+        self.client.force_login(self.manager)
+        self.assertNotIn('X-Silant-Profile', self.client.get(reverse('core:dashboard')))
+        response = self.client.get(reverse('core:dashboard'), HTTP_X_SILANT_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Silant-Profile']
+        self.assertTrue(os.path.exists(os.path.join(settings.PROFILE_DIR, f'{profile_id}.prof')))
+        self.assertNotEqual(self.client.get(reverse('core:dashboard'), {'_profile': '1'})['X-Silant-Profile'], profile_id)
+
+    def test_busy_profiler_skips_profiling(self):
+        self.client.force_login(self.manager)
+        with profiler_lock:  # профилируется другой запрос
+            response = self.client.get(reverse('core:dashboard'), {'_profile': '1'})
+        self.assertEqual((response.status_code, response['X-Silant-Profile']), (200, 'busy'))
+        self.assertEqual(os.listdir(settings.PROFILE_DIR), [])
+        self.assertNotEqual(self.client.get(reverse('core:dashboard'), {'_profile': '1'})['X-Silant-Profile'], 'busy')
+
+    def test_profiles_page_and_download(self):
+        self.client.force_login(self.manager)
+        profile_ids = [self.client.get(reverse('core:dashboard'), {'_profile': '1'})['X-Silant-Profile']
+                       for _ in range(4)]
+        response = self.client.get(reverse('core:profiles'))
+        self.assertEqual([profile['id'] for profile in response.context['profiles']], sorted(profile_ids[1:], reverse=True))
+
+        response = self.client.get(reverse('core:profile_download', args=[f'{profile_ids[-1]}.collapsed']))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'{profile_ids[-1]}.collapsed', response['Content-Disposition'])
+        response.close()
+        for name in (f'{profile_ids[0]}.prof', f'{profile_ids[-1]}.json', '..%2Fsettings.prof'):
+            self.assertEqual(self.client.get(reverse('core:profile_download', args=[name])).status_code, 404)
+
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(reverse('core:profiles')).status_code, 302)
+        response = self.client.get(reverse('core:profile_download', args=[f'{profile_ids[-1]}.prof']))
+        self.assertEqual(response.status_code, 302)
+
+
+class CompressionTests(FleetTestData, TestCase):
+    """CompressionMiddleware: выбор кодировки, Vary, что сжимается и что нет"""
+
+    def process(self, response, accept='gzip, deflate'):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept))
+
+    def test_negotiation(self):
+        self.client.force_login(self.manager)
+        url = reverse('core:dashboard')
+        for accept in (None, 'identity', 'deflate'):
+            with self.subTest(accept=accept):
+                headers = {'HTTP_ACCEPT_ENCODING': accept} if accept else {}
+                response = self.client.get(url, **headers)
+                self.assertNotIn('Content-Encoding', response)
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertIn('data-table', gzip.decompress(response.content).decode())
+
+    def test_negotiate_weights(self):
+        cases = {
+            'br;q=0, gzip': 'gzip',
+            'gzip;q=0': None,
+            'br;q=0.5, gzip': 'gzip',
+            'br, gzip;q=0.8': 'br',
+            'gzip, br': 'br',        # равные веса — в нашем порядке предпочтения
+            'GZIP; Q=0.9, deflate': 'gzip',
+            'gzip;q=abc': None,
+            '*': 'br',
+            'br;q=0, *': 'gzip',
+            '*;q=0, gzip': 'gzip',
+            'identity': None,
+            None: None,
+        }
+        with mock.patch('core.compression.available_encodings', return_value=('br', 'gzip')):
+            for accept, expected in cases.items():
+                with self.subTest(accept=accept):
+                    self.assertEqual(negotiate(accept), expected)
+        self.assertNotIn('Content-Encoding', self.process(HttpResponse('a' * 1000), accept='gzip;q=0, deflate'))
+
+    def test_compresses_javascript_and_svg(self):
+        for content_type in ('application/javascript', 'text/javascript; charset=utf-8', 'image/svg+xml'):
+            with self.subTest(content_type=content_type):
+                response = self.process(HttpResponse('<svg/>;' * 200, content_type=content_type))
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_skips_small_and_incompressible_responses(self):
+        small = self.process(HttpResponse('коротко', content_type='text/html'))
+        self.assertNotIn('Content-Encoding', small)
+        self.assertEqual(small['Vary'], 'Accept-Encoding')
+
+        body = b'x' * 1000
+        xlsx = self.process(HttpResponse(body, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'))
+        partial = self.process(HttpResponse(body, content_type='text/plain', status=206))
+        encoded = self.process(HttpResponse(body, content_type='text/plain', headers={'Content-Encoding': 'br'}))
+        for response in (xlsx, partial, encoded):
+            self.assertEqual(response.content, body)
+            self.assertNotIn('Vary', response)
+
+    def test_weakens_etag(self):
+        response = self.process(HttpResponse('a' * 1000, content_type='text/html', headers={'ETag': '"abc"'}))
+        self.assertEqual((response['Content-Encoding'], response['ETag']), ('gzip', 'W/"abc"'))
+
+    def test_streaming_responses(self):
+        lines = [f'SN{i:04d};строка\n'.encode() for i in range(100)]
+        response = self.process(StreamingHttpResponse(iter(lines), content_type='text/csv'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(lines))
+
+        async def chunks():
+            for line in lines:
+                yield line
+
+        async def read(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        response = self.process(StreamingHttpResponse(chunks(), content_type='text/csv'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(async_to_sync(read)(response)), b''.join(lines))
+
+
+FONT = 'core/fonts/PT-Astra-Sans_Regular.ttf'
+
+
+class StaticFilesTests(SimpleTestCase):
+    """collectstatic с хешами и .gz, строгий манифест, отдача статики приложением"""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings_override = override_settings(
+            STATIC_ROOT=root.name,
+            STATICFILES_DIRS=[os.path.join(settings.BASE_DIR, 'core', 'static')],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={**settings.STORAGES,
+                      'staticfiles': {'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage'}},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.root = root.name
+
+    def collect(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        return staticfiles_storage.url(FONT).removeprefix(settings.STATIC_URL)
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), 'rb') as f:
+            return f.read()
+
+    def test_missing_manifest_entry_raises(self):
+        with self.assertRaisesMessage(ValueError, 'Missing staticfiles manifest entry'):
+            staticfiles_storage.url(FONT)
+        self.collect()
+        with self.assertRaisesMessage(ValueError, 'Missing staticfiles manifest entry'):
+            staticfiles_storage.url('core/fonts/missing.ttf')
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        name = self.collect()
+        self.assertRegex(name, HASHED_STATIC_RE)
+        self.assertEqual(self.read(name), self.read(FONT))
+        self.assertEqual(gzip.decompress(self.read(name + '.gz')), self.read(name))
+        # woff уже сжат
+        woff = staticfiles_storage.url('core/fonts/PT-Astra-Sans_Regular.woff').removeprefix(settings.STATIC_URL)
+        self.assertFalse(os.path.exists(os.path.join(self.root, woff + '.gz')))
+
+    def test_static_asset(self):
+        name = self.collect()
+        factory = RequestFactory()
+
+        response = static_asset(factory.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate'), name)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.read(name))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = static_asset(factory.get('/'), FONT)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content), self.read(FONT))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=3600', response['Cache-Control'])
+
+        with self.assertRaises(Http404):
+            static_asset(factory.get('/', HTTP_ACCEPT_ENCODING='gzip'), 'core/fonts/missing.ttf')
@@ -0,0 +1,194 @@
+# core/timeline.py
+"""
+Общая лента истории машины: ТО и рекламации, горячие и архивные
+(core/archive.py), новые сверху.
+
+Страница ленты — один запрос UNION ALL из четырёх веток. Каждая ветка
+сама отсортирована и ограничена LIMIT по индексу (machine, -дата), так
+что стоимость страницы не зависит от длины истории. Пагинация — по ключу
+(keyset): курсор «дата_вид_pk» последнего показанного события, без OFFSET.
+
+QuerySet.union() не умеет LIMIT в ветках на SQLite, поэтому ветки строятся
+ORM (фильтры, соединения, роутер БД), а UNION ALL вокруг них — вручную,
+каждая ветка обёрнута в подзапрос.
+"""
+import datetime
+import re
+from dataclasses import dataclass
+
+from django.db import connections, models, router
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedClaim, ArchivedMaintenance, Claim, Maintenance
+
+MAINTENANCE = 'maintenance'
+CLAIM = 'claim'
+
+# Порядок событий одной даты: сначала ТО, потом рекламации
+KIND_RANK = {MAINTENANCE: 1, CLAIM: 0}
+RANK_KIND = {rank: kind for kind, rank in KIND_RANK.items()}
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+CURSOR_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})_([01])_(\d+)$')
+
+# Общие столбцы веток UNION (порядок важен)
+COLUMNS = (
+    'ev_rank', 'ev_id', 'ev_date', 'ev_hours', 'ev_name', 'ev_organization', 'ev_service_company',
+    'ev_company', 'ev_number', 'ev_end_date', 'ev_archived',
+)
+
+
+def _maintenance_columns(archived):
+    return {
+        'ev_rank': Value(KIND_RANK[MAINTENANCE]),
+        'ev_id': F('pk'),
+        'ev_date': F('date'),
+        'ev_hours': F('hours'),
+        'ev_name': F('type__name'),
+        'ev_organization': F('organization_id'),
+        'ev_service_company': F('service_company_id'),
+        'ev_company': Coalesce(F('organization__email'), F('service_company__email')),
+        'ev_number': F('order_number'),
+        'ev_end_date': F('order_date'),
+        'ev_archived': Value(archived),
+    }
+
+
+def _claim_columns(archived):
+    return {
+        'ev_rank': Value(KIND_RANK[CLAIM]),
+        'ev_id': F('pk'),
+        'ev_date': F('failure_date'),
+        'ev_hours': F('hours'),
+        'ev_name': F('failure_node__name'),
+        'ev_organization': Value(None, output_field=models.BigIntegerField()),
+        'ev_service_company': F('service_company_id'),
+        'ev_company': F('service_company__email'),
+        'ev_number': F('recovery_method__name'),
+        'ev_end_date': F('recovery_date'),
+        'ev_archived': Value(archived),
+    }
+
+
+# (модель, вид, поле даты, столбцы)
+SOURCES = (
+    (Maintenance, MAINTENANCE, 'date', _maintenance_columns(False)),
+    (ArchivedMaintenance, MAINTENANCE, 'date', _maintenance_columns(True)),
+    (Claim, CLAIM, 'failure_date', _claim_columns(False)),
+    (ArchivedClaim, CLAIM, 'failure_date', _claim_columns(True)),
+)
+
+
+@dataclass
+class Event:
+    kind: str
+    id: int
+    date: datetime.date
+    hours: int
+    name: str
+    organization_id: int
+    service_company_id: int
+    company: str
+    number: str          # № заказ-наряда (ТО) или способ восстановления (рекламация)
+    end_date: datetime.date  # дата заказ-наряда (ТО) или дата восстановления (рекламация)
+    archived: bool
+
+    @property
+    def is_claim(self):
+        return self.kind == CLAIM
+
+    @property
+    def downtime(self):
+        if self.is_claim and self.end_date:
+            return (self.end_date - self.date).days
+        return None
+
+    @property
+    def cursor(self):
+        return f'{self.date.isoformat()}_{KIND_RANK[self.kind]}_{self.id}'
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'id': self.id,
+            'date': self.date.isoformat(),
+            'hours': self.hours,
+            'name': self.name,
+            'service_company': self.company,
+            'number': self.number or None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'downtime': self.downtime,
+            'archived': self.archived,
+        }
+
+
+def parse_cursor(value):
+    """'2024-05-01_1_123' -> (date, rank, pk); None — если курсора нет; ValueError — если он испорчен"""
+    if not value:
+        return None
+    match = CURSOR_RE.match(value)
+    if match is None:
+        raise ValueError(value)
+    return datetime.date.fromisoformat(match.group(1)), int(match.group(2)), int(match.group(3))
+
+
+def _after_cursor(kind, date_field, cursor):
+    """Условие «строка идёт после курсора» для ветки вида kind"""
+    day, rank, pk = cursor
+    condition = Q(**{f'{date_field}__lt': day})
+    if KIND_RANK[kind] < rank:
+        condition |= Q(**{date_field: day})
+    elif KIND_RANK[kind] == rank:
+        condition |= Q(**{date_field: day, 'pk__lt': pk})
+    return condition
+
+
+def _branches(machine, cursor, limit):
+    for model, kind, date_field, columns in SOURCES:
+        branch = model.objects.filter(machine=machine)
+        if cursor is not None:
+            branch = branch.filter(_after_cursor(kind, date_field, cursor))
+        yield branch.annotate(**columns).values_list(*COLUMNS).order_by(f'-{date_field}', '-pk')[:limit]
+
+
+def timeline_sql(machine, cursor=None, limit=PAGE_SIZE, using=None):
+    """(sql, params) страницы ленты для соединения using"""
+    qn = connections[using].ops.quote_name
+    columns = ', '.join(qn(column) for column in COLUMNS)
+    parts, params = [], []
+    for branch in _branches(machine, cursor, limit):
+        sql, branch_params = branch.query.get_compiler(using=using).as_sql()
+        parts.append(f'SELECT {columns} FROM ({sql}) AS {qn("ev_branch_%d" % len(parts))}')
+        params.extend(branch_params)
+    order = ', '.join(f'{qn(column)} DESC' for column in ('ev_date', 'ev_rank', 'ev_id'))
+    return f'{" UNION ALL ".join(parts)} ORDER BY {order} LIMIT {int(limit)}', params
+
+
+def _to_date(value):
+    # Сырой курсор SQLite отдаёт даты строками
+    if value is None or isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(value)
+
+
+def machine_timeline(machine, cursor=None, limit=PAGE_SIZE):
+    """Страница ленты: (события, курсор следующей страницы или None)"""
+    using = router.db_for_read(Maintenance)
+    sql, params = timeline_sql(machine, cursor, limit + 1, using)
+    with connections[using].cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    events = [
+        Event(
+            RANK_KIND[rank], pk, _to_date(day), hours, name, organization_id, service_company_id,
+            company, number, _to_date(end_date), bool(archived),
+        )
+        for rank, pk, day, hours, name, organization_id, service_company_id, company, number, end_date, archived
+        in rows[:limit]
+    ]
+    next_cursor = events[-1].cursor if len(rows) > limit else None
+    return events, next_cursor
@@ -1,10 +1,18 @@
+from django.conf import settings
 from django.urls import path
-from .views import (HomeView, DashboardView, MachineDetailView, MachineCreateView, MachineUpdateView,
-                    MaintenanceCreateView, MaintenanceUpdateView, ClaimCreateView, ClaimUpdateView,
-                    MaintenanceDeleteView, ClaimDeleteView, export_machines,
+from .async_views import (AsyncHomeView, AsyncDashboardView, AsyncMachineDetailView,
+                          MachineListAPIView, MaintenanceListAPIView, ClaimListAPIView)
+from .views import (HomeView, DashboardView, MachineDetailView, MachineTimelineView, MachineCreateView,
+                    MachineUpdateView, MachineReassignView, MaintenanceCreateView, MaintenanceUpdateView, ClaimCreateView, ClaimUpdateView,
+                    MaintenanceDeleteView, ClaimDeleteView, export_machines, export_machine_history,
+                    metrics_view, profiles_view, profile_download, telemetry_ingest, parts_report,
                     )
 app_name = "core"
 
+# Под ASGI страницы только для чтения работают асинхронно (core/async_views.py)
+if getattr(settings, 'SILANT_ASYNC_VIEWS', False):
+    HomeView, DashboardView, MachineDetailView = AsyncHomeView, AsyncDashboardView, AsyncMachineDetailView
+
 urlpatterns = [
     path("", HomeView.as_view(), name="home"),
 
@@ -12,10 +20,14 @@ urlpatterns = [
 
     path("machines/create/", MachineCreateView.as_view(), name="machine_create"),
 
+    path("machines/reassign/", MachineReassignView.as_view(), name="machine_reassign"),
+
     path("machines/<str:serial_number>/edit/", MachineUpdateView.as_view(), name="machine_edit"),
 
     path("machines/<str:serial_number>/", MachineDetailView.as_view(), name="machine_detail"),
 
+    path("machines/<str:serial_number>/timeline/", MachineTimelineView.as_view(), name="machine_timeline"),
+
     path('machines/<str:serial_number>/maintenance/create/', MaintenanceCreateView.as_view(), name='maintenance_create'),
 
     path('maintenance/<int:pk>/edit/', MaintenanceUpdateView.as_view(), name='maintenance_edit'),
@@ -30,6 +42,24 @@ urlpatterns = [
 
     path('export/machines/', export_machines, name='export_machines'),
 
+    path('export/machines/<str:serial_number>/history/', export_machine_history, name='export_machine_history'),
+
+    path('claims/parts/', parts_report, name='parts_report'),
+
+    path('metrics/', metrics_view, name='metrics'),
+
+    path('profiles/', profiles_view, name='profiles'),
+
+    path('profiles/<str:name>', profile_download, name='profile_download'),
+
+    path('api/machines/', MachineListAPIView.as_view(), name='api_machines'),
+
+    path('api/maintenance/', MaintenanceListAPIView.as_view(), name='api_maintenance'),
+
+    path('api/claims/', ClaimListAPIView.as_view(), name='api_claims'),
+
+    path('api/telemetry/', telemetry_ingest, name='telemetry_ingest'),
+
 
 
 ]
\ No newline at end of file
@@ -1,6 +1,7 @@
 # core/utils/export.py
 from io import BytesIO
 from openpyxl import Workbook
+from django.db import models
 from django.http import HttpResponse
 
 
@@ -26,6 +27,8 @@ def export_to_excel(queryset, fields, titles, filename="export.xlsx"):
                 value = obj.service_company.email if obj.service_company else ''
             elif hasattr(obj, field) and callable(getattr(obj, field)):
                 value = getattr(obj, field)()
+            elif isinstance(value, models.Model):
+                value = str(value)
             row.append(value)
         ws.append(row)
 
@@ -0,0 +1,85 @@
+# core/utils/stemmer.py
+"""
+Стеммер русского языка — алгоритм Snowball (Портера) для русского:
+https://snowballstem.org/algorithms/russian/stemmer.html
+
+«фильтры», «фильтров», «фильтра» -> «фильтр»; «масляного» -> «маслян».
+Слова без кириллицы (номера, латиница) возвращаются в нижнем регистре как есть.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+
+def _endings(words):
+    # Длинные окончания раньше коротких — при равном начале совпадения
+    return '|'.join(sorted(words.split(), key=len, reverse=True))
+
+
+# Окончания группы 1 стоят только после «а» или «я» (сама буква остаётся)
+PERFECTIVE_GERUND = re.compile(
+    rf'(?:(?<=[ая])(?:{_endings("в вши вшись")})|(?:{_endings("ив ивши ившись ыв ывши ывшись")}))$'
+)
+ADJECTIVE = _endings('ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую юю ая яя ою ею')
+PARTICIPLE = rf'(?<=[ая])(?:{_endings("ем нн вш ющ щ")})|(?:{_endings("ивш ывш ующ")})'
+ADJECTIVAL = re.compile(rf'(?:{PARTICIPLE})?(?:{ADJECTIVE})$')
+REFLEXIVE = re.compile(r'(?:ся|сь)$')
+VERB = re.compile(
+    rf'(?:(?<=[ая])(?:{_endings("ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно")})'
+    rf'|(?:{_endings("ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят ует уют ит ыт ены ить ыть ишь ую ю")}))$'
+)
+NOUN = re.compile(
+    rf'(?:{_endings("а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам ом о у ах иях ях ы ь ию ью ю ия ья я")})$'
+)
+SUPERLATIVE = re.compile(r'(?:ейше|ейш)$')
+DERIVATIONAL = re.compile(r'(?:ость|ост)$')
+CYRILLIC = re.compile(r'[а-я]')
+
+
+def _region(word, start):
+    """Начало области после первой согласной, идущей за гласной (R1/R2)"""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _cut(pattern, text):
+    """(text без окончания, True) или (text, False)"""
+    match = pattern.search(text)
+    return (text[:match.start()], True) if match else (text, False)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv_start = next((i + 1 for i, letter in enumerate(word) if letter in VOWELS), len(word))
+    r2_start = _region(word, _region(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1: деепричастие, иначе возвратная частица и прилагательное/глагол/существительное
+    rv, found = _cut(PERFECTIVE_GERUND, rv)
+    if not found:
+        rv, _ = _cut(REFLEXIVE, rv)
+        for pattern in (ADJECTIVAL, VERB, NOUN):
+            rv, found = _cut(pattern, rv)
+            if found:
+                break
+
+    # Шаг 2
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательный суффикс — только в R2
+    match = DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+
+    # Шаг 4
+    rv, found = _cut(SUPERLATIVE, rv)
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif not found and rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
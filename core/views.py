@@ -1,3 +1,7 @@
+import datetime
+import math
+from functools import partial
+
 from django.shortcuts import render
 from django.views import View
 from .models import Machine,  Maintenance, Claim
@@ -8,100 +12,139 @@ from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.utils import timezone
 from django_tables2 import RequestConfig
 from .filters import MachineFilter, MaintenanceFilter, ClaimFilter
 from .tables import MachineTable, MaintenanceTable, ClaimTable
+from .routers import replica_reads
+from .permissions import is_manager, role_can, scope
+from .metrics import registry, render_prometheus
+from .ratelimit import TokenBucket, client_ip
+from .serial_index import serial_index
 
 from django_tables2 import RequestConfig
 
 class ManagerOnlyMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.groups.filter(name='Менеджер').exists()
-
-class HomeView(View):
+        return is_manager(self.request.user)
+
+# Связи, которые показывает карточка машины (главная и страница машины)
+MACHINE_CARD_RELATED = ('model', 'engine_model', 'transmission_model', 'drive_axle_model', 'steer_axle_model')
+
+
+def machine_fields(machine):
+    """Поля карточки машины; на главной — первые 10 (по заданию)"""
+    return [
+        ("Зав. № машины", machine.serial_number),
+        ("Модель техники", machine.model.name if machine.model else "—"),
+        ("Модель двигателя", machine.engine_model.name if machine.engine_model else "—"),
+        ("Зав. № двигателя", machine.engine_serial or "—"),
+        ("Модель трансмиссии", machine.transmission_model.name if machine.transmission_model else "—"),
+        ("Зав. № трансмиссии", machine.transmission_serial or "—"),
+        ("Модель ведущего моста", machine.drive_axle_model.name if machine.drive_axle_model else "—"),
+        ("Зав. № ведущего моста", machine.drive_axle_serial or "—"),
+        ("Модель управляемого моста", machine.steer_axle_model.name if machine.steer_axle_model else "—"),
+        ("Зав. № управляемого моста", machine.steer_axle_serial or "—"),
+        ("Договор поставки №", machine.contract_number or "—"),
+        ("Дата договора", machine.contract_date.strftime("%d.%m.%Y") if machine.contract_date else "—"),
+        ("Дата отгрузки с завода", machine.shipment_date.strftime("%d.%m.%Y") if machine.shipment_date else "—"),
+        ("Грузополучатель (конечный потребитель)", machine.consignee or "—"),
+        ("Адрес поставки (эксплуатации)", machine.operation_address or "—"),
+        ("Комплектация (доп. опции)", machine.options or "—"),
+        ("Клиент", machine.client.email if machine.client else "—"),
+        ("Сервисная компания", machine.service_company.email if machine.service_company else "—"),
+    ]
+
+
+class HomeMixin:
+    """
+    Анонимный поиск по зав. номеру: номера, которых нет в парке, отсекает
+    фильтр Блума без обращения к БД (core/serial_index.py), частоту запросов
+    с одного IP ограничивает ведро токенов (core/ratelimit.py).
+    """
     template_name = "core/home.html"
 
+    def rate_limiter(self):
+        return TokenBucket(
+            'serial_search',
+            rate=getattr(settings, 'SERIAL_SEARCH_RATE', 0.5),
+            burst=getattr(settings, 'SERIAL_SEARCH_BURST', 20),
+        )
+
+    def serial(self, request):
+        return request.POST.get("serial_number", "").strip()
+
+    def find_machine(self, serial):
+        return serial_index.find(serial, related=MACHINE_CARD_RELATED) if serial else None
+
+    def search_context(self, serial, machine):
+        if not serial:
+            return {"error": "Введите заводской номер машины"}
+        if machine is None:
+            return {"error": f"Машина с заводским номером «{serial}» не найдена в системе"}
+        return {"machine": machine, "fields": machine_fields(machine)[:10]}
+
+    def throttled_context(self):
+        registry.inc('silant_rate_limited_total', view='home')
+        return {"error": "Слишком много запросов. Повторите поиск чуть позже."}
+
+    @staticmethod
+    def with_retry_after(response, retry_after):
+        response['Retry-After'] = str(math.ceil(retry_after))
+        return response
+
+
+@replica_reads
+class HomeView(HomeMixin, View):
+
     def get(self, request):
         return render(request, self.template_name, {})
 
     def post(self, request):
-        serial = request.POST.get("serial_number", "").strip()
+        retry_after = self.rate_limiter().consume(client_ip(request))
+        if retry_after:
+            response = render(request, self.template_name, self.throttled_context(), status=429)
+            return self.with_retry_after(response, retry_after)
 
-        if not serial:
-            return render(
-                request,
-                self.template_name,
-                {"error": "Введите заводской номер машины"}
-            )
+        serial = self.serial(request)
+        return render(request, self.template_name, self.search_context(serial, self.find_machine(serial)))
 
-        try:
-            machine = Machine.objects.get(serial_number__iexact=serial)
-        except Machine.DoesNotExist:
-            return render(
-                request,
-                self.template_name,
-                {"error": f"Машина с заводским номером «{serial}» не найдена в системе"}
-            )
-
-        # Показываем только первые 10 полей по заданию
-        context = {
-            "machine": machine,
-            "fields": [
-                ("Зав. № машины", machine.serial_number),
-                ("Модель техники", machine.model.name if machine.model else "—"),
-                ("Модель двигателя", machine.engine_model.name if machine.engine_model else "—"),
-                ("Зав. № двигателя", machine.engine_serial or "—"),
-                ("Модель трансмиссии", machine.transmission_model.name if machine.transmission_model else "—"),
-                ("Зав. № трансмиссии", machine.transmission_serial or "—"),
-                ("Модель ведущего моста", machine.drive_axle_model.name if machine.drive_axle_model else "—"),
-                ("Зав. № ведущего моста", machine.drive_axle_serial or "—"),
-                ("Модель управляемого моста", machine.steer_axle_model.name if machine.steer_axle_model else "—"),
-                ("Зав. № управляемого моста", machine.steer_axle_serial or "—"),
-            ]
-        }
-
-        return render(request, self.template_name, context)
 
+def fetch_rows(table):
+    """Загружает текущую страницу таблицы (дальше рендер берёт строки из кеша queryset'а)"""
+    for _ in table.paginated_rows:
+        pass
+    return table
 
 
-@method_decorator(login_required, name='dispatch')
-class DashboardView(View):
+class DashboardTabsMixin:
+    """
+    Дашборд — три независимые вкладки: у каждой свой фильтр, таблица,
+    COUNT пагинатора и выборка страницы. tabs() отдаёт их как функции без
+    аргументов: синхронный view вызывает их по очереди, асинхронный
+    (core/async_views.py) — одновременно.
+    """
     template_name = "core/dashboard.html"
 
-    def get(self, request):
-        user = request.user
-        tab = request.GET.get('tab', 'machines')
-        is_manager = user.groups.filter(name='Менеджер').exists()
-
-        # Определяем базовые queryset'ы в зависимости от роли
-        if is_manager:
-            machine_qs = Machine.objects.all()
-            maintenance_qs = Maintenance.objects.all()
-            claim_qs = Claim.objects.all()
-        elif user.groups.filter(name='Клиент').exists():
-            machine_qs = Machine.objects.filter(client=user)
-            maintenance_qs = Maintenance.objects.filter(machine__client=user)
-            claim_qs = Claim.objects.filter(machine__client=user)
-        elif user.groups.filter(name='Сервисная_организация').exists():
-            machine_qs = Machine.objects.filter(service_company=user)
-            maintenance_qs = Maintenance.objects.filter(
-                Q(organization=user) | Q(service_company=user)
-            )
-            claim_qs = Claim.objects.filter(service_company=user)
-        else:
-            machine_qs = Machine.objects.none()
-            maintenance_qs = Maintenance.objects.none()
-            claim_qs = Claim.objects.none()
-
-        context = {
-            'tab': tab,
-            'is_manager': is_manager,
-            'can_edit': is_manager,
+    def base_context(self, request):
+        manager = is_manager(request.user)
+        return {
+            'tab': request.GET.get('tab', 'machines'),
+            'is_manager': manager,
+            'can_edit': manager,
         }
 
-        # ────────────────────────────────────────────────
-        # Вкладка МАШИНЫ
-        # ────────────────────────────────────────────────
+    def tabs(self, request):
+        return [
+            partial(self.machines_tab, request),
+            partial(self.maintenance_tab, request),
+            partial(self.claims_tab, request),
+        ]
+
+    # select_related — под столбцы таблиц (core/tables.py), иначе запрос на каждую строку
+
+    def machines_tab(self, request):
+        machine_qs = scope(Machine.objects.select_related('model', 'client', 'service_company'), request.user)
         # Быстрый поиск по зав. номеру (применяется первым)
         serial_quick = request.GET.get('serial_quick', '').strip()
         if serial_quick:
@@ -110,110 +153,169 @@ class DashboardView(View):
         machine_filter = MachineFilter(request.GET, queryset=machine_qs, prefix='m')
         machines_table = MachineTable(machine_filter.qs, request=request)
         RequestConfig(request, paginate={"per_page": 20}).configure(machines_table)
-
-        context.update({
+        return {
             'machine_filter': machine_filter,
-            'machines_table': machines_table,
-            'has_machines': machine_filter.qs.exists(),
-        })
+            'machines_table': fetch_rows(machines_table),
+            'has_machines': machines_table.paginator.count > 0,  # count уже посчитан пагинатором
+        }
 
-        # ────────────────────────────────────────────────
-        # Вкладка ТО
-        # ────────────────────────────────────────────────
+    def maintenance_tab(self, request):
+        maintenance_qs = scope(Maintenance.objects.select_related(
+            'machine', 'type', 'organization', 'service_company',
+        ), request.user)
         maintenance_filter = MaintenanceFilter(request.GET, queryset=maintenance_qs, prefix='mt')
         maintenances_table = MaintenanceTable(maintenance_filter.qs, request=request)
         RequestConfig(request, paginate={"per_page": 15}).configure(maintenances_table)
-
-        context.update({
+        return {
             'maintenance_filter': maintenance_filter,
-            'maintenances_table': maintenances_table,
-            'has_maintenances': maintenance_filter.qs.exists(),
-        })
+            'maintenances_table': fetch_rows(maintenances_table),
+            'has_maintenances': maintenances_table.paginator.count > 0,
+        }
 
-        # ────────────────────────────────────────────────
-        # Вкладка РЕКЛАМАЦИИ
-        # ────────────────────────────────────────────────
+    def claims_tab(self, request):
+        claim_qs = scope(Claim.objects.select_related('machine', 'failure_node', 'service_company'), request.user)
         claim_filter = ClaimFilter(request.GET, queryset=claim_qs, prefix='cl')
         claims_table = ClaimTable(claim_filter.qs, request=request)
         RequestConfig(request, paginate={"per_page": 15}).configure(claims_table)
-
-        context.update({
+        return {
             'claim_filter': claim_filter,
-            'claims_table': claims_table,
-            'has_claims': claim_filter.qs.exists(),
-        })
+            'claims_table': fetch_rows(claims_table),
+            'has_claims': claims_table.paginator.count > 0,
+        }
 
+
+@replica_reads
+@method_decorator(login_required, name='dispatch')
+class DashboardView(DashboardTabsMixin, View):
+
+    def get(self, request):
+        context = self.base_context(request)
+        for tab in self.tabs(request):
+            context.update(tab())
         return render(request, self.template_name, context)
 
-from django.http import Http404
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
+from .archive import machine_maintenances, machine_claims
+from .timeline import MAX_PAGE_SIZE, PAGE_SIZE, machine_timeline, parse_cursor
+from .audit import machine_history
+from .telemetry import hour_meter_series, maintenance_forecast
+
+
+def sparkline(series, width=300, height=60):
+    """Точки SVG-полилинии для ряда [(datetime, значение)]"""
+    if len(series) < 2:
+        return ''
+    (start, _), (end, _) = series[0], series[-1]
+    low = min(value for _, value in series)
+    high = max(value for _, value in series)
+    span = (end - start).total_seconds() or 1
+    rise = (high - low) or 1
+    return ' '.join(
+        f'{(moment - start).total_seconds() / span * width:.1f},{height - (value - low) / rise * height:.1f}'
+        for moment, value in series
+    )
+
+
+class MachineDetailMixin:
+    template_name = "core/machine_detail.html"
+    timeline_template_name = "core/machine_timeline_rows.html"
+
+    def machine_queryset(self, user, serial_number):
+        # Загрузка и проверка доступа — один запрос: чужая машина просто не найдётся
+        return scope(Machine.objects.by_serial(serial_number), user).select_related(
+            *MACHINE_CARD_RELATED, 'client', 'service_company',
+        )
+
+    def timeline_context(self, user, machine, events, next_cursor, limit=PAGE_SIZE, response_format=None):
+        next_url = None
+        if next_cursor:
+            # Следующая страница — в том же виде (limit, format=json), что и текущая
+            params = {'before': next_cursor}
+            if limit != PAGE_SIZE:
+                params['limit'] = limit
+            if response_format:
+                params['format'] = response_format
+            next_url = f"{reverse('core:machine_timeline', args=[machine.serial_number])}?{urlencode(params)}"
+        return {
+            "can_edit": role_can(user, Machine, 'change'),
+            "events": events,
+            "next_url": next_url,
+        }
+
+    hour_meter_days = 90  # график наработки и прогноз — по последним 90 дням
+
+    def hour_meter(self, machine):
+        since = timezone.now() - datetime.timedelta(days=self.hour_meter_days)
+        return hour_meter_series(machine, since=since, points=60)
+
+    def audit_entries(self, user, machine):
+        # Журнал изменений видит только менеджер
+        return machine_history(machine) if is_manager(user) else []
+
+    def detail_context(self, user, machine, events, next_cursor, audit_entries, hour_meter):
+        # Машина уже прошла фильтр 'view'; права на добавление для доступных машин
+        # у клиента и сервиса совпадают с правами роли
+        last_maintenance_hours = next((event.hours for event in events if not event.is_claim), None)
+        return {
+            **self.timeline_context(user, machine, events, next_cursor),
+            "audit_entries": audit_entries,
+            "forecast": maintenance_forecast(hour_meter, last_maintenance_hours),
+            "hour_meter_points": sparkline(hour_meter),
+            "machine": machine,
+            "can_add_maintenance": role_can(user, Machine, 'add_maintenance'),
+            "can_add_claim": role_can(user, Machine, 'add_claim'),
+            "fields": machine_fields(machine),
+        }
 
 
 @method_decorator(login_required, name='dispatch')
-class MachineDetailView(View):
-    template_name = "core/machine_detail.html"
+class MachineDetailView(MachineDetailMixin, View):
 
     def get(self, request, serial_number):
-        machine = get_object_or_404(Machine, serial_number__iexact=serial_number)
-
-        user = request.user
-        can_view = False
-        can_edit_machine = False
-        can_add_maintenance = False
-        can_add_claim = False
-
-        if user.groups.filter(name='Менеджер').exists():
-            can_view = True
-            can_edit_machine = True
-            can_add_maintenance = True
-            can_add_claim = True
-        elif user.groups.filter(name='Клиент').exists():
-            can_view = machine.client == user
-            can_add_maintenance = True          # клиент может добавлять ТО
-            can_add_claim = False               # клиент НЕ может добавлять рекламации
-        elif user.groups.filter(name='Сервисная_организация').exists():
-            can_view = machine.service_company == user
-            can_add_maintenance = True
-            can_add_claim = True
-
-        if not can_view:
+        machine = self.machine_queryset(request.user, serial_number).first()
+        if machine is None:
             raise Http404("У вас нет доступа к этой машине")
 
-        # Получаем связанные записи
-        maintenances = machine.maintenances.order_by('-date')[:5]  # последние 5 ТО
-        claims = machine.claims.order_by('-failure_date')[:5]  # последние 5 рекламаций
+        # Первая страница общей ленты ТО и рекламаций (с учётом архива)
+        events, next_cursor = machine_timeline(machine)
+        audit_entries = self.audit_entries(request.user, machine)
+        hour_meter = self.hour_meter(machine)
+        context = self.detail_context(request.user, machine, events, next_cursor, audit_entries, hour_meter)
+        return render(request, self.template_name, context)
+
 
-        # Подготавливаем все поля для отображения
-        context = {
-            "machine": machine,
-            "can_edit": can_edit_machine,
-            "can_add_maintenance": can_add_maintenance,
-            "can_add_claim": can_add_claim,
-            "maintenances": maintenances,  # ← добавлено
-            "claims": claims,
-            "fields": [
-                ("Зав. № машины", machine.serial_number),
-                ("Модель техники", machine.model.name if machine.model else "—"),
-                ("Модель двигателя", machine.engine_model.name if machine.engine_model else "—"),
-                ("Зав. № двигателя", machine.engine_serial or "—"),
-                ("Модель трансмиссии", machine.transmission_model.name if machine.transmission_model else "—"),
-                ("Зав. № трансмиссии", machine.transmission_serial or "—"),
-                ("Модель ведущего моста", machine.drive_axle_model.name if machine.drive_axle_model else "—"),
-                ("Зав. № ведущего моста", machine.drive_axle_serial or "—"),
-                ("Модель управляемого моста", machine.steer_axle_model.name if machine.steer_axle_model else "—"),
-                ("Зав. № управляемого моста", machine.steer_axle_serial or "—"),
-                ("Договор поставки №", machine.contract_number or "—"),
-                ("Дата договора", machine.contract_date.strftime("%d.%m.%Y") if machine.contract_date else "—"),
-                ("Дата отгрузки с завода", machine.shipment_date.strftime("%d.%m.%Y") if machine.shipment_date else "—"),
-                ("Грузополучатель (конечный потребитель)", machine.consignee or "—"),
-                ("Адрес поставки (эксплуатации)", machine.operation_address or "—"),
-                ("Комплектация (доп. опции)", machine.options or "—"),
-                ("Клиент", machine.client.email if machine.client else "—"),
-                ("Сервисная компания", machine.service_company.email if machine.service_company else "—"),
-            ]
-        }
+@method_decorator(login_required, name='dispatch')
+class MachineTimelineView(MachineDetailMixin, View):
+    """
+    Следующая страница ленты: ?before=<курсор>&limit=<до 100>.
+    Строки таблицы для «Показать ещё» или JSON при ?format=json.
+    """
 
-        return render(request, self.template_name, context)
+    def get(self, request, serial_number):
+        try:
+            cursor = parse_cursor(request.GET.get('before'))
+            limit = min(int(request.GET.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError:
+            return HttpResponseBadRequest("Неверный курсор или limit")
+        if limit < 1:
+            return HttpResponseBadRequest("Неверный курсор или limit")
+
+        machine = scope(Machine.objects.by_serial(serial_number), request.user).only('pk', 'serial_number').first()
+        if machine is None:
+            raise Http404("У вас нет доступа к этой машине")
+
+        events, next_cursor = machine_timeline(machine, cursor, limit)
+        response_format = 'json' if request.GET.get('format') == 'json' else None
+        context = self.timeline_context(request.user, machine, events, next_cursor, limit, response_format)
+        if response_format == 'json':
+            return JsonResponse({
+                'results': [event.as_dict() for event in events],
+                'next': context['next_url'],
+            })
+        return render(request, self.timeline_template_name, context)
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import CreateView, UpdateView
@@ -229,7 +331,7 @@ class MachineCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     success_url = reverse_lazy('core:dashboard')
 
     def test_func(self):
-        return self.request.user.groups.filter(name='Менеджер').exists()
+        return is_manager(self.request.user)
 
     def form_valid(self, form):
         # можно добавить дополнительные действия при успешном сохранении
@@ -243,81 +345,139 @@ class MachineUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     success_url = reverse_lazy('core:dashboard')
 
     def test_func(self):
-        return self.request.user.groups.filter(name='Менеджер').exists()
+        return is_manager(self.request.user)
 
     def get_object(self, queryset=None):
         # получаем по serial_number, а не по pk
-        return Machine.objects.get(serial_number=self.kwargs['serial_number'])
+        return get_object_or_404(Machine, serial_number=self.kwargs['serial_number'])
 
 from django.contrib import messages
 from django.views.generic import DeleteView
-from django.urls import reverse
+from django.shortcuts import redirect
+from .forms import MachineReassignForm
+from .reassign import reassign_machines
+
+
+class MachineReassignView(LoginRequiredMixin, ManagerOnlyMixin, View):
+    """
+    Передача машин, отобранных фильтрами дашборда (параметры m-* и serial_quick
+    в адресе), новому клиенту и/или сервисной компании одной транзакцией.
+    """
+    template_name = 'core/machine_reassign.html'
+
+    def machines(self):
+        machine_qs = Machine.objects.all()
+        serial_quick = self.request.GET.get('serial_quick', '').strip()
+        if serial_quick:
+            machine_qs = machine_qs.filter(serial_number__icontains=serial_quick)
+        return MachineFilter(self.request.GET, queryset=machine_qs, prefix='m')
+
+    def filtered(self, machine_filter):
+        """Задан ли хоть один фильтр; без фильтров отобран весь парк"""
+        if self.request.GET.get('serial_quick', '').strip():
+            return True
+        return machine_filter.is_valid() and any(
+            value not in (None, '') for value in machine_filter.form.cleaned_data.values()
+        )
+
+    def render_form(self, form, machine_filter):
+        return render(self.request, self.template_name, {
+            'form': form,
+            'machine_filter': machine_filter,
+            'filtered': 'all_machines' not in form.fields,
+            'count': machine_filter.qs.count(),
+        })
+
+    def get(self, request):
+        machine_filter = self.machines()
+        return self.render_form(MachineReassignForm(filtered=self.filtered(machine_filter)), machine_filter)
+
+    def post(self, request):
+        machine_filter = self.machines()
+        form = MachineReassignForm(request.POST, filtered=self.filtered(machine_filter))
+        if not form.is_valid() or not machine_filter.is_valid():
+            return self.render_form(form, machine_filter)
+
+        counts = reassign_machines(
+            machine_filter.qs,
+            client=form.cleaned_data['client'],
+            service_company=form.cleaned_data['service_company'],
+            cascade=form.cleaned_data['cascade'],
+        )
+        messages.success(
+            request,
+            f"Передано машин: {counts['machines']}, ТО: {counts['maintenances']}, рекламаций: {counts['claims']}.",
+        )
+        return redirect(f"{reverse('core:dashboard')}?{request.GET.urlencode()}")
+
 
 
 class OwnershipMixin(UserPassesTestMixin):
+    """
+    Права на строку проверяются фильтром queryset'а (core/permissions.py):
+    get_object() ищет объект только среди разрешённых, поэтому объект
+    загружается один раз, а чужой — просто не находится (404).
+    test_func отсекает роли, у которых права на действие нет вовсе.
+    """
+    permission_action = 'delete'
+
     def test_func(self):
-        obj = self.get_object()
-        user = self.request.user
-        if user.groups.filter(name='Менеджер').exists():
-            return True
-        if isinstance(obj, Maintenance):
-            # Для ТО: проверяем organization или service_company == user, плюс доступ к машине
-            if user.groups.filter(name='Сервисная_организация').exists():
-                return (obj.organization == user or obj.service_company == user) and obj.machine.service_company == user
-            elif user.groups.filter(name='Клиент').exists():
-                # Клиент может edit ТО только если оно связано с его машиной (расширение ТЗ)
-                return obj.machine.client == user
-        elif isinstance(obj, Claim):
-            # Для рекламаций: только service_company == user, плюс доступ к машине
-            if user.groups.filter(name='Сервисная_организация').exists():
-                return obj.service_company == user and obj.machine.service_company == user
-        return False  # Клиент не edit/delete рекламации
-
-
-class MaintenanceCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+        return role_can(self.request.user, self.model, self.permission_action)
+
+    def get_queryset(self):
+        qs = self.model.objects.select_related('machine')
+        return scope(qs, self.request.user, self.permission_action)
+
+    def get_object(self, queryset=None):
+        # Объект (вместе с machine) грузится один раз за запрос
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_cached_object'):
+            self._cached_object = super().get_object()
+        return self._cached_object
+
+
+class MachineFromURLMixin(UserPassesTestMixin):
+    """
+    Для форм добавления ТО/рекламации: машина из URL загружается один раз
+    за запрос сразу с проверкой права machine_action и дальше берётся из кеша
+    (test_func, form_valid, контекст шаблона).
+    """
+    machine_action = 'view'
+
+    def get_machine(self):
+        if not hasattr(self, '_machine'):
+            machines = Machine.objects.filter(serial_number=self.kwargs['serial_number'])
+            self._machine = scope(machines, self.request.user, self.machine_action).first()
+        return self._machine
+
+    def test_func(self):
+        return self.get_machine() is not None
+
+    def form_valid(self, form):
+        form.instance.machine = self.get_machine()
+        return super().form_valid(form)
+
+
+class MaintenanceCreateView(LoginRequiredMixin, MachineFromURLMixin, CreateView):
     model = Maintenance
     form_class = MaintenanceForm
     template_name = 'core/machine_form.html'  # Переиспользуем, адаптируем title
     success_url = reverse_lazy('core:dashboard')
-
-    def test_func(self):
-        machine = get_object_or_404(Machine, serial_number=self.kwargs['serial_number'])
-        user = self.request.user
-        if user.groups.filter(name='Менеджер').exists():
-            return True
-        elif user.groups.filter(name='Клиент').exists() and machine.client == user:
-            return True
-        elif user.groups.filter(name='Сервисная_организация').exists() and machine.service_company == user:
-            return True
-        return False
+    machine_action = 'add_maintenance'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Добавление ТО'
         return context
 
-    def form_valid(self, form):
-        machine = get_object_or_404(Machine, serial_number=self.kwargs['serial_number'])
-        form.instance.machine = machine
-        return super().form_valid(form)
-
 
 class MaintenanceUpdateView(LoginRequiredMixin, OwnershipMixin, UpdateView):
     model = Maintenance
     form_class = MaintenanceForm
     template_name = 'core/machine_form.html'
     success_url = reverse_lazy('core:dashboard')
-
-    def test_func(self):
-        maintenance = self.get_object()
-        user = self.request.user
-        if user.groups.filter(name='Менеджер').exists():
-            return True
-        elif user.groups.filter(name='Клиент').exists() and maintenance.machine.client == user:
-            return True
-        elif user.groups.filter(name='Сервисная_организация').exists() and maintenance.machine.service_company == user:
-            return True
-        return False
+    permission_action = 'change'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -325,46 +485,25 @@ class MaintenanceUpdateView(LoginRequiredMixin, OwnershipMixin, UpdateView):
         return context
 
 
-class ClaimCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+class ClaimCreateView(LoginRequiredMixin, MachineFromURLMixin, CreateView):
     model = Claim
     form_class = ClaimForm
     template_name = 'core/machine_form.html'
     success_url = reverse_lazy('core:dashboard')
-
-    def test_func(self):
-        machine = get_object_or_404(Machine, serial_number=self.kwargs['serial_number'])
-        user = self.request.user
-        if user.groups.filter(name='Менеджер').exists():
-            return True
-        elif user.groups.filter(name='Сервисная_организация').exists() and machine.service_company == user:
-            return True
-        return False  # Клиент не может создавать/редактировать Claims
+    machine_action = 'add_claim'  # у клиента этого права нет — рекламации он не создаёт
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Добавление рекламации'
         return context
 
-    def form_valid(self, form):
-        machine = get_object_or_404(Machine, serial_number=self.kwargs['serial_number'])
-        form.instance.machine = machine
-        return super().form_valid(form)
-
 
 class ClaimUpdateView(LoginRequiredMixin, OwnershipMixin, UpdateView):
     model = Claim
     form_class = ClaimForm
     template_name = 'core/machine_form.html'
     success_url = reverse_lazy('core:dashboard')
-
-    def test_func(self):
-        claim = self.get_object()
-        user = self.request.user
-        if user.groups.filter(name='Менеджер').exists():
-            return True
-        elif user.groups.filter(name='Сервисная_организация').exists() and claim.machine.service_company == user:
-            return True
-        return False
+    permission_action = 'change'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -393,24 +532,25 @@ class ClaimDeleteView(LoginRequiredMixin, OwnershipMixin, DeleteView):
         messages.success(self.request, 'Рекламация успешно удалена.')
         return super().form_valid(form)
 
-from django.utils import timezone
+from types import SimpleNamespace
+from django.contrib.admin.views.decorators import staff_member_required
+import re
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.static import serve
+from .compression import negotiate
+from .storage import ENCODING_SUFFIXES
+from .profiling import PROFILE_NAME_RE, profile_dir, recent_profiles
 from .utils.export import export_to_excel
+from .parts import parts_by_failure_node, parts_usage
 
 
+@replica_reads
 @login_required
 def export_machines(request):
     # Получаем тот же queryset, что и в дашборде
-    user = request.user
-    is_manager = user.groups.filter(name='Менеджер').exists()
-
-    if is_manager:
-        qs = Machine.objects.all()
-    elif user.groups.filter(name='Клиент').exists():
-        qs = Machine.objects.filter(client=user)
-    elif user.groups.filter(name='Сервисная_организация').exists():
-        qs = Machine.objects.filter(service_company=user)
-    else:
-        qs = Machine.objects.none()
+    qs = scope(Machine.objects.select_related('model', 'client', 'service_company'), request.user)
 
     # Применяем те же фильтры
     filter_set = MachineFilter(request.GET, queryset=qs, prefix='m')
@@ -424,9 +564,145 @@ def export_machines(request):
     fields = ['serial_number', 'model', 'shipment_date', 'client', 'service_company']
     titles = ['Зав. №', 'Модель техники', 'Дата отгрузки', 'Клиент', 'Сервисная орг.']
 
-    return export_to_excel(
-        qs,
-        fields,
-        titles,
-        filename=f"машины_{timezone.now().strftime('%Y-%m-%d')}.xlsx"
-    )
\ No newline at end of file
+    with registry.timer('silant_export_duration_ms', export='machines'):
+        return export_to_excel(
+            qs,
+            fields,
+            titles,
+            filename=f"машины_{timezone.now().strftime('%Y-%m-%d')}.xlsx"
+        )
+
+
+@login_required
+def export_machine_history(request, serial_number):
+    # Полная история машины (включая архив): ТО и рекламации одним листом
+    machine = scope(Machine.objects.by_serial(serial_number), request.user).first()
+    if machine is None:
+        raise Http404("У вас нет доступа к этой машине")
+
+    events = [
+        SimpleNamespace(kind='ТО', date=m.date, hours=m.hours, name=m.type,
+                        service_company=m.organization or m.service_company)
+        for m in machine_maintenances(machine)
+    ] + [
+        SimpleNamespace(kind='Рекламация', date=c.failure_date, hours=c.hours, name=c.failure_node,
+                        service_company=c.service_company)
+        for c in machine_claims(machine)
+    ]
+    events.sort(key=lambda e: e.date, reverse=True)
+
+    fields = ['kind', 'date', 'hours', 'name', 'service_company']
+    titles = ['Событие', 'Дата', 'Наработка, м/ч', 'Вид ТО / узел отказа', 'Сервисная орг.']
+
+    with registry.timer('silant_export_duration_ms', export='machine_history'):
+        return export_to_excel(
+            events,
+            fields,
+            titles,
+            filename=f"история_{machine.serial_number}_{timezone.now().strftime('%Y-%m-%d')}.xlsx"
+        )
+
+
+@replica_reads
+@login_required
+def parts_report(request):
+    # Запчасти в рекламациях, видимых пользователю, с фильтрами вкладки «Рекламации» дашборда
+    claims = ClaimFilter(request.GET, queryset=scope(Claim.objects.all(), request.user), prefix='cl').qs
+    return render(request, 'core/parts_report.html', {
+        'top_parts': parts_usage(claims),
+        'by_failure_node': parts_by_failure_node(claims),
+        'query': request.GET.urlencode(),
+    })
+
+
+@staff_member_required
+def metrics_view(request):
+    # Метрики всех воркеров в текстовом формате Prometheus (только для персонала)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def profiles_view(request):
+    # Последние профили запросов (ProfilingMiddleware)
+    return render(request, 'core/profiles.html', {
+        'title': 'Профили запросов',
+        'profiles': recent_profiles(),
+    })
+
+
+@staff_member_required
+def profile_download(request, name):
+    if not PROFILE_NAME_RE.match(name) or not name.endswith(('.prof', '.collapsed')):
+        raise Http404
+    path = profile_dir() / name
+    if not path.exists():
+        raise Http404
+    return FileResponse(path.open('rb'), as_attachment=True, filename=name)
+
+
+# Хеш содержимого в имени файла от ManifestStaticFilesStorage: app.1a2b3c4d5e6f.css
+HASHED_STATIC_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+
+def static_asset(request, path):
+    """
+    Статика из STATIC_ROOT, когда её отдаёт само приложение (SILANT_SERVE_STATIC):
+    готовый .br/.gz по Accept-Encoding, immutable-кеш для файлов с хешем в имени.
+    """
+    root = settings.STATIC_ROOT
+    response = None
+    encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+    if encoding is not None:
+        try:
+            # serve() сам выставит Content-Type исходного файла и Content-Encoding по суффиксу
+            response = serve(request, path + ENCODING_SUFFIXES[encoding], document_root=root)
+        except Http404:
+            response = None
+    if response is None:
+        response = serve(request, path, document_root=root)
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if HASHED_STATIC_RE.search(path):
+        patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+import hmac
+import json
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .telemetry import TelemetryError, ingest
+
+
+def telemetry_token_valid(request):
+    header = request.headers.get('Authorization', '')
+    token = header.removeprefix('Bearer ').strip()
+    return bool(token) and any(
+        hmac.compare_digest(token.encode(), allowed.encode())
+        for allowed in getattr(settings, 'TELEMETRY_TOKENS', ())
+    )
+
+
+@csrf_exempt
+@require_POST
+def telemetry_ingest(request):
+    """
+    Пачка показаний счётчиков: {"readings": [[зав. номер, время, наработка], ...]},
+    время — секунды epoch или ISO 8601. Доступ — по токену (Authorization: Bearer).
+    """
+    if not telemetry_token_valid(request):
+        return JsonResponse({'detail': 'Неверный токен'}, status=401)
+    try:
+        readings = json.loads(request.body)['readings']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'detail': 'Ожидается JSON {"readings": [...]}'}, status=400)
+    if not isinstance(readings, list):
+        return JsonResponse({'detail': 'readings должен быть списком'}, status=400)
+    if len(readings) > getattr(settings, 'TELEMETRY_MAX_READINGS', 50000):
+        return JsonResponse({'detail': 'Слишком много показаний в одном запросе'}, status=413)
+    try:
+        result = ingest(readings)
+    except TelemetryError as exc:
+        return JsonResponse({'detail': str(exc)}, status=400)
+    return JsonResponse(result)
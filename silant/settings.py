@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,14 +50,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'allauth.account.middleware.AccountMiddleware'
+    'allauth.account.middleware.AccountMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'silant.urls'
@@ -88,6 +95,53 @@ DATABASES = {
     }
 }
 
+# Реплика для отчётов и дашборда (read-only view помечаются @replica_reads).
+# Локально — второй SQLite-файл, обновляемый командой `manage.py sync_replica`.
+REPLICA_DB_PATH = os.environ.get('SILANT_REPLICA_DB')
+if REPLICA_DB_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_DB_PATH,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Сколько секунд после записи пользователь читает только с основной БД
+REPLICA_STICKY_SECONDS = 10
+
+# Счётчики запросов/времени на каждый запрос (Server-Timing) и подробный лог
+# для доли запросов; см. core/middleware.py::INSTRUMENTATION_DEFAULTS.
+# Под `manage.py test` выборки нет — лог запросов не засоряет вывод тестов
+TESTING = sys.argv[1:2] == ['test']
+SILANT_INSTRUMENTATION = {
+    'SAMPLE_RATE': 0 if TESTING else 1.0 if DEBUG else 0.05,
+}
+
+# Снимки метрик воркеров для /metrics/ (очищается при деплое)
+# (под тестами снимки не пишутся — тесты метрик задают свой каталог)
+METRICS_DIR = None if TESTING else BASE_DIR / 'var' / 'metrics'
+METRICS_FLUSH_SECONDS = 10
+
+# Профили запросов по требованию персонала (?_profile=1 или X-Silant-Profile: 1)
+PROFILE_DIR = BASE_DIR / 'var' / 'profiles'
+PROFILE_KEEP = 50
+PROFILE_SAMPLE_INTERVAL = 0.005  # секунды между снимками стека
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'silant': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# ТО и рекламации старше этого срока переносятся в архив (`manage.py archive_records`)
+ARCHIVE_HORIZON_DAYS = 3 * 365
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -125,9 +179,65 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = '/static/'
-STATICFILES_DIRS = [
-    BASE_DIR / 'core' / 'static',
-]
+# core/static находит AppDirectoriesFinder; тот же каталог здесь давал дубликаты в collectstatic
+STATICFILES_DIRS = []
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic: имена с хешем содержимого + готовые .gz/.br (core/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage'},
+}
+# Тесты идут без collectstatic и без DEBUG — манифеста нет, имена без хеша
+if TESTING:
+    STORAGES['staticfiles'] = {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+# Отдавать STATIC_ROOT самим приложением (если перед ним нет nginx)
+SILANT_SERVE_STATIC = os.environ.get('SILANT_SERVE_STATIC') == '1'
+
+# Под ASGI: асинхронные главная, дашборд и карточка машины (core/async_views.py)
+SILANT_ASYNC_VIEWS = os.environ.get('SILANT_ASYNC_VIEWS') == '1'
+# Поиск по зав. номеру на главной: фильтр номеров перестраивается раз в TTL секунд
+# (изменения из других процессов), с одного IP — не больше BURST поисков подряд
+# и RATE в секунду дальше
+SERIAL_INDEX_TTL = 60
+SERIAL_SEARCH_RATE = 0.5
+SERIAL_SEARCH_BURST = 20
+
+# Потоков для одновременных чтений внутри запроса (и соединений с БД) на воркер
+SILANT_READ_THREADS = int(os.environ.get('SILANT_READ_THREADS', 8))
+
+# Журнал изменений пишется фоновым потоком пачками: по AUDIT_BATCH_SIZE записей
+# или раз в AUDIT_FLUSH_SECONDS секунд (core/audit.py)
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_SECONDS = 2
+# Под тестами — в вызывающем потоке и без задержки: фоновый поток не видит
+# тестовую БД в памяти, а отложенные записи пережили бы транзакцию теста
+AUDIT_BACKGROUND = not TESTING
+if TESTING:
+    AUDIT_FLUSH_SECONDS = 0
+
+# Очередь задач (core/jobs.py, воркер `manage.py run_jobs`): повторы с паузой
+# RETRY * 2^(попытка-1); задача «выполняется» дольше LOCK секунд считается брошенной
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_SECONDS = 60
+JOBS_LOCK_SECONDS = 300
+# Все новые ТО и рекламации за окно приходят получателю одним письмом
+NOTIFY_DIGEST_SECONDS = 300
+# Письма отправляет воркер; для разработки — SILANT_EMAIL_BACKEND=django.core.mail.backends.console.EmailBackend
+EMAIL_BACKEND = os.environ.get('SILANT_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('SILANT_FROM_EMAIL', 'noreply@silant.local')
+
+# Приём показаний счётчиков моточасов (POST /api/telemetry/, core/telemetry.py):
+# токены через запятую, до MAX_READINGS показаний за запрос, по CHUNK_SIZE в пачке хранения
+TELEMETRY_TOKENS = [token for token in os.environ.get('SILANT_TELEMETRY_TOKENS', '').split(',') if token]
+TELEMETRY_MAX_READINGS = 50000
+TELEMETRY_CHUNK_SIZE = 1024
+# Интервал ТО для прогноза на карточке машины, м/ч
+MAINTENANCE_INTERVAL_HOURS = 500
+
+# Списки админки без фильтров: с этого числа строк (по статистике ANALYZE) — оценка вместо COUNT(*)
+ADMIN_ESTIMATED_COUNT_FROM = 100_000
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from core.views import static_asset
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -8,4 +11,8 @@ urlpatterns = [
     path('accounts/', include('allauth.urls')),
 
     path('', include('core.urls')),
-]
\ No newline at end of file
+]
+
+# Без nginx перед приложением статику (с хешами и .br/.gz) отдаёт само приложение
+if settings.SILANT_SERVE_STATIC:
+    urlpatterns.append(re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.+)$', static_asset))